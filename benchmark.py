@@ -0,0 +1,385 @@
+import argparse
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+import timeit
+from concurrent.futures import ThreadPoolExecutor
+
+import aiohttp
+import telegram
+from aiohttp import web
+from telegram.utils.request import Request
+
+import homework
+from decoders import DECODERS, get_decoder
+from http_client import PooledSession
+from outbox import MESSAGES_SENT, Outbox, OutboxSender
+from records import Homework
+from storage import StateStore
+from subscribers import Subscriber, SubscriberState
+
+# токен должен пройти проверку формата в telegram.Bot
+BOT_TOKEN = '123456:benchmark'
+STATUSES = ('reviewing', 'rejected', 'approved')
+# сколько ждем, пока заглушка откроет порты
+STARTUP_TIMEOUT = 10
+
+
+def make_bodies(homeworks: int, changed: int, payload: int) -> list:
+    """Returns Practicum answers for the three phases of status changes.
+
+    The first changed homeworks move to the next status on every poll,
+    the others stay under review; padding makes the answer payload
+    bytes longer.
+    """
+    bodies = []
+    for phase in range(len(STATUSES)):
+        answer = {
+            'homeworks': [
+                {
+                    'id': number,
+                    'homework_name': f'Homework {number}',
+                    'status': STATUSES[phase if number < changed else 0],
+                }
+                for number in range(homeworks)
+            ],
+            'current_date': 0,
+            'padding': 'x' * payload,
+        }
+        bodies.append(json.dumps(answer).encode())
+    return bodies
+
+
+def make_stub_app(options: dict) -> web.Application:
+    """Returns the app standing in for Practicum and Telegram Bot API."""
+    bodies = make_bodies(
+        options['homeworks'], options['changed'], options['payload']
+    )
+    polls = {}
+    errors = random.Random(options['seed'])
+    latency = options['latency']
+
+    async def homework_statuses(request):
+        if latency:
+            await asyncio.sleep(latency)
+        if errors.random() < options['error_rate']:
+            return web.json_response({'message': 'stub error'}, status=500)
+        token = request.headers['Authorization'].split()[-1]
+        poll = polls[token] = polls.get(token, 0) + 1
+        return web.Response(
+            body=bodies[poll % len(STATUSES)],
+            content_type='application/json',
+        )
+
+    async def send_message(request):
+        if latency:
+            await asyncio.sleep(latency)
+        data = await request.json()
+        return web.json_response({'ok': True, 'result': {
+            'message_id': 1,
+            'date': 0,
+            'chat': {'id': int(data['chat_id']), 'type': 'private'},
+            'text': data['text'],
+        }})
+
+    app = web.Application()
+    app.router.add_get('/homework_statuses/', homework_statuses)
+    app.router.add_post('/bot{token}/sendMessage', send_message)
+    return app
+
+
+def serve_stub(options: dict, ports) -> None:
+    """Runs the stub servers forever, entry point of the stub process."""
+    async def serve():
+        runner = web.AppRunner(make_stub_app(options), access_log=None)
+        await runner.setup()
+        site = web.TCPSite(runner, '127.0.0.1', 0)
+        await site.start()
+        ports.put(runner.addresses[0][1])
+        await asyncio.Event().wait()
+
+    asyncio.run(serve())
+
+
+class StubServers:
+    """Stub Practicum and Telegram in a separate process.
+
+    The stub gets its own interpreter so its CPU time and memory do not
+    show up in the measurements of the bot.
+    """
+
+    def __init__(self, options: dict):
+        """Takes latency, error_rate, payload, homeworks and changed."""
+        self.options = options
+        self.process = None
+        self.url = None
+
+    def __enter__(self):
+        """Starts the stub and waits for its port."""
+        ports = multiprocessing.Queue()
+        self.process = multiprocessing.Process(
+            target=serve_stub, args=(self.options, ports),
+            name='stub-servers', daemon=True,
+        )
+        self.process.start()
+        self.url = f'http://127.0.0.1:{ports.get(timeout=STARTUP_TIMEOUT)}'
+        return self
+
+    def __exit__(self, *args):
+        """Stops the stub."""
+        self.process.terminate()
+        self.process.join()
+
+
+def percentile(values: list, share: float) -> float:
+    """Returns the nearest-rank percentile of values."""
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, round(share * len(ordered)) - 1))
+    return ordered[index]
+
+
+def bytes_per_homework(states: dict) -> float:
+    """Returns memory of the status cache per tracked homework.
+
+    Objects shared between homeworks, such as interned statuses, are
+    counted once.
+    """
+    seen, total, tracked = set(), 0, 0
+    for state in states.values():
+        statuses = state.homework_statuses
+        tracked += len(statuses)
+        total += sys.getsizeof(statuses)
+        for item in (*statuses.keys(), *statuses.values()):
+            if id(item) not in seen:
+                seen.add(id(item))
+                total += sys.getsizeof(item)
+    return total / tracked if tracked else 0.0
+
+
+def make_outbox(rate: float) -> Outbox:
+    """Returns an outbox limited by rate messages per second, 0 — not."""
+    rate = rate or float('inf')
+    return Outbox(global_rate=rate, chat_rate=rate, group_rate=rate)
+
+
+def run_threads(url: str, states: dict, store: StateStore,
+                options: dict) -> list:
+    """Runs the threaded pipeline for the cycles; returns their times."""
+    bot = telegram.Bot(
+        BOT_TOKEN, base_url=f'{url}/bot',
+        request=Request(con_pool_size=homework.OUTBOX_WORKERS + 1),
+    )
+    outbox = make_outbox(options['telegram_rate'])
+    sender = OutboxSender(
+        outbox, bot, homework.logger, workers=homework.OUTBOX_WORKERS
+    )
+    sender.start()
+    session = PooledSession(
+        pool_size=homework.POLL_CONCURRENCY,
+        connect_timeout=homework.CONNECT_TIMEOUT,
+        read_timeout=homework.READ_TIMEOUT,
+    )
+    times = []
+    with session, ThreadPoolExecutor(homework.POLL_CONCURRENCY) as executor:
+        for _ in range(options['cycles']):
+            started = time.perf_counter()
+            homework.poll_all(
+                executor, outbox, session, states, homework.CYCLE_DEADLINE
+            )
+            outbox.join(homework.CYCLE_DEADLINE)
+            store.save(states)
+            times.append(time.perf_counter() - started)
+    sender.stop(timeout=1)
+    return times
+
+
+async def run_async(url: str, states: dict, store: StateStore,
+                    options: dict) -> list:
+    """Runs the asyncio pipeline for the cycles; returns their times."""
+    outbox = make_outbox(options['telegram_rate'])
+    semaphore = asyncio.Semaphore(homework.POLL_CONCURRENCY)
+    connector = aiohttp.TCPConnector(limit=homework.POLL_CONCURRENCY + 1)
+    times = []
+    async with aiohttp.ClientSession(connector=connector) as session:
+        senders = [
+            asyncio.create_task(homework.async_deliver(session, outbox))
+            for _ in range(homework.OUTBOX_WORKERS)
+        ]
+        for _ in range(options['cycles']):
+            started = time.perf_counter()
+            await homework.async_poll_all(
+                session, semaphore, outbox, states, homework.CYCLE_DEADLINE
+            )
+            while len(outbox):
+                await asyncio.sleep(0.001)
+            store.save(states)
+            times.append(time.perf_counter() - started)
+        for sender in senders:
+            sender.cancel()
+        await asyncio.gather(*senders, return_exceptions=True)
+    return times
+
+
+def run_benchmark(options: dict) -> dict:
+    """Polls N stub subscribers M homeworks each and returns the report."""
+    subscribers = [
+        Subscriber(f'token-{number}', str(number))
+        for number in range(options['subscribers'])
+    ]
+    # бот уже знает домашки: шлем только смены статусов, а не первый обзор
+    known = dict.fromkeys(range(options['homeworks']), STATUSES[0])
+    states = {
+        subscriber: SubscriberState(0, dict(known))
+        for subscriber in subscribers
+    }
+    sent = MESSAGES_SENT.value
+    with StubServers(options) as stub, tempfile.TemporaryDirectory() as tmp:
+        homework.ENDPOINT = f'{stub.url}/homework_statuses/'
+        homework.TELEGRAM_SEND_URL = stub.url + '/bot{token}/sendMessage'
+        homework.decode_json = get_decoder(options['decoder'])
+        store = StateStore(os.path.join(tmp, 'state.sqlite3'))
+        if options['mode'] == 'async':
+            times = asyncio.run(run_async(stub.url, states, store, options))
+        else:
+            times = run_threads(stub.url, states, store, options)
+        store.close()
+
+    sent = MESSAGES_SENT.value - sent
+    return {
+        'mode': options['mode'],
+        'decoder': options['decoder'],
+        'subscribers': options['subscribers'],
+        'homeworks': options['homeworks'],
+        'cycles': len(times),
+        'requests_per_second': len(states) * len(times) / sum(times),
+        'messages_sent': sent,
+        'cycle_p50': percentile(times, 0.5),
+        'cycle_p99': percentile(times, 0.99),
+        'state_bytes_per_homework': bytes_per_homework(states),
+        # ru_maxrss в Linux считается в килобайтах
+        'peak_rss_mb': resource.getrusage(
+            resource.RUSAGE_SELF
+        ).ru_maxrss / 1024,
+    }
+
+
+def legacy_parse_status(record: Homework) -> str:
+    """parse_status before the template registry, kept for comparison."""
+    if type(record) is dict:
+        record = Homework.from_dict(record)
+    if type(record) is not Homework:
+        raise TypeError('homework ждем в формате dict')
+    if record.homework_name is None:
+        raise KeyError('В ответе API отсутствует ожидаемый ключ homework_name')
+    if record.status is None:
+        raise KeyError('В ответе API отсутствует ожидаемый ключ status')
+    verdict = homework.HOMEWORK_STATUSES.get(record.status)
+    if verdict is None:
+        raise KeyError('Недокументированный статус домашней работы, '
+                       'обнаруженный в ответе API.')
+    return (
+        f'Изменился статус проверки работы "{record.homework_name}". '
+        f'{verdict}'
+    )
+
+
+def run_render_benchmark(options: dict) -> dict:
+    """Times rendering of status messages, old parse_status against new."""
+    homeworks = [
+        Homework(number, f'Homework {number}', STATUSES[number % 3])
+        for number in range(options['homeworks'])
+    ]
+    assert list(map(legacy_parse_status, homeworks)) == list(
+        map(homework.parse_status, homeworks)
+    )
+    renders = options['renders']
+    rounds = max(1, renders // len(homeworks))
+
+    def per_render(render) -> float:
+        seconds = min(timeit.repeat(
+            lambda: [render(homework) for homework in homeworks],
+            number=rounds, repeat=3,
+        ))
+        return seconds / (rounds * len(homeworks)) * 1e9
+
+    legacy = per_render(legacy_parse_status)
+    single = per_render(homework.parse_status)
+    # так рендерит опрос: все смены подписчика одним вызовом
+    batch = min(timeit.repeat(
+        lambda: homework.TEMPLATES.messages(homeworks),
+        number=rounds, repeat=3,
+    )) / (rounds * len(homeworks)) * 1e9
+    return {
+        'mode': 'render',
+        'renders': rounds * len(homeworks),
+        'legacy_ns_per_message': legacy,
+        'parse_status_ns_per_message': single,
+        'registry_batch_ns_per_message': batch,
+        'batch_speedup': legacy / batch,
+    }
+
+
+def format_report(report: dict) -> str:
+    """Returns the report as aligned lines."""
+    return '\n'.join(
+        f'{key:<25} {value:.3f}' if isinstance(value, float)
+        else f'{key:<25} {value}'
+        for key, value in report.items()
+    )
+
+
+def parse_options(argv: list = None) -> dict:
+    """Returns benchmark options from the command line."""
+    parser = argparse.ArgumentParser(
+        description='Гоняет конвейер опроса против заглушек Практикума и '
+                    'Telegram и печатает пропускную способность.'
+    )
+    parser.add_argument('--mode', choices=('threads', 'async', 'render'),
+                        default='threads',
+                        help='render — только скорость рендера сообщений')
+    parser.add_argument('--decoder', choices=('auto', *sorted(DECODERS)),
+                        default='auto')
+    parser.add_argument('--subscribers', type=int, default=200)
+    parser.add_argument('--homeworks', type=int, default=10)
+    parser.add_argument('--changed', type=int, default=1,
+                        help='домашек, меняющих статус за каждый опрос')
+    parser.add_argument('--cycles', type=int, default=5)
+    parser.add_argument('--latency', type=float, default=0.05,
+                        help='задержка ответа заглушек, с')
+    parser.add_argument('--error-rate', type=float, default=0.0,
+                        help='доля ответов Практикума с кодом 500')
+    parser.add_argument('--payload', type=int, default=0,
+                        help='лишних байт в каждом ответе Практикума')
+    parser.add_argument('--telegram-rate', type=float, default=0,
+                        help='лимит сообщений в секунду, 0 — без лимита')
+    parser.add_argument('--renders', type=int, default=200_000,
+                        help='сообщений в замере рендера')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='дописать отчет в файл')
+    return vars(parser.parse_args(argv))
+
+
+def main(argv: list = None) -> None:
+    """Runs the benchmark and prints the report."""
+    options = parse_options(argv)
+    # журнал каждого опроса и ошибки заглушки исказят замер
+    homework.logger.setLevel(logging.CRITICAL)
+    if options['mode'] == 'render':
+        report = format_report(run_render_benchmark(options))
+    else:
+        report = format_report(run_benchmark(options))
+    print(report)
+    if options['output']:
+        with open(options['output'], 'a') as file:
+            file.write(report + '\n\n')
+
+
+if __name__ == '__main__':
+    main()
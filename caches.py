@@ -0,0 +1,50 @@
+from collections import OrderedDict
+
+
+class ExpiringSet:
+    """Bounded set of keys that are forgotten after a quiet period.
+
+    Keys are kept in the order of their last sighting, so expired and
+    overflowing keys are always at the front: add() and eviction are O(1)
+    amortized and memory never grows past maxsize keys.
+    """
+
+    def __init__(self, maxsize: int = 64):
+        """Takes the largest number of keys to remember."""
+        self.maxsize = maxsize
+        self._expires = OrderedDict()
+
+    def __len__(self):
+        """Returns how many keys are remembered, expired ones included."""
+        return len(self._expires)
+
+    def __contains__(self, key):
+        """Returns True if the key is remembered, expired or not."""
+        return key in self._expires
+
+    def add(self, key, now: float, ttl: float) -> bool:
+        """Remembers the key till now + ttl; True if it was not alive."""
+        self._evict(now)
+        is_new = self._expires.get(key, now) <= now
+        self._expires[key] = now + ttl
+        self._expires.move_to_end(key)
+        if len(self._expires) > self.maxsize:
+            self._expires.popitem(last=False)
+        return is_new
+
+    def restore(self, key, expires_at: float) -> None:
+        """Puts back a key loaded from storage, oldest first."""
+        self._expires[key] = expires_at
+        if len(self._expires) > self.maxsize:
+            self._expires.popitem(last=False)
+
+    def items(self) -> list:
+        """Returns (key, expires_at) pairs, oldest first."""
+        return list(self._expires.items())
+
+    def _evict(self, now: float) -> None:
+        while self._expires:
+            key, expires_at = next(iter(self._expires.items()))
+            if expires_at > now:
+                return
+            del self._expires[key]
@@ -0,0 +1,88 @@
+import gzip
+import hashlib
+import json
+import threading
+import time
+import zlib
+
+PRACTICUM = 'practicum'
+TELEGRAM = 'telegram'
+# ответы на команды, их replay не сверяет
+REPLY = 'reply'
+# сбрасываем сжатый поток на диск раз в столько записей
+FLUSH_RECORDS = 100
+
+
+def token_key(token: str) -> str:
+    """Returns a stable name of a token that does not reveal it."""
+    return hashlib.sha256(str(token).encode()).hexdigest()[:16]
+
+
+class Recorder:
+    """Appends Practicum answers and Telegram sends to a gzip file.
+
+    Records are JSON lines; every run appends a new gzip member, so the
+    file only grows and old captures stay readable. Tokens are stored
+    as hashes. The file is opened on the first record.
+    """
+
+    def __init__(self, path: str, flush_records: int = FLUSH_RECORDS):
+        """Takes the capture file path."""
+        self.path = path
+        self.flush_records = flush_records
+        self._file = None
+        self._unflushed = 0
+        self._lock = threading.Lock()
+
+    def _write(self, record: dict) -> None:
+        line = json.dumps(record, ensure_ascii=False) + '\n'
+        with self._lock:
+            if self._file is None:
+                self._file = gzip.open(self.path, 'ab')
+            self._file.write(line.encode())
+            self._unflushed += 1
+            if self._unflushed >= self.flush_records:
+                # Z_SYNC_FLUSH: записанное читается и без закрытия файла
+                self._file.flush(zlib.Z_SYNC_FLUSH)
+                self._unflushed = 0
+
+    def practicum(self, token: str, status: int, body: str) -> None:
+        """Records a raw Practicum answer."""
+        self._write({
+            't': time.time(), 'kind': PRACTICUM, 'key': token_key(token),
+            'status': status, 'body': body,
+        })
+
+    def telegram(self, chat_id, text: str, notification: bool = True,
+                 key: str = None) -> None:
+        """Records a message sent to Telegram, a notification or a reply.
+
+        key is the token_key of the subscriber the notification is about.
+        """
+        self._write({
+            't': time.time(), 'kind': TELEGRAM if notification else REPLY,
+            'chat_id': str(chat_id), 'text': text, 'key': key,
+        })
+
+    def close(self) -> None:
+        """Finishes the gzip member and closes the file."""
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+def read_records(path: str):
+    """Yields records of a capture in the order they were written.
+
+    A capture cut short by a crash is read up to the last whole record.
+    """
+    with gzip.open(path, 'rb') as file:
+        try:
+            for line in file:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    return
+        except (EOFError, zlib.error):
+            return
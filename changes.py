@@ -0,0 +1,42 @@
+from typing import NamedTuple
+
+from records import Homework
+
+
+class StatusChange(NamedTuple):
+    """Homework whose status differs from the last one seen."""
+
+    homework: Homework
+    old_status: str
+    new_status: str
+
+
+def detect_changes(known_statuses: dict, homeworks: list) -> list:
+    """Diffs Homework records against known statuses by id in one pass.
+
+    Returns only transitions, a homework repeated in the list counts
+    once with its last status. known_statuses is not modified, see
+    apply_changes.
+    """
+    latest = {}
+    for homework in homeworks:
+        if homework.id is None:
+            raise KeyError('В ответе API отсутствует ожидаемый ключ id')
+        if homework.status is None:
+            raise KeyError('В ответе API отсутствует ожидаемый ключ status')
+        latest[homework.id] = homework
+
+    changes = []
+    for homework_id, homework in latest.items():
+        old_status = known_statuses.get(homework_id)
+        new_status = homework.status
+        if old_status != new_status:
+            changes.append(StatusChange(homework, old_status, new_status))
+    return changes
+
+
+def apply_changes(known_statuses: dict, changes: list) -> None:
+    """Remembers new statuses of the changed homeworks."""
+    known_statuses.update(
+        (change.homework.id, change.new_status) for change in changes
+    )
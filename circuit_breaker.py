@@ -0,0 +1,134 @@
+import threading
+import time
+from contextlib import contextmanager
+
+import requests
+
+import metrics
+from exceptions import (CircuitOpenError, ForeignServerAnswerError,
+                        ForeignServerError)
+
+TRANSIENT = 'transient'
+FATAL = 'fatal'
+DATA = 'data'
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half-open'
+
+# сервер перегружен или на обслуживании: стоит повторить позже
+TRANSIENT_STATUS_CODES = {408, 425, 429, 500, 502, 503, 504}
+
+CIRCUIT_OPENED = metrics.counter(
+    'practicum_circuit_opened_total',
+    'Times the circuit breaker stopped requests to Practicum.',
+)
+CIRCUIT_REJECTED = metrics.counter(
+    'practicum_circuit_rejected_total',
+    'Requests not sent to Practicum because the circuit was open.',
+)
+
+
+def status_code_of(error: Exception):
+    """Returns the HTTP status code attached to the error, if any."""
+    response = getattr(error, 'response', None)
+    if response is None:
+        return None
+    return getattr(response, 'status_code', getattr(response, 'status', None))
+
+
+def classify_error(error: Exception) -> str:
+    """Sorts a polling error into transient, fatal or data.
+
+    Transient errors are the server's trouble and pass with time, fatal
+    ones are the subscriber's (bad token, rejected request) and data
+    errors mean the server answered with something unexpected.
+    """
+    if isinstance(error, requests.HTTPError):
+        status_code = status_code_of(error)
+        if status_code is None or status_code in TRANSIENT_STATUS_CODES:
+            return TRANSIENT
+        return FATAL
+    if isinstance(error, ForeignServerAnswerError):
+        return FATAL
+    if isinstance(error, (ForeignServerError, CircuitOpenError)):
+        return TRANSIENT
+    return DATA
+
+
+class CircuitBreaker:
+    """Stops requests to a failing endpoint and probes it to recover.
+
+    After failure_threshold transient failures in a row the circuit
+    opens and requests fail fast for recovery_time seconds. Then up to
+    half_open_probes requests go through: a success closes the circuit,
+    a transient failure opens it again. Fatal and data errors prove the
+    server is up and count as successes.
+    """
+
+    def __init__(self, failure_threshold: int = 5,
+                 recovery_time: float = 30, half_open_probes: int = 1):
+        """Starts closed."""
+        self.failure_threshold = failure_threshold
+        self.recovery_time = recovery_time
+        self.half_open_probes = half_open_probes
+        self.state = CLOSED
+        self._failures = 0
+        self._opened_at = 0
+        self._probes = 0
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """Returns True if a request may be sent now."""
+        with self._lock:
+            if self.state == OPEN:
+                if time.monotonic() - self._opened_at < self.recovery_time:
+                    return False
+                self.state = HALF_OPEN
+                self._probes = 0
+            if self.state == HALF_OPEN:
+                if self._probes >= self.half_open_probes:
+                    return False
+                self._probes += 1
+            return True
+
+    def record(self, error: Exception = None) -> None:
+        """Takes the outcome of a request: None or the raised error."""
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._probes -= 1
+            if error is None or classify_error(error) != TRANSIENT:
+                self.state = CLOSED
+                self._failures = 0
+                return
+            self._failures += 1
+            if (self.state == HALF_OPEN
+                    or self._failures >= self.failure_threshold):
+                self._open()
+
+    def _open(self) -> None:
+        if self.state != OPEN:
+            CIRCUIT_OPENED.inc()
+        self.state = OPEN
+        self._opened_at = time.monotonic()
+
+    @contextmanager
+    def guard(self):
+        """Runs the request block if allowed and records its outcome."""
+        if not self.allow():
+            CIRCUIT_REJECTED.inc()
+            raise CircuitOpenError(
+                'Запросы к Практикуму приостановлены после серии сбоев'
+            )
+        try:
+            yield
+        except Exception as e:
+            self.record(e)
+            raise
+        except BaseException:
+            # отмененный запрос ничего не говорит о сервере
+            with self._lock:
+                if self.state == HALF_OPEN:
+                    self._probes -= 1
+            raise
+        self.record()
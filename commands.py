@@ -0,0 +1,189 @@
+import time
+from collections import Counter
+
+# короткие подписи статусов для сводки /status
+STATUS_LABELS = {
+    'reviewing': 'на проверке',
+    'rejected': 'на доработке',
+    'approved': 'принято',
+}
+# сколько смен статуса показывает /history
+HISTORY_LINES = 10
+HELP = (
+    '/status — статусы ваших работ\n'
+    '/history — последние изменения\n'
+    '/pause — не присылать уведомления\n'
+    '/resume — снова присылать уведомления'
+)
+HELP_COMMANDS = ('start', 'help')
+NOT_SUBSCRIBED = 'Этот чат не подписан на уведомления о проверке работ.'
+# ответы по-русски, homework кладет их в шаблоны языка ru
+REPLIES = {
+    'help': HELP,
+    'unknown': 'Не знаю такой команды.\n{help}',
+    'not_subscribed': NOT_SUBSCRIBED,
+    'no_homeworks': 'Пока нет ни одной работы на проверке.',
+    'summary': 'Работы — {summary}.',
+    'latest': 'Последнее изменение {moment}: "{name}". {verdict}',
+    'paused_note': 'Уведомления на паузе, /resume — включить.',
+    'no_history': 'Статусы работ пока не менялись.',
+    'history_line': '{moment} "{name}". {verdict}',
+    'paused': ('Уведомления на паузе. /status по-прежнему работает, '
+               '/resume — включить уведомления.'),
+    'resumed': 'Уведомления снова включены.',
+}
+
+
+def command_of(text: str) -> str:
+    """Returns the command name of a message: "/status@bot x" -> status."""
+    words = (text or '').split(maxsplit=1)
+    if not words or not words[0].startswith('/'):
+        return ''
+    return words[0][1:].split('@', 1)[0].lower()
+
+
+def format_moment(timestamp: int) -> str:
+    """Returns the local day and time of a timestamp."""
+    return time.strftime('%d.%m %H:%M', time.localtime(timestamp))
+
+
+class CommandHandlers:
+    """Answers chat commands from the status cache, never from Practicum.
+
+    Chats are indexed once, so a command costs a dict lookup plus work
+    bounded by the chat's own homeworks and HISTORY_SIZE. Replies go
+    through the outbox like notifications and obey the same rate, in
+    the language of the chat from templates.TemplateRegistry.
+    Commands run in the thread of telegram.ext while pollers change the
+    same states, so both touch a state only under its lock. A pause is
+    written to the store at once to survive a restart.
+    """
+
+    def __init__(self, states: dict, templates, outbox=None, store=None):
+        """Takes the {subscriber: state} dict shared with the poller."""
+        self.states = states
+        self.templates = templates
+        self.outbox = outbox
+        self.store = store
+        self._by_chat = {}
+        for subscriber in states:
+            for chat_id in subscriber.chats:
+                self._by_chat.setdefault(str(chat_id), []).append(subscriber)
+        self._commands = {
+            'status': self.status,
+            'history': self.history,
+            'pause': self.pause,
+            'resume': self.resume,
+        }
+
+    @property
+    def commands(self) -> list:
+        """Returns the names of the commands answered."""
+        return [*HELP_COMMANDS, *self._commands]
+
+    def chat_states(self, chat_id) -> dict:
+        """Returns {subscriber: state} of the subscribers in the chat."""
+        return {
+            subscriber: self.states[subscriber]
+            for subscriber in self._by_chat.get(str(chat_id), ())
+            if subscriber in self.states
+        }
+
+    def answer(self, chat_id, command: str) -> str:
+        """Returns the reply to a command sent in the chat."""
+        states = self.chat_states(chat_id)
+        locale = self.chat_locale(chat_id, states)
+        if command in HELP_COMMANDS:
+            return self._reply('help', locale)
+        handler = self._commands.get(command)
+        if handler is None:
+            return self._reply(
+                'unknown', locale, help=self._reply('help', locale)
+            )
+        if not states:
+            return self._reply('not_subscribed', locale)
+        return handler(str(chat_id), states, locale)
+
+    @staticmethod
+    def chat_locale(chat_id, states: dict) -> str:
+        """Returns the language the chat set in the registry, else None."""
+        for subscriber in states:
+            locale = subscriber.locale_of(str(chat_id))
+            if locale is not None:
+                return locale
+        return None
+
+    def on_update(self, update, context=None) -> None:
+        """Callback of telegram.ext: queues the reply to the chat."""
+        chat_id = str(update.effective_chat.id)
+        reply = self.answer(
+            chat_id, command_of(update.effective_message.text)
+        )
+        self.outbox.put(chat_id, reply, notification=False)
+
+    def status(self, chat_id: str, states: dict, locale: str) -> str:
+        """Returns counts of homeworks by status and the latest change."""
+        counts, latest, paused = Counter(), [], False
+        for state in states.values():
+            with state.lock:
+                counts.update(state.homework_statuses.values())
+                if state.history:
+                    latest.append(state.history[-1])
+                paused = paused or chat_id in state.paused
+        if not counts:
+            return self._reply('no_homeworks', locale)
+        summary = ', '.join(
+            f'{self.templates.text("labels", status, locale)}: {count}'
+            for status, count in counts.items()
+        )
+        lines = [self._reply('summary', locale, summary=summary)]
+        if latest:
+            lines.append(self._change('latest', max(latest), locale))
+        if paused:
+            lines.append(self._reply('paused_note', locale))
+        return '\n'.join(lines)
+
+    def history(self, chat_id: str, states: dict, locale: str) -> str:
+        """Returns the latest status changes, newest first."""
+        changes = []
+        for state in states.values():
+            with state.lock:
+                changes.extend(state.history)
+        changes = sorted(changes, reverse=True)[:HISTORY_LINES]
+        if not changes:
+            return self._reply('no_history', locale)
+        return '\n'.join(
+            self._change('history_line', change, locale) for change in changes
+        )
+
+    def pause(self, chat_id: str, states: dict, locale: str) -> str:
+        """Stops notifications to the chat, other chats still get them."""
+        self._set_paused(chat_id, states, True)
+        return self._reply('paused', locale)
+
+    def resume(self, chat_id: str, states: dict, locale: str) -> str:
+        """Turns notifications to the chat back on."""
+        self._set_paused(chat_id, states, False)
+        return self._reply('resumed', locale)
+
+    def _set_paused(self, chat_id: str, states: dict, paused: bool) -> None:
+        for subscriber, state in states.items():
+            with state.lock:
+                if paused:
+                    state.paused.add(chat_id)
+                else:
+                    state.paused.discard(chat_id)
+                chats = set(state.paused)
+            if self.store is not None:
+                self.store.save_paused(subscriber, chats)
+
+    def _reply(self, key: str, locale: str, **fields) -> str:
+        reply = self.templates.text('replies', key, locale)
+        return reply.format(**fields) if fields else reply
+
+    def _change(self, key: str, change, locale: str) -> str:
+        return self._reply(
+            key, locale, moment=format_moment(change.changed_at),
+            name=change.homework_name,
+            verdict=self.templates.text('verdicts', change.status, locale),
+        )
@@ -0,0 +1,252 @@
+import math
+import random
+import sqlite3
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+
+from exceptions import StateStoreError
+from sharding import shard_of
+
+BUSY_TIMEOUT = 30
+
+
+class LeaseBackend(ABC):
+    """Shared record of which replica owns which resource until when.
+
+    Backends keep two things: leases on resources and heartbeats of the
+    replicas competing for them, grouped by scope.
+    """
+
+    @contextmanager
+    def transaction(self):
+        """Groups the calls of one refresh into an atomic step."""
+        yield
+
+    @abstractmethod
+    def heartbeat(self, owner: str, scope: str, expires_at: float) -> None:
+        """Marks the replica alive till expires_at."""
+
+    @abstractmethod
+    def alive_owners(self, scope: str, now: float) -> list:
+        """Returns replicas of the scope with a live heartbeat."""
+
+    @abstractmethod
+    def holders(self, resources: list, now: float) -> dict:
+        """Returns {resource: owner} for resources with a live lease."""
+
+    @abstractmethod
+    def acquire(self, resource: str, owner: str, expires_at: float,
+                now: float) -> bool:
+        """Takes or renews the lease unless someone else holds it."""
+
+    @abstractmethod
+    def release(self, resource: str, owner: str) -> None:
+        """Gives the lease up if the owner holds it."""
+
+
+class SQLiteLeaseBackend(LeaseBackend):
+    """Leases in a local SQLite file, for replicas on one machine."""
+
+    def __init__(self, path: str):
+        """Opens the database and creates the lease tables."""
+        try:
+            self.connection = sqlite3.connect(
+                path, isolation_level=None, timeout=BUSY_TIMEOUT
+            )
+            self.connection.execute('PRAGMA journal_mode=WAL')
+            self.connection.executescript('''
+                CREATE TABLE IF NOT EXISTS leases (
+                    resource TEXT PRIMARY KEY,
+                    owner TEXT NOT NULL,
+                    expires_at REAL NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS replicas (
+                    owner TEXT NOT NULL,
+                    scope TEXT NOT NULL,
+                    expires_at REAL NOT NULL,
+                    PRIMARY KEY (owner, scope)
+                );
+            ''')
+        except sqlite3.Error as e:
+            raise StateStoreError(f'Не открывается хранилище {path}: {e}')
+
+    def close(self) -> None:
+        """Closes the database."""
+        self.connection.close()
+
+    @contextmanager
+    def transaction(self):
+        """Holds the write lock for the whole refresh."""
+        self.connection.execute('BEGIN IMMEDIATE')
+        try:
+            yield
+        except BaseException:
+            self.connection.execute('ROLLBACK')
+            raise
+        self.connection.execute('COMMIT')
+
+    def heartbeat(self, owner: str, scope: str, expires_at: float) -> None:
+        """Marks the replica alive till expires_at."""
+        self.connection.execute(
+            'INSERT OR REPLACE INTO replicas VALUES (?, ?, ?)',
+            (owner, scope, expires_at),
+        )
+
+    def alive_owners(self, scope: str, now: float) -> list:
+        """Returns replicas of the scope with a live heartbeat."""
+        rows = self.connection.execute(
+            'SELECT owner FROM replicas WHERE scope = ? AND expires_at > ?',
+            (scope, now),
+        )
+        return [owner for owner, in rows]
+
+    def holders(self, resources: list, now: float) -> dict:
+        """Returns {resource: owner} for resources with a live lease."""
+        wanted = set(resources)
+        rows = self.connection.execute(
+            'SELECT resource, owner FROM leases WHERE expires_at > ?', (now,)
+        )
+        return {
+            resource: owner for resource, owner in rows if resource in wanted
+        }
+
+    def acquire(self, resource: str, owner: str, expires_at: float,
+                now: float) -> bool:
+        """Takes or renews the lease unless someone else holds it."""
+        cursor = self.connection.execute(
+            'INSERT INTO leases VALUES (?, ?, ?) '
+            'ON CONFLICT (resource) DO UPDATE SET '
+            'owner = excluded.owner, expires_at = excluded.expires_at '
+            'WHERE leases.owner = excluded.owner OR leases.expires_at <= ?',
+            (resource, owner, expires_at, now),
+        )
+        return cursor.rowcount == 1
+
+    def release(self, resource: str, owner: str) -> None:
+        """Gives the lease up if the owner holds it."""
+        self.connection.execute(
+            'DELETE FROM leases WHERE resource = ? AND owner = ?',
+            (resource, owner),
+        )
+
+
+class LeaseManager:
+    """Keeps a fair share of resources leased to one replica.
+
+    Every refresh renews held leases, takes free or expired ones up to
+    the share of resources per live replica and releases the extra ones
+    so a newcomer can pick them up. With ttl shorter than the polling
+    interval a dead replica's leases move on before its subscribers
+    are due again.
+    """
+
+    def __init__(self, backend: LeaseBackend, owner: str, scope: str,
+                 resources: list, ttl: float = 60):
+        """Takes the resources the replicas of the scope compete for."""
+        self.backend = backend
+        self.owner = owner
+        self.scope = scope
+        self.resources = list(resources)
+        self.ttl = ttl
+        self.held = set()
+        # до какого времени продлены held, по часам бэкенда
+        self.expires_at = 0
+
+    def refresh(self, now: float = None) -> set:
+        """Renews, takes and releases leases; returns the held ones."""
+        now = time.time() if now is None else now
+        expires_at = now + self.ttl
+        with self.backend.transaction():
+            self.backend.heartbeat(self.owner, self.scope, expires_at)
+            replicas = len(self.backend.alive_owners(self.scope, now))
+            share = math.ceil(len(self.resources) / max(1, replicas))
+            holders = self.backend.holders(self.resources, now)
+            held = [
+                resource for resource, owner in holders.items()
+                if owner == self.owner
+            ]
+            for resource in held[share:]:
+                self.backend.release(resource, self.owner)
+            held = held[:share]
+            for resource in held:
+                self.backend.acquire(resource, self.owner, expires_at, now)
+            free = [
+                resource for resource in self.resources
+                if resource not in holders
+            ]
+            # случайный порядок, чтобы реплики не дрались за одни ресурсы
+            random.shuffle(free)
+            for resource in free:
+                if len(held) >= share:
+                    break
+                if self.backend.acquire(resource, self.owner, expires_at, now):
+                    held.append(resource)
+        self.held = set(held)
+        self.expires_at = expires_at
+        return self.held
+
+
+class SubscriberLeases:
+    """Leases buckets of subscribers; a replica polls only its buckets.
+
+    A lease ending within margin seconds no longer counts as owned, so
+    a poll started now ends before another replica may take the bucket.
+    """
+
+    def __init__(self, backend: LeaseBackend, owner: str, scope: str,
+                 subscribers: list, buckets: int, ttl: float = 60,
+                 renew_time: float = 20, margin: float = 0):
+        """Assigns subscribers to buckets by token hash."""
+        self.renew_time = renew_time
+        self.margin = margin
+        self.bucket_of = {
+            subscriber: bucket_name(
+                scope, shard_of(subscriber.token, buckets)
+            )
+            for subscriber in subscribers
+        }
+        self.manager = LeaseManager(
+            backend, owner, scope, sorted(set(self.bucket_of.values())), ttl
+        )
+        self._renewed_at = None
+
+    def expiring(self, now: float = None) -> bool:
+        """Returns True once the leases are within margin of their end."""
+        now = time.time() if now is None else now
+        return now >= self.manager.expires_at - self.margin
+
+    def owns(self, subscriber, now: float = None) -> bool:
+        """Returns True if the subscriber's bucket is leased to us."""
+        return (
+            self.bucket_of[subscriber] in self.manager.held
+            and not self.expiring(now)
+        )
+
+    def refresh(self, now: float = None) -> tuple:
+        """Renews leases when due; returns gained and lost subscribers."""
+        now = time.monotonic() if now is None else now
+        if (self._renewed_at is not None
+                and now - self._renewed_at < self.renew_time
+                and not self.expiring()):
+            return [], []
+        self._renewed_at = now
+        before = set(self.manager.held)
+        after = self.manager.refresh()
+        gained = after - before
+        lost = before - after
+        return (
+            [s for s, bucket in self.bucket_of.items() if bucket in gained],
+            [s for s, bucket in self.bucket_of.items() if bucket in lost],
+        )
+
+
+# имя из настройки COORDINATION -> класс бэкенда, принимающий путь или адрес
+LEASE_BACKENDS = {
+    'sqlite': SQLiteLeaseBackend,
+}
+
+
+def bucket_name(scope: str, number: int) -> str:
+    """Returns the lease resource name of a bucket."""
+    return f'{scope}:{number}'
@@ -0,0 +1,32 @@
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+# имя из настройки JSON_DECODER -> функция bytes/str -> объект
+DECODERS = {'json': json.loads}
+if orjson is not None:
+    DECODERS['orjson'] = orjson.loads
+if msgspec is not None:
+    DECODERS['msgspec'] = msgspec.json.Decoder().decode
+# для auto: первый установленный
+PREFERENCE = ('orjson', 'msgspec', 'json')
+
+
+def get_decoder(name: str = 'auto'):
+    """Returns the decode function of a backend, auto picks the fastest."""
+    if name == 'auto':
+        name = next(name for name in PREFERENCE if name in DECODERS)
+    if name not in DECODERS:
+        raise ValueError(
+            f'JSON-декодер {name} не установлен, доступны: '
+            f'{", ".join(sorted(DECODERS))}'
+        )
+    return DECODERS[name]
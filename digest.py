@@ -0,0 +1,109 @@
+import threading
+import time
+
+import metrics
+
+# длиннее Telegram не примет: дайджест режем на несколько сообщений
+MESSAGE_LIMIT = 4096
+SEPARATOR = '\n\n'
+
+MESSAGES_COALESCED = metrics.counter(
+    'digest_messages_coalesced_total',
+    'Status messages merged into a digest or dropped as superseded.',
+)
+
+
+def pack(texts: list, limit: int = MESSAGE_LIMIT) -> list:
+    """Joins texts into as few messages of at most limit chars as fit."""
+    messages, current, length = [], [], 0
+    for text in texts:
+        extra = len(text) + (len(SEPARATOR) if current else 0)
+        if current and length + extra > limit:
+            messages.append(SEPARATOR.join(current))
+            current, length = [], 0
+            extra = len(text)
+        current.append(text)
+        length += extra
+    if current:
+        messages.append(SEPARATOR.join(current))
+    return messages
+
+
+class Digest:
+    """Holds status messages of a chat for a window and sends them as one.
+
+    A chat cc'd on several tokens gets the changes of all of them in
+    one digest, so held messages are keyed by (token, homework id).
+    Only the last status of a homework within the window is announced;
+    a homework back at the status it had before the window is dropped.
+    The window starts with the first change for the chat; 0 sends at
+    the end of the polling cycle. Chats holding the same texts share
+    one packed digest. Pollers add from several threads.
+    """
+
+    def __init__(self, window: float):
+        """Takes the window length in seconds."""
+        self.window = window
+        # чат -> [когда отправить, {(токен, id домашки): (было, стало,
+        # текст)}, сколько сообщений пришло]
+        self._chats = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        """Returns the number of chats with held messages."""
+        return len(self._chats)
+
+    def add(self, chat_ids, token: str, changes: list, messages: list,
+            now: float = None) -> None:
+        """Holds rendered messages of a token's StatusChange records."""
+        if not changes:
+            return
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            for chat_id in chat_ids:
+                if chat_id not in self._chats:
+                    self._chats[chat_id] = [now + self.window, {}, 0]
+                held = self._chats[chat_id]
+                held[2] += len(messages)
+                pending = held[1]
+                for change, text in zip(changes, messages):
+                    key = (token, change.homework.id)
+                    known = pending.get(key)
+                    old_status = (
+                        change.old_status if known is None else known[0]
+                    )
+                    pending[key] = (old_status, change.new_status, text)
+
+    def next_due(self) -> float:
+        """Returns the monotonic time of the nearest digest or None."""
+        with self._lock:
+            return min(
+                (held[0] for held in self._chats.values()), default=None
+            )
+
+    def pop_due(self, now: float = None, force: bool = False) -> list:
+        """Returns (chat ids, text) of the digests due, all if forced."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            due = [
+                chat_id for chat_id, held in self._chats.items()
+                if force or held[0] <= now
+            ]
+            popped = [(chat_id, self._chats.pop(chat_id)) for chat_id in due]
+
+        # чаты одного подписчика держат те же тексты: пакуем их раз
+        chats_of = {}
+        for chat_id, (_, pending, added) in popped:
+            texts = tuple(
+                text for old_status, new_status, text in pending.values()
+                if old_status != new_status
+            )
+            chats_of.setdefault(texts, []).append((chat_id, added))
+        messages = []
+        for texts, chats in chats_of.items():
+            digest = pack(texts)
+            for _, added in chats:
+                MESSAGES_COALESCED.inc(added - len(digest))
+            chat_ids = tuple(chat_id for chat_id, _ in chats)
+            messages.extend((chat_ids, text) for text in digest)
+        return messages
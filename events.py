@@ -0,0 +1,275 @@
+import argparse
+import mmap
+import os
+import struct
+import threading
+import time
+from array import array
+from hashlib import blake2b
+from typing import NamedTuple
+
+# changed_at, ключ чата, id домашки, старый и новый статус: 32 байта
+RECORD = struct.Struct('<qqqBB6x')
+STATUS_CODES = {None: 0, 'reviewing': 1, 'approved': 2, 'rejected': 3}
+UNKNOWN_STATUS = 255
+STATUS_NAMES = {code: status for status, code in STATUS_CODES.items()}
+STATUS_NAMES[UNKNOWN_STATUS] = 'unknown'
+REVIEWING = STATUS_CODES['reviewing']
+VERDICTS = (STATUS_CODES['approved'], STATUS_CODES['rejected'])
+# индекс: заголовок, затем по чату ключ, последнее время и номера записей
+INDEX_SUFFIX = '.idx'
+INDEX_MAGIC = b'HWIDX\0\0\1'
+INDEX_HEADER = struct.Struct('<8sQ')
+INDEX_ENTRY = struct.Struct('<qqQ')
+
+
+def key_of(value) -> int:
+    """Returns a stable signed 64-bit key of a chat id or another value."""
+    digest = blake2b(str(value).encode(), digest_size=8).digest()
+    return int.from_bytes(digest, 'little', signed=True)
+
+
+def homework_key(homework_id) -> int:
+    """Returns the homework id as stored, non-integer ids are hashed."""
+    if type(homework_id) is int:
+        return homework_id
+    return key_of(homework_id)
+
+
+class Event(NamedTuple):
+    """A status transition read back from the log."""
+
+    changed_at: int
+    chat_key: int
+    homework_id: int
+    old_status: str
+    new_status: str
+
+    @classmethod
+    def unpack_from(cls, buffer, number: int) -> 'Event':
+        """Decodes the record number of a log buffer."""
+        changed_at, chat, homework_id, old, new = RECORD.unpack_from(
+            buffer, number * RECORD.size
+        )
+        return cls(
+            changed_at, chat, homework_id, STATUS_NAMES[old], STATUS_NAMES[new]
+        )
+
+
+def status_code(status) -> int:
+    """Returns the one-byte code of a status."""
+    return STATUS_CODES.get(status, UNKNOWN_STATUS)
+
+
+def percentile(values: list, share: float) -> float:
+    """Returns the nearest-rank percentile of sorted values."""
+    index = max(0, min(len(values) - 1, round(share * len(values)) - 1))
+    return values[index]
+
+
+class EventLog:
+    """Append-only log of status transitions with a per-chat index.
+
+    Records have a fixed size, so record n starts at n * RECORD.size and
+    queries read it through mmap without loading the log. The index
+    lists record numbers of every chat, and a change sent to several
+    chats is written once per chat. The index is kept in memory, written
+    next to the log on close, and on open only records after the saved
+    index are scanned. Times are the server's current_date and never go
+    back within a chat, which lets since() bisect. The files are opened
+    on the first use.
+    """
+
+    def __init__(self, path: str):
+        """Takes the log file path."""
+        self.path = path
+        self._file = None
+        self._count = 0
+        self._postings = {}
+        self._last_time = {}
+        self._lock = threading.Lock()
+
+    def _open(self) -> None:
+        if self._file is not None:
+            return
+        self._file = open(self.path, 'a+b')
+        size = os.fstat(self._file.fileno()).st_size
+        if size % RECORD.size:
+            # запись оборвана на середине при падении: отрезаем ее
+            self._file.truncate(size - size % RECORD.size)
+        self._count = size // RECORD.size
+        self._index_records(self._load_index())
+
+    def _load_index(self) -> int:
+        """Reads the saved index, returns how many records it covers."""
+        try:
+            with open(self.path + INDEX_SUFFIX, 'rb') as file:
+                data = file.read()
+            magic, covered = INDEX_HEADER.unpack_from(data)
+        except (OSError, struct.error):
+            return 0
+        if magic != INDEX_MAGIC or covered > self._count:
+            return 0
+        offset = INDEX_HEADER.size
+        while offset < len(data):
+            key, last_time, count = INDEX_ENTRY.unpack_from(data, offset)
+            offset += INDEX_ENTRY.size
+            postings = array('Q')
+            postings.frombytes(data[offset:offset + count * 8])
+            offset += count * 8
+            self._postings[key] = postings
+            self._last_time[key] = last_time
+        return covered
+
+    def _index_records(self, start: int) -> None:
+        """Adds records from start on to the in-memory index."""
+        if start >= self._count:
+            return
+        with mmap.mmap(self._file.fileno(), self._count * RECORD.size,
+                       access=mmap.ACCESS_READ) as view:
+            with memoryview(view) as data:
+                records = RECORD.iter_unpack(data[start * RECORD.size:])
+                for number, (changed_at, key, *_) in enumerate(
+                    records, start
+                ):
+                    self._postings.setdefault(key, array('Q')).append(number)
+                    self._last_time[key] = changed_at
+                del records
+
+    def _save_index(self) -> None:
+        parts = [INDEX_HEADER.pack(INDEX_MAGIC, self._count)]
+        for key, postings in self._postings.items():
+            parts.append(
+                INDEX_ENTRY.pack(key, self._last_time[key], len(postings))
+            )
+            parts.append(postings.tobytes())
+        temporary = f'{self.path}{INDEX_SUFFIX}.tmp'
+        with open(temporary, 'wb') as file:
+            file.write(b''.join(parts))
+        os.replace(temporary, self.path + INDEX_SUFFIX)
+
+    def append(self, chat_ids: list, changed_at: int, changes: list) -> None:
+        """Writes StatusChange records for each chat at the server time."""
+        if not changes:
+            return
+        with self._lock:
+            self._open()
+            for chat_id in chat_ids:
+                self._append_chat(key_of(chat_id), changed_at, changes)
+            self._file.flush()
+
+    def _append_chat(self, key: int, changed_at: int, changes: list) -> None:
+        changed_at = max(changed_at, self._last_time.get(key, changed_at))
+        self._file.write(b''.join(
+            RECORD.pack(
+                changed_at, key, homework_key(change.homework.id),
+                status_code(change.old_status),
+                status_code(change.new_status),
+            )
+            for change in changes
+        ))
+        self._postings.setdefault(key, array('Q')).extend(
+            range(self._count, self._count + len(changes))
+        )
+        self._count += len(changes)
+        self._last_time[key] = changed_at
+
+    def __len__(self) -> int:
+        """Returns the number of records."""
+        with self._lock:
+            self._open()
+            return self._count
+
+    def _snapshot(self, key: int = None) -> tuple:
+        """Returns the record count, the chat's postings and their length."""
+        with self._lock:
+            self._open()
+            postings = self._postings.get(key, array('Q'))
+            return self._count, postings, len(postings)
+
+    def since(self, chat_id, since: int = 0) -> list:
+        """Returns events of the chat at or after the since timestamp."""
+        count, postings, length = self._snapshot(key_of(chat_id))
+        if not length:
+            return []
+        with mmap.mmap(self._file.fileno(), count * RECORD.size,
+                       access=mmap.ACCESS_READ) as view:
+            low, high = 0, length
+            while low < high:
+                middle = (low + high) // 2
+                changed_at, = struct.unpack_from(
+                    '<q', view, postings[middle] * RECORD.size
+                )
+                if changed_at < since:
+                    low = middle + 1
+                else:
+                    high = middle
+            return [
+                Event.unpack_from(view, postings[position])
+                for position in range(low, length)
+            ]
+
+    def turnaround(self, since: int = 0,
+                   shares: tuple = (0.5, 0.9, 0.99)) -> dict:
+        """Returns percentiles of review time, from reviewing to a verdict.
+
+        Reviews finished at or after since count. The log is streamed
+        through mmap; only reviews still open are kept in memory.
+        """
+        count, _, _ = self._snapshot()
+        if not count:
+            return {}
+        started, durations = {}, []
+        with mmap.mmap(self._file.fileno(), count * RECORD.size,
+                       access=mmap.ACCESS_READ) as view:
+            for changed_at, _, homework_id, _, new in RECORD.iter_unpack(
+                view
+            ):
+                # копии записи для других чатов подписчика не считаем:
+                # проверку закрывает первый вердикт
+                if new == REVIEWING:
+                    started[homework_id] = changed_at
+                elif new in VERDICTS:
+                    began = started.pop(homework_id, None)
+                    if began is not None and changed_at >= since:
+                        durations.append(changed_at - began)
+        if not durations:
+            return {}
+        durations.sort()
+        return {share: percentile(durations, share) for share in shares}
+
+    def close(self) -> None:
+        """Saves the index and closes the log."""
+        with self._lock:
+            if self._file is not None:
+                self._save_index()
+                self._file.close()
+                self._file = None
+
+
+def main(argv: list = None) -> None:
+    """Prints transitions of a chat or review time percentiles."""
+    parser = argparse.ArgumentParser(
+        description='Читает журнал смен статусов EVENTS_FILE.'
+    )
+    parser.add_argument('path')
+    parser.add_argument('--chat', help='смены статусов в этом чате')
+    parser.add_argument('--since', type=int, default=0,
+                        help='не раньше этого времени, unix time')
+    options = parser.parse_args(argv)
+    log = EventLog(options.path)
+    if options.chat:
+        for event in log.since(options.chat, options.since):
+            moment = time.strftime(
+                '%Y-%m-%d %H:%M:%S', time.localtime(event.changed_at)
+            )
+            print(f'{moment} {event.homework_id} '
+                  f'{event.old_status} -> {event.new_status}')
+    else:
+        for share, seconds in log.turnaround(options.since).items():
+            print(f'review p{share * 100:g} {seconds / 3600:.1f} h')
+    log.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -56,3 +56,33 @@ class VerdictNotFound(Exception):
     """Verdict is not described."""
 
     pass
+
+
+class SubscribersRegistryError(Exception):
+    """Subscribers registry is not readable or malformed."""
+
+    pass
+
+
+class StateStoreError(Exception):
+    """State store is not available."""
+
+    pass
+
+
+class ForeignServerAnswerError(ForeignServerError):
+    """Foreign server reported an error inside its answer."""
+
+    pass
+
+
+class CircuitOpenError(Exception):
+    """Requests to the foreign server are paused by the circuit breaker."""
+
+    pass
+
+
+class TemplatesError(Exception):
+    """Message templates are not readable or malformed."""
+
+    pass
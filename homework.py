@@ -1,23 +1,122 @@
+import asyncio
 import logging
 import os
+import socket
 import time
+from concurrent.futures import ThreadPoolExecutor, wait
 from sys import stdout
 
+import aiohttp
 import requests
 import telegram
 from dotenv import load_dotenv
+from telegram.ext import CommandHandler, Updater
+from telegram.utils.request import Request
 
-from exceptions import (ForeignServerError, HomeworkIsNotDict,
+import metrics
+from capture import Recorder, token_key
+from changes import apply_changes, detect_changes
+from circuit_breaker import TRANSIENT, CircuitBreaker, classify_error
+from commands import REPLIES, STATUS_LABELS, CommandHandlers
+from coordination import LEASE_BACKENDS, SubscriberLeases
+from decoders import get_decoder
+from digest import Digest
+from events import EventLog
+from exceptions import (CircuitOpenError, ForeignServerAnswerError,
+                        ForeignServerError, HomeworkIsNotDict,
                         HomeworksIsNotList)
+from http_client import (AnswerValidators, PooledSession, connection_stats,
+                         cursor_of)
+from lifecycle import POLL_SIGNAL, Wakeup
+from outbox import SEND_SECONDS, Outbox, OutboxSender
+from records import Homework, Transition
+from scheduler import AdaptivePolicy, PollScheduler
+from sharding import ShardSupervisor, report_metrics, shard_of
+from storage import OutboxStore, StateStore
+from subscribers import (Subscriber, SubscriberState, load_subscribers,
+                         make_subscriber)
+from templates import BUILTIN_LOCALES, TemplateRegistry, load_locales
 
 load_dotenv()
 
 PRACTICUM_TOKEN = os.getenv('PRACTICUM_TOKEN')
 TELEGRAM_TOKEN = os.getenv('TELEGRAM_TOKEN')
 TELEGRAM_CHAT_ID = os.getenv('TELEGRAM_CHAT_ID')
+# JSON или SQLite со списком пар token + chat_id, см. subscribers.py
+SUBSCRIBERS_FILE = os.getenv('SUBSCRIBERS_FILE')
+POLL_CONCURRENCY = int(os.getenv('POLL_CONCURRENCY', 32))
+# SQLite со статусами, курсорами и отправленными ошибками между запусками
+STATE_DB = os.getenv('STATE_DB', 'homework_state.sqlite3')
+# неотправленные сообщения переживают перезапуск в той же базе
+PERSIST_OUTBOX = os.getenv('PERSIST_OUTBOX', 'true').lower() == 'true'
+OUTBOX_WORKERS = int(os.getenv('OUTBOX_WORKERS', 8))
+# через сколько секунд тишины та же ошибка отправится снова
+ERROR_REPEAT_TIME = int(os.getenv('ERROR_REPEAT_TIME', 6 * 60 * 60))
+# threads — пул потоков вокруг requests, async — asyncio и aiohttp
+POLLING_MODE = os.getenv('POLLING_MODE', 'threads')
+# больше одного — подписчики делятся между процессами по хэшу токена
+SHARDS = int(os.getenv('SHARDS', 1))
+# auto — orjson или msgspec, если установлены, иначе json из stdlib
+JSON_DECODER = os.getenv('JSON_DECODER', 'auto')
+# файл, куда пишутся ответы Практикума и отправки в Telegram для replay.py
+RECORD_FILE = os.getenv('RECORD_FILE')
+# окно дайджеста, с: смены статусов чата за окно идут одним сообщением;
+# 0 — за цикл опроса, без значения — каждая сразу
+DIGEST_WINDOW = os.getenv('DIGEST_WINDOW')
+# язык сообщений по умолчанию и файл с шаблонами других языков
+LOCALE = os.getenv('LOCALE', 'ru')
+TEMPLATES_FILE = os.getenv('TEMPLATES_FILE')
+# журнал смен статусов для аналитики, выключен без имени файла
+EVENTS_FILE = os.getenv('EVENTS_FILE')
+# порт страницы /metrics для Prometheus, 0 — не открывать
+METRICS_HOST = os.getenv('METRICS_HOST', '127.0.0.1')
+METRICS_PORT = int(os.getenv('METRICS_PORT', 0))
+# sqlite — копии бота делят подписчиков арендой в LEASE_DB, пусто — не делят
+COORDINATION = os.getenv('COORDINATION', '')
+LEASE_DB = os.getenv('LEASE_DB', STATE_DB)
+REPLICA_ID = os.getenv('REPLICA_ID', f'{socket.gethostname()}-{os.getpid()}')
+# секунды на подключение к Практикуму и на ожидание каждой порции ответа
+CONNECT_TIMEOUT = float(os.getenv('CONNECT_TIMEOUT', 3.05))
+READ_TIMEOUT = float(os.getenv('READ_TIMEOUT', 10))
+# команды боту: off, polling (getUpdates) или webhook
+COMMANDS = os.getenv('COMMANDS', 'off')
+WEBHOOK_URL = os.getenv('WEBHOOK_URL')
+WEBHOOK_LISTEN = os.getenv('WEBHOOK_LISTEN', '0.0.0.0')
+WEBHOOK_PORT = int(os.getenv('WEBHOOK_PORT', 8443))
+# за сколько секунд должен уложиться цикл опроса, остальное — в следующий
+CYCLE_DEADLINE = float(os.getenv('CYCLE_DEADLINE', 120))
+# за сколько секунд после SIGTERM допишем состояние и отправим очередь
+SHUTDOWN_TIMEOUT = float(os.getenv('SHUTDOWN_TIMEOUT', 20))
 
 RETRY_TIME = 600
+# пока работа на ревью, статус меняется чаще
+REVIEWING_RETRY_TIME = 120
+# нечего ждать: домашек нет или все приняты
+IDLE_RETRY_TIME = 1800
+# после сбоя сервера пауза растет от ERROR_RETRY_TIME до MAX_RETRY_TIME
+ERROR_RETRY_TIME = 60
+MAX_RETRY_TIME = 3600
+# лимиты Telegram: сообщений в секунду на бота и в один чат
+TELEGRAM_RATE = 30
+TELEGRAM_CHAT_RATE = 1
+# сколько ждет отправитель пустой очереди перед новой проверкой
+OUTBOX_IDLE_WAIT = 0.5
+# после стольких сбоев Практикума подряд запросы ставятся на паузу
+BREAKER_FAILURE_THRESHOLD = 5
+BREAKER_RECOVERY_TIME = 30
+# как часто процесс шарда отправляет счетчики супервизору
+METRICS_REPORT_TIME = 10
+# подписчики арендуются корзинами; аренда живет LEASE_TIME и продлевается
+# каждые LEASE_RENEW_TIME, так что упавшая копия отдает своих подписчиков
+# быстрее самого частого опроса REVIEWING_RETRY_TIME; цикл опроса с арендой
+# короче LEASE_TIME - LEASE_RENEW_TIME, чтобы аренду успели продлить
+LEASE_BUCKETS = 64
+LEASE_TIME = 60
+LEASE_RENEW_TIME = 20
+# как часто ожидание опросов проверяет, не пора ли остановиться
+STOP_CHECK_TIME = 1
 ENDPOINT = 'https://practicum.yandex.ru/api/user_api/homework_statuses/'
+TELEGRAM_SEND_URL = 'https://api.telegram.org/bot{token}/sendMessage'
 HEADERS = {'Authorization': f'OAuth {PRACTICUM_TOKEN}'}
 
 HOMEWORK_STATUSES = {
@@ -25,6 +124,82 @@ HOMEWORK_STATUSES = {
     'reviewing': 'Работа взята на проверку ревьюером.',
     'rejected': 'Работа проверена: у ревьюера есть замечания.'
 }
+MESSAGE_TEMPLATE = 'Изменился статус проверки работы "{name}". {verdict}'
+
+POLL_POLICY = AdaptivePolicy(
+    base=RETRY_TIME,
+    reviewing=REVIEWING_RETRY_TIME,
+    idle=IDLE_RETRY_TIME,
+    error_base=ERROR_RETRY_TIME,
+    error_max=MAX_RETRY_TIME,
+)
+
+PRACTICUM_BREAKER = CircuitBreaker(
+    failure_threshold=BREAKER_FAILURE_THRESHOLD,
+    recovery_time=BREAKER_RECOVERY_TIME,
+)
+
+POLL_CYCLES = metrics.counter('poll_cycles_total', 'Polling cycles run.')
+DEADLINE_MISSES = metrics.counter(
+    'poll_deadline_misses_total',
+    'Polling cycles that did not finish before CYCLE_DEADLINE.',
+)
+POLLS_DEFERRED = metrics.counter(
+    'polls_deferred_total',
+    'Subscriber polls cancelled or left running at the cycle deadline.',
+)
+POLL_ERRORS = metrics.counter(
+    'poll_errors_total', 'Subscriber polls that ended with an error.'
+)
+HOMEWORKS_PROCESSED = metrics.counter(
+    'homeworks_processed_total', 'Homeworks received from Practicum.'
+)
+STATUS_CHANGES = metrics.counter(
+    'homework_status_changes_total', 'Homework status changes detected.'
+)
+REQUEST_SECONDS = metrics.histogram(
+    'practicum_request_seconds', 'Time of one Practicum API request.'
+)
+DECODE_SECONDS = metrics.histogram(
+    'practicum_decode_seconds', 'Time to decode a Practicum JSON answer.'
+)
+CYCLE_SECONDS = metrics.histogram(
+    'poll_cycle_seconds', 'Time of a full polling cycle.'
+)
+ANSWERS_NOT_MODIFIED = metrics.counter(
+    'practicum_answers_not_modified_total',
+    'Answers skipped because the server replied 304 Not Modified.',
+)
+ANSWERS_UNCHANGED = metrics.counter(
+    'practicum_answers_unchanged_total',
+    'Answers skipped because the body hash matched the previous answer.',
+)
+ANSWERS_DECODED = metrics.counter(
+    'practicum_answers_decoded_total',
+    'Answers decoded, validated and diffed in full.',
+)
+LOOP_LAG_SECONDS = metrics.histogram(
+    'poll_loop_lag_seconds',
+    'How late the earliest due subscriber is taken for a poll.',
+)
+
+RECORDER = Recorder(RECORD_FILE) if RECORD_FILE else None
+EVENT_LOG = EventLog(EVENTS_FILE) if EVENTS_FILE else None
+DIGEST = Digest(float(DIGEST_WINDOW)) if DIGEST_WINDOW else None
+TEMPLATES = TemplateRegistry(
+    {
+        **BUILTIN_LOCALES,
+        'ru': {
+            'message': MESSAGE_TEMPLATE,
+            'verdicts': HOMEWORK_STATUSES,
+            'labels': STATUS_LABELS,
+            'replies': REPLIES,
+        },
+        **(load_locales(TEMPLATES_FILE) if TEMPLATES_FILE else {}),
+    },
+    LOCALE,
+)
+decode_json = get_decoder(JSON_DECODER)
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG)
@@ -39,31 +214,103 @@ logger.addHandler(handler)
 
 def send_message(bot, message):
     """Sends a message to user with TELEGRAM_CHAT_ID."""
+    send_message_to_chat(bot, TELEGRAM_CHAT_ID, message)
+
+
+def send_message_to_chat(bot, chat_id, message):
+    """Sends a message to a certain chat."""
     try:
-        bot.send_message(TELEGRAM_CHAT_ID, message)
+        bot.send_message(chat_id, message)
         logger.info('Удачная отправка сообщения в Telegram.')
     except Exception as e:
         logger.error(f'Cбой при отправке сообщения в Telegram: {e}')
 
 
+def make_headers(token: str) -> dict:
+    """Returns authorization headers for a Practicum token."""
+    return {'Authorization': f'OAuth {token}'}
+
+
 def get_api_answer(current_timestamp: int) -> dict:
     """Makes a request to ya.practicum, takes unix time."""
+    return request_homework_statuses(current_timestamp, PRACTICUM_TOKEN)
+
+
+def request_homework_statuses(current_timestamp: int, token: str,
+                              session=requests,
+                              validators: AnswerValidators = None) -> dict:
+    """Makes a request to ya.practicum on behalf of a certain token.
+
+    session is anything with requests.get signature: the requests module
+    itself or a shared PooledSession keeping connections alive. With
+    validators of the previous answer an unchanged answer is not decoded.
+    """
     params = {'from_date': current_timestamp}
+    headers = make_headers(token)
+    if validators is not None:
+        headers.update(validators.headers())
     try:
-        response = requests.get(url=ENDPOINT, headers=HEADERS, params=params)
+        with REQUEST_SECONDS.time():
+            response = session.get(
+                url=ENDPOINT, headers=headers, params=params,
+                timeout=(CONNECT_TIMEOUT, READ_TIMEOUT),
+            )
         logger.info('Обратился к Яндекс.Практикум')
     except requests.exceptions.RequestException as e:
         raise ForeignServerError(e)
+    if RECORDER is not None:
+        RECORDER.practicum(token, response.status_code, response.text)
+    if validators is not None:
+        answer = skip_unchanged(
+            validators, response.status_code, response.headers,
+            response.content, current_timestamp,
+        )
+        if answer is not None:
+            return answer
 
     if response.status_code != requests.codes.ok:
         message = f'Недоступен {ENDPOINT}, код: {response.status_code}'
-        raise requests.HTTPError(message)
+        raise requests.HTTPError(message, response=response)
 
     try:
-        response = response.json()
+        with DECODE_SECONDS.time():
+            response = decode_response(response)
     except KeyError as e:
         raise KeyError(e)
+    return check_api_errors(response)
+
+
+def skip_unchanged(validators: AnswerValidators, status: int, headers,
+                   body: bytes, current_timestamp: int) -> dict:
+    """Returns an empty answer if nothing changed since the last one.
+
+    Nothing changed if the server says 304 or the body hashes the same.
+    The empty answer keeps known statuses and only moves the cursor.
+    """
+    if status == requests.codes.not_modified:
+        ANSWERS_NOT_MODIFIED.inc()
+        return {'homeworks': [], 'current_date': current_timestamp}
+    if status != requests.codes.ok:
+        return None
+    validators.remember(headers)
+    if validators.is_repeat(body):
+        ANSWERS_UNCHANGED.inc()
+        return {'homeworks': [], 'current_date': cursor_of(body)}
+    ANSWERS_DECODED.inc()
+    return None
+
+
+def decode_response(response):
+    """Decodes the answer body with the JSON_DECODER backend."""
+    content = getattr(response, 'content', None)
+    if content is None:
+        # у ответа нет сырого тела (заглушка): пусть декодирует себя сам
+        return response.json()
+    return decode_json(content)
 
+
+def check_api_errors(response):
+    """Raises ForeignServerError if the decoded answer reports an error."""
     # Сторонний API может содержать инфу об ошибках, чаще под этими ключами
     # не уверен что нужно так проверять
     if type(response) is dict:
@@ -73,12 +320,12 @@ def get_api_answer(current_timestamp: int) -> dict:
 
     if is_error or is_code:
         message = f'Ошибка внешнего сервера: {is_error}, {is_code}'
-        raise ForeignServerError(message)
+        raise ForeignServerAnswerError(message)
     return response
 
 
 def check_response(response_text: dict) -> list:
-    """Returns list of homeworks."""
+    """Returns list of homeworks as compact Homework records."""
     if type(response_text) is dict:
         homeworks = response_text.get('homeworks')
 
@@ -91,29 +338,34 @@ def check_response(response_text: dict) -> list:
         message = 'homeworks ждем в формате list, пришел другой формат'
         raise HomeworksIsNotList(message)
 
-    return homeworks
+    if any(type(homework) is not dict for homework in homeworks):
+        message = 'homework ждем в формате dict, пришел другой формат'
+        raise HomeworkIsNotDict(message)
+    return [Homework.from_dict(homework) for homework in homeworks]
 
 
-def parse_status(homework: dict) -> str:
+def parse_status(homework: Homework) -> str:
     """Returns name and rewiever's verdict of a sertain homework."""
-    if type(homework) != dict:
+    return render_status(homework)
+
+
+def render_status(homework: Homework, locale: str = None) -> str:
+    """Returns the status message in the locale, LOCALE by default."""
+    if type(homework) is dict:
+        homework = Homework.from_dict(homework)
+    if type(homework) is not Homework:
         message = 'homework ждем в формате dict, пришел другой формат'
         raise HomeworkIsNotDict(message)
 
-    homework_name = homework.get('homework_name')
+    homework_name = homework.homework_name
     if homework_name is None:
         raise KeyError('В ответе API отсутствует ожидаемый ключ homework_name')
 
-    homework_status = homework.get('status')
+    homework_status = homework.status
     if homework_status is None:
         raise KeyError('В ответе API отсутствует ожидаемый ключ status')
 
-    verdict = HOMEWORK_STATUSES.get(homework_status)
-    if verdict is None:
-        raise KeyError('Недокументированный статус домашней работы, '
-                       'обнаруженный в ответе API.')
-
-    return f'Изменился статус проверки работы "{homework_name}". {verdict}'
+    return TEMPLATES.render(homework_status, homework_name, locale)
 
 
 def check_tokens() -> bool:
@@ -123,6 +375,9 @@ def check_tokens() -> bool:
         'TELEGRAM_TOKEN': TELEGRAM_TOKEN,
         'TELEGRAM_CHAT_ID': TELEGRAM_CHAT_ID,
     }
+    if SUBSCRIBERS_FILE:
+        # токены Практикума и chat id берутся из реестра подписчиков
+        tokens = {'TELEGRAM_TOKEN': TELEGRAM_TOKEN}
     errors = [key for key, value in tokens.items() if not value]
     if len(errors) == 0:
         return True
@@ -130,46 +385,794 @@ def check_tokens() -> bool:
     return False
 
 
-def main():
-    """Основная логика работы бота."""
-    logger.info('Запуск приложения')
-    if not check_tokens():
-        quit()
+def get_subscribers() -> list:
+    """Returns subscribers from SUBSCRIBERS_FILE or from the env pair.
+
+    TELEGRAM_CHAT_ID may list several chats separated by commas.
+    """
+    if SUBSCRIBERS_FILE:
+        return load_subscribers(SUBSCRIBERS_FILE)
+    chat_ids = [chat_id.strip() for chat_id in TELEGRAM_CHAT_ID.split(',')]
+    return [make_subscriber(PRACTICUM_TOKEN, chat_ids)]
+
+
+def next_cursor(response, fallback: int) -> int:
+    """Returns the server's current_date to send as the next from_date.
+
+    The cursor moves only after a successful poll, so updates landing
+    between the request and the next one are fetched, not lost.
+    """
+    if type(response) is list:
+        response = response[0]
+    current_date = response.get('current_date')
+    if type(current_date) is not int:
+        # без current_date берем время до запроса: не пропустим обновления
+        return fallback
+    return current_date
+
+
+def handle_homeworks(state: SubscriberState, homeworks: list,
+                     changed_at: int = None,
+                     subscriber: Subscriber = None) -> list:
+    """Returns (chats, message) pairs of changes and remembers statuses.
+
+    Statuses are remembered only when every message is rendered, so a
+    failed poll is repeated in full instead of losing notifications.
+    Changes are dated by the server time changed_at and written to
+    EVENT_LOG when the subscriber is known.
+    """
+    state.failures = 0
+    HOMEWORKS_PROCESSED.inc(len(homeworks))
+    changes = detect_changes(state.homework_statuses, homeworks)
+    rendered = render_changes(changes, subscriber)
+    if changed_at is None:
+        changed_at = int(time.time())
+    if EVENT_LOG is not None and subscriber is not None:
+        EVENT_LOG.append(subscriber.chats, changed_at, changes)
+    with state.lock:
+        apply_changes(state.homework_statuses, changes)
+        state.history.extend(
+            Transition(
+                changed_at, change.homework.id,
+                change.homework.homework_name, change.new_status,
+            )
+            for change in changes
+        )
+    STATUS_CHANGES.inc(len(changes))
+    if changes:
+        logger.info(f'Есть обновления: {len(changes)}')
+    else:
+        logger.info('Ничего нового')
+    return hold_for_digest(state, subscriber, changes, rendered)
+
+
+def render_changes(changes: list, subscriber: Subscriber = None) -> list:
+    """Renders changes once per language of the subscriber's chats.
+
+    Returns (chats, messages) pairs; without a subscriber the chats are
+    empty and the messages are in LOCALE.
+    """
+    homeworks = [change.homework for change in changes]
+    if subscriber is None:
+        return [((), TEMPLATES.messages(homeworks))]
+    return [
+        (tuple(chats), TEMPLATES.messages(homeworks, locale))
+        for locale, chats in subscriber.chats_by_locale().items()
+    ]
+
+
+def hold_for_digest(state: SubscriberState, subscriber: Subscriber,
+                    changes: list, rendered: list) -> list:
+    """Passes status messages to DIGEST; returns those to send now.
+
+    Returns (chats, message) pairs, each message goes to the chats of
+    its language.
+    """
+    if DIGEST is None or subscriber is None:
+        return [
+            (chats, message)
+            for chats, messages in rendered for message in messages
+        ]
+    for chats, messages in rendered:
+        DIGEST.add(
+            active_chats(chats, state), subscriber.token, changes, messages
+        )
+    return []
+
+
+def flush_digest(outbox: Outbox, force: bool = False) -> None:
+    """Queues digests whose window is over, all of them if forced."""
+    if DIGEST is None:
+        return
+    for chats, message in DIGEST.pop_due(force=force):
+        outbox.put_many(chats, message)
+
+
+def handle_answer(state: SubscriberState, response, requested_at: int,
+                  subscriber: Subscriber = None) -> list:
+    """Returns (chats, message) pairs of an answer and moves the cursor."""
+    homeworks = check_response(response)
+    cursor = next_cursor(response, requested_at)
+    notifications = handle_homeworks(state, homeworks, cursor, subscriber)
+    state.current_timestamp = cursor
+    return notifications
+
+
+def handle_error(state: SubscriberState, error: Exception) -> list:
+    """Returns the error message if it was not announced yet."""
+    POLL_ERRORS.inc()
+    # ответ не обработан: следующий, даже такой же, разбираем целиком
+    state.validators.clear()
+    if isinstance(error, CircuitOpenError):
+        # о сбое уже сообщили, пока копились ошибки до размыкания
+        logger.warning(str(error))
+        state.failures += 1
+        return []
+
+    message = f'Сбой в работе программы: {error}'
+    logger.error(message)
+    if classify_error(error) == TRANSIENT:
+        state.failures += 1
+    else:
+        # сервер ответил, ошибка в токене или данных: отступать незачем
+        state.failures = 0
+    if not state.error_messages.add(message, time.time(), ERROR_REPEAT_TIME):
+        return []
+    return [message]
+
+
+def active_chats(chats: tuple, state: SubscriberState) -> list:
+    """Returns the chats that did not pause notifications."""
+    # статусы уже запомнены: после /resume старое не придет
+    with state.lock:
+        return [chat_id for chat_id in chats if chat_id not in state.paused]
+
+
+def notify(outbox: Outbox, notifications: list, state: SubscriberState,
+           key: str = None) -> None:
+    """Queues each (chats, message) once to the chats that did not pause."""
+    for chats, message in notifications:
+        outbox.put_many(active_chats(chats, state), message, key=key)
+
+
+def handle_poll(outbox: Outbox, subscriber: Subscriber,
+                state: SubscriberState, requested_at: int, response=None,
+                error: Exception = None) -> None:
+    """Handles the answer or the error of a poll and notifies chats."""
+    if error is None:
+        try:
+            notifications = handle_answer(
+                state, response, requested_at, subscriber
+            )
+        except Exception as e:
+            error = e
+    if error is not None:
+        # ошибки токена касаются только его владельца
+        notifications = [
+            ((subscriber.chat_id,), message)
+            for message in handle_error(state, error)
+        ]
+    # replay сверяет разосланное по чатам с ответами этого токена
+    key = token_key(subscriber.token) if RECORDER is not None else None
+    notify(outbox, notifications, state, key)
+
+
+def poll_subscriber(outbox: Outbox, session, subscriber: Subscriber,
+                    state: SubscriberState) -> None:
+    """Polls ya.practicum for one subscriber and notifies its chats."""
+    requested_at = int(time.time())
+    try:
+        with PRACTICUM_BREAKER.guard():
+            response = request_homework_statuses(
+                state.current_timestamp, subscriber.token, session,
+                validators=state.validators,
+            )
+    except Exception as e:
+        handle_poll(outbox, subscriber, state, requested_at, error=e)
+    else:
+        handle_poll(outbox, subscriber, state, requested_at, response)
+
+
+def wait_polls(futures, deadline: float, wakeup: Wakeup = None) -> set:
+    """Waits for polls until the deadline or shutdown; returns the rest."""
+    ends = time.monotonic() + deadline
+    not_done = set(futures)
+    while not_done:
+        left = ends - time.monotonic()
+        if left <= 0 or (wakeup is not None and wakeup.stopping):
+            break
+        not_done = wait(not_done, timeout=min(left, STOP_CHECK_TIME)).not_done
+    return not_done
+
+
+def poll_all(executor, outbox: Outbox, session, states: dict,
+             deadline: float, wakeup: Wakeup = None) -> tuple:
+    """Polls subscribers with bounded concurrency until the deadline.
+
+    Returns polls still running at the deadline as {subscriber: future}
+    and subscribers whose polls were cancelled before they started.
+    Shutdown cuts the deadline short. Nothing due is not a cycle: the
+    wakeup was for leases or digests, so it is not counted.
+    """
+    if not states:
+        return {}, []
+    started = time.monotonic()
+    futures = {}
+    for subscriber, state in states.items():
+        future = executor.submit(
+            poll_subscriber, outbox, session, subscriber, state
+        )
+        futures[future] = subscriber
+    not_done = wait_polls(futures, deadline, wakeup)
+    running, cancelled = {}, []
+    for future in not_done:
+        subscriber = futures[future]
+        if future.cancel():
+            cancelled.append(subscriber)
+        else:
+            running[subscriber] = future
+    count_cycle(len(states), len(not_done), started, deadline)
+    stats = connection_stats()
+    logger.info(
+        f'Соединения с Практикумом: новых {stats["opened"]}, '
+        f'переиспользовано {stats["reused"]}'
+    )
+    return running, cancelled
 
-    bot = telegram.Bot(token=TELEGRAM_TOKEN)
+
+def count_cycle(polled: int, missed: int, started: float,
+                deadline: float) -> None:
+    """Reports the cycle and whether it missed its deadline."""
+    POLL_CYCLES.inc()
+    CYCLE_SECONDS.observe(time.monotonic() - started)
+    logger.info(
+        f'Опрошено подписчиков: {polled - missed} из {polled} '
+        f'за {time.monotonic() - started:.1f} с'
+    )
+    if missed:
+        DEADLINE_MISSES.inc()
+        POLLS_DEFERRED.inc(missed)
+        logger.warning(
+            f'Цикл не уложился в {deadline:.0f} с, '
+            f'отложено опросов: {missed}'
+        )
+
+
+def settle_in_flight(in_flight: dict, states: dict) -> dict:
+    """Removes finished late polls and returns their states."""
+    finished = {
+        subscriber: states[subscriber]
+        for subscriber, future in in_flight.items() if future.done()
+    }
+    for subscriber in finished:
+        del in_flight[subscriber]
+    return finished
+
+
+def load_states(store: StateStore, subscribers: list) -> dict:
+    """Restores subscribers' states saved by the previous run."""
+    started = time.monotonic()
     current_timestamp = int(time.time())
     # current_timestamp = 0  # для дебага, все домашки с основания веков
-    cache_error_messages = []
-    cache_homework_statuses = {}
+    states = store.load(subscribers, current_timestamp)
+    logger.info(
+        f'Состояние {len(states)} подписчиков загружено '
+        f'за {(time.monotonic() - started) * 1000:.0f} мс'
+    )
+    return states
+
+
+def reschedule(scheduler: PollScheduler, states: dict) -> None:
+    """Puts polled subscribers back into the queue by their state."""
+    now = time.monotonic()
+    for subscriber, state in states.items():
+        scheduler.schedule(subscriber, now + POLL_POLICY.delay(state))
+
+
+def finish_cycle(store: StateStore, scheduler: PollScheduler,
+                 finished: dict, cancelled: list) -> None:
+    """Saves polled subscribers and queues everyone for the next poll."""
+    if not finished and not cancelled:
+        return
+    store.save(finished)
+    reschedule(scheduler, finished)
+    # отмененные по дедлайну опрашиваем в следующем цикле
+    for subscriber in cancelled:
+        scheduler.schedule(subscriber, time.monotonic())
+    logger.info('Ухожу на следующий виток цикла программы')
+
+
+def seconds_until_next_poll(scheduler: PollScheduler,
+                            leases: SubscriberLeases = None) -> float:
+    """Returns how long to sleep before the nearest due subscriber."""
+    # аренду надо продлевать, даже если опрашивать некого
+    limit = CYCLE_DEADLINE if leases is None else LEASE_RENEW_TIME
+    due = [scheduler.next_due()]
+    if DIGEST is not None:
+        due.append(DIGEST.next_due())
+    due = [moment for moment in due if moment is not None]
+    if not due:
+        return limit
+    return min(limit, max(0, min(due) - time.monotonic()))
+
+
+def make_leases(subscribers: list,
+                shard: tuple = None) -> SubscriberLeases:
+    """Returns leases of subscribers or None if COORDINATION is off."""
+    if not COORDINATION:
+        return None
+    backend = LEASE_BACKENDS.get(COORDINATION)
+    if backend is None:
+        raise ValueError(f'Неизвестный бэкенд координации {COORDINATION}')
+    scope = '{}/{}'.format(*shard) if shard else 'all'
+    return SubscriberLeases(
+        backend(LEASE_DB), REPLICA_ID, scope, subscribers,
+        buckets=LEASE_BUCKETS, ttl=LEASE_TIME, renew_time=LEASE_RENEW_TIME,
+        # столько может длиться один опрос
+        margin=CONNECT_TIMEOUT + READ_TIMEOUT,
+    )
+
+
+def start_scheduler(states: dict,
+                    leases: SubscriberLeases = None) -> PollScheduler:
+    """Queues subscribers for the first poll, leased ones when leased."""
+    scheduler = PollScheduler()
+    if leases is None:
+        for subscriber in states:
+            scheduler.schedule(subscriber, time.monotonic())
+    return scheduler
+
+
+def cycle_deadline(leases: SubscriberLeases = None) -> float:
+    """Returns CYCLE_DEADLINE, cut so leases are renewed before they end."""
+    if leases is None:
+        return CYCLE_DEADLINE
+    return min(CYCLE_DEADLINE, LEASE_TIME - LEASE_RENEW_TIME)
+
+
+def pop_due(scheduler: PollScheduler, states: dict,
+            leases: SubscriberLeases = None) -> dict:
+    """Returns states of the due subscribers this replica holds."""
+    now = time.monotonic()
+    earliest = scheduler.next_due()
+    if earliest is not None and earliest <= now:
+        LOOP_LAG_SECONDS.observe(now - earliest)
+    return {
+        subscriber: states[subscriber]
+        for subscriber in scheduler.pop_due(now)
+        if leases is None or leases.owns(subscriber)
+    }
+
+
+def sync_leases(leases: SubscriberLeases, store: StateStore,
+                scheduler: PollScheduler, states: dict) -> None:
+    """Starts polling subscribers of gained leases, stops the lost ones."""
+    if leases is None:
+        return
+    gained, lost = leases.refresh()
+    for subscriber in lost:
+        scheduler.discard(subscriber)
+    if gained:
+        # курсор и статусы могла сдвинуть копия, державшая аренду раньше
+        states.update(store.load(gained, int(time.time())))
+        for subscriber in gained:
+            scheduler.schedule(subscriber, time.monotonic())
+    if gained or lost:
+        logger.info(
+            f'Аренда: получено подписчиков {len(gained)}, '
+            f'отдано {len(lost)}'
+        )
+
+
+def poll_now(scheduler: PollScheduler, states: dict,
+             leases: SubscriberLeases = None, busy=()) -> None:
+    """Queues every held subscriber, except busy ones, for a poll now."""
+    now = time.monotonic()
+    for subscriber in states:
+        if subscriber in busy:
+            continue
+        if leases is None or leases.owns(subscriber):
+            scheduler.schedule(subscriber, now)
+    logger.info('Внеочередной опрос всех подписчиков')
+
+
+def drain_outbox(outbox: Outbox, timeout: float) -> None:
+    """Waits for queued messages to be sent and reports the rest."""
+    if outbox.join(timeout):
+        return
+    fate = 'сохранены до запуска' if PERSIST_OUTBOX else 'потеряны'
+    logger.warning(
+        f'Остановка: не отправлено сообщений {len(outbox)}, они {fate}'
+    )
+
+
+def shutdown_threaded(executor, in_flight: dict, states: dict,
+                      store: StateStore, outbox: Outbox,
+                      sender: OutboxSender) -> None:
+    """Finishes late polls and sends within SHUTDOWN_TIMEOUT, saves state."""
+    logger.info('Остановка: дожидаюсь опросов и отправки сообщений')
+    deadline = time.monotonic() + SHUTDOWN_TIMEOUT
+    wait(list(in_flight.values()), timeout=SHUTDOWN_TIMEOUT)
+    store.save(settle_in_flight(in_flight, states))
+    executor.shutdown(wait=False, cancel_futures=True)
+    flush_digest(outbox, force=True)
+    drain_outbox(outbox, max(0, deadline - time.monotonic()))
+    sender.stop(timeout=max(0, deadline - time.monotonic()))
+    store.close()
+
+
+def make_outbox(shard: tuple = None) -> Outbox:
+    """Creates the outbox, kept in STATE_DB if PERSIST_OUTBOX is on.
+
+    A shard (index, count) gets its own queue in the table and an equal
+    part of the bot's Telegram rate.
+    """
+    index, count = shard or (0, 1)
+    store = None
+    if PERSIST_OUTBOX:
+        queue = f'{index}/{count}' if shard else ''
+        store = OutboxStore(STATE_DB, queue=queue)
+    outbox = Outbox(
+        global_rate=TELEGRAM_RATE / count,
+        chat_rate=TELEGRAM_CHAT_RATE,
+        store=store,
+    )
+    if len(outbox):
+        logger.info(f'Сообщений в очереди с прошлого запуска: {len(outbox)}')
+    return outbox
+
+
+def start_commands(states: dict, outbox: Outbox, store: StateStore,
+                   shard: tuple = None,
+                   leases: SubscriberLeases = None) -> Updater:
+    """Starts answering chat commands, returns the updater or None.
+
+    Updates are long-polled with getUpdates or, with COMMANDS=webhook,
+    pushed by Telegram to WEBHOOK_URL. Telegram gives updates of a bot
+    to a single consumer, so commands are off with SHARDS and
+    COORDINATION, where several processes hold parts of the cache.
+    """
+    if COMMANDS == 'off':
+        return None
+    if shard or leases:
+        logger.warning('Команды боту не работают с SHARDS и COORDINATION')
+        return None
+    if COMMANDS not in ('polling', 'webhook'):
+        raise ValueError(f'Неизвестный режим команд {COMMANDS}')
+    if COMMANDS == 'webhook' and not WEBHOOK_URL:
+        raise ValueError('Для COMMANDS=webhook нужен WEBHOOK_URL')
+    handlers = CommandHandlers(states, TEMPLATES, outbox, store)
+    updater = Updater(token=TELEGRAM_TOKEN)
+    updater.dispatcher.add_handler(
+        CommandHandler(handlers.commands, handlers.on_update)
+    )
+    if COMMANDS == 'webhook':
+        updater.start_webhook(
+            listen=WEBHOOK_LISTEN, port=WEBHOOK_PORT,
+            url_path=TELEGRAM_TOKEN,
+            webhook_url=f'{WEBHOOK_URL.rstrip("/")}/{TELEGRAM_TOKEN}',
+        )
+    else:
+        updater.start_polling()
+    logger.info(f'Команды боту: {COMMANDS}')
+    return updater
+
+
+def stop_commands(updater: Updater) -> None:
+    """Stops receiving chat commands."""
+    if updater is not None:
+        updater.stop()
+
+
+def run_threaded(subscribers: list, wakeup: Wakeup,
+                 shard: tuple = None) -> None:
+    """Polls subscribers with a pool of threads until the wakeup stops."""
+    # пул соединений Telegram не меньше числа отправителей
+    bot = telegram.Bot(
+        token=TELEGRAM_TOKEN,
+        request=Request(con_pool_size=OUTBOX_WORKERS + 1),
+    )
+    outbox = make_outbox(shard)
+    sender = OutboxSender(
+        outbox, bot, logger, workers=OUTBOX_WORKERS, recorder=RECORDER
+    )
+    sender.start()
+    store = StateStore(STATE_DB)
+    states = load_states(store, subscribers)
+    session = PooledSession(
+        pool_size=POLL_CONCURRENCY,
+        connect_timeout=CONNECT_TIMEOUT,
+        read_timeout=READ_TIMEOUT,
+    )
+
+    leases = make_leases(subscribers, shard)
+    scheduler = start_scheduler(states, leases)
+    updater = start_commands(states, outbox, store, shard, leases)
 
+    # опросы, не успевшие к дедлайну: не планируем их, пока не закончатся
+    in_flight = {}
+    executor = ThreadPoolExecutor(max_workers=POLL_CONCURRENCY)
+    with session:
+        while not wakeup.stopping:
+            if wakeup.take_poll_request():
+                poll_now(scheduler, states, leases, busy=in_flight)
+            sync_leases(leases, store, scheduler, states)
+            due = pop_due(scheduler, states, leases)
+            running, cancelled = poll_all(
+                executor, outbox, session, due, cycle_deadline(leases),
+                wakeup,
+            )
+            in_flight.update(running)
+            finished = {
+                subscriber: state for subscriber, state in due.items()
+                if subscriber not in running and subscriber not in cancelled
+            }
+            finished.update(settle_in_flight(in_flight, states))
+            finish_cycle(store, scheduler, finished, cancelled)
+            flush_digest(outbox)
+            wakeup.wait(seconds_until_next_poll(scheduler, leases))
+        stop_commands(updater)
+        shutdown_threaded(executor, in_flight, states, store, outbox, sender)
+
+
+def bot_api_error(status: int, answer: dict) -> Exception:
+    """Returns the telegram.error matching a failed Bot API answer."""
+    description = answer.get('description', f'код {status}')
+    if status == requests.codes.too_many_requests:
+        parameters = answer.get('parameters') or {}
+        return telegram.error.RetryAfter(parameters.get('retry_after', 1))
+    if status == requests.codes.bad_request:
+        return telegram.error.BadRequest(description)
+    if status in (requests.codes.unauthorized, requests.codes.forbidden):
+        return telegram.error.Unauthorized(description)
+    return telegram.error.NetworkError(description)
+
+
+async def async_post_message(session, chat_id, message) -> None:
+    """Sends a message via Bot API, raises telegram.error on failure."""
+    url = TELEGRAM_SEND_URL.format(token=TELEGRAM_TOKEN)
+    async with session.post(
+        url, json={'chat_id': chat_id, 'text': message}
+    ) as response:
+        if response.status == requests.codes.ok:
+            return
+        try:
+            answer = await response.json(content_type=None)
+        except ValueError:
+            answer = {}
+    raise bot_api_error(response.status, answer or {})
+
+
+async def async_deliver(session, outbox: Outbox) -> None:
+    """Sends outbox messages forever from the event loop."""
     while True:
+        message, wait = outbox.take(time.monotonic())
+        if message is None:
+            # новые сообщения кладутся без побудки, поэтому спим недолго
+            wait = OUTBOX_IDLE_WAIT if wait is None else wait
+            await asyncio.sleep(min(wait, OUTBOX_IDLE_WAIT))
+            continue
         try:
-            response = get_api_answer(current_timestamp)
-            homeworks = check_response(response)
-            for homework in homeworks:
-                homework_id = homework['id']
-                homework_st = homework['status']
-                if cache_homework_statuses.get(homework_id) != homework_st:
-                    message = parse_status(homework)
-                    send_message(bot, message)
-                    cache_homework_statuses.update(
-                        homework_id=homework_st
+            with SEND_SECONDS.time():
+                await async_post_message(
+                    session, message.chat_id, message.text
+                )
+        except Exception as e:
+            if outbox.fail(message, e):
+                logger.warning(
+                    f'Cбой при отправке сообщения в Telegram, повторим: {e}'
+                )
+            else:
+                logger.error(f'Telegram не принял сообщение, оно удалено: {e}')
+        else:
+            outbox.done(message)
+            if RECORDER is not None:
+                RECORDER.telegram(
+                    message.chat_id, message.text, message.notification,
+                    message.key,
+                )
+            logger.info('Удачная отправка сообщения в Telegram.')
+
+
+async def async_get_api_answer(session, current_timestamp: int, token: str,
+                               validators: AnswerValidators = None) -> dict:
+    """Makes a non-blocking request to ya.practicum for a certain token."""
+    params = {'from_date': current_timestamp}
+    headers = make_headers(token)
+    if validators is not None:
+        headers.update(validators.headers())
+    try:
+        with REQUEST_SECONDS.time():
+            async with session.get(
+                ENDPOINT, headers=headers, params=params
+            ) as response:
+                logger.info('Обратился к Яндекс.Практикум')
+                body = await response.read()
+                if RECORDER is not None:
+                    RECORDER.practicum(
+                        token, response.status, body.decode(errors='replace')
+                    )
+                if validators is not None:
+                    answer = skip_unchanged(
+                        validators, response.status, response.headers, body,
+                        current_timestamp,
                     )
-                    logger.info('Есть обновления')
-                else:
-                    logger.info('Ничего нового')
+                    if answer is not None:
+                        return answer
+                if response.status != requests.codes.ok:
+                    message = f'Недоступен {ENDPOINT}, код: {response.status}'
+                    raise requests.HTTPError(message, response=response)
+        with DECODE_SECONDS.time():
+            response = decode_json(body)
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        raise ForeignServerError(e)
+    return check_api_errors(response)
 
+
+async def async_poll_subscriber(session, semaphore, outbox: Outbox,
+                                subscriber: Subscriber,
+                                state: SubscriberState) -> None:
+    """Polls ya.practicum for one subscriber inside the event loop."""
+    async with semaphore:
+        requested_at = int(time.time())
+        try:
+            with PRACTICUM_BREAKER.guard():
+                response = await async_get_api_answer(
+                    session, state.current_timestamp, subscriber.token,
+                    validators=state.validators,
+                )
         except Exception as e:
-            message = f'Сбой в работе программы: {e}'
-            logger.error(message)
-            if message not in cache_error_messages:
-                cache_error_messages.append(message)
-                send_message(bot, message)
-
-        finally:
-            logger.info('Ухожу на следующий виток цикла программы')
-            current_timestamp = int(time.time())
-            time.sleep(RETRY_TIME)
+            handle_poll(outbox, subscriber, state, requested_at, error=e)
+        else:
+            handle_poll(outbox, subscriber, state, requested_at, response)
+
+
+async def async_poll_all(session, semaphore, outbox: Outbox, states: dict,
+                         deadline: float, wakeup: Wakeup = None) -> list:
+    """Polls subscribers until the deadline or shutdown, cancels the rest.
+
+    A poll is cancelled only while it waits for the network, before its
+    state is touched, so cancelled subscribers are safe to poll again.
+    Nothing due is not counted as a cycle.
+    """
+    if not states:
+        return []
+    started = time.monotonic()
+    tasks = {
+        asyncio.create_task(async_poll_subscriber(
+            session, semaphore, outbox, subscriber, state
+        )): subscriber
+        for subscriber, state in states.items()
+    }
+    not_done = set(tasks)
+    while not_done:
+        left = started + deadline - time.monotonic()
+        if left <= 0 or (wakeup is not None and wakeup.stopping):
+            break
+        not_done = (await asyncio.wait(
+            not_done, timeout=min(left, STOP_CHECK_TIME)
+        ))[1]
+    for task in not_done:
+        task.cancel()
+    await asyncio.gather(*not_done, return_exceptions=True)
+    count_cycle(len(states), len(not_done), started, deadline)
+    return [tasks[task] for task in not_done]
+
+
+async def async_main(subscribers: list, wakeup: Wakeup,
+                     shard: tuple = None) -> None:
+    """Polls subscribers from a single thread until the wakeup stops."""
+    store = StateStore(STATE_DB)
+    states = load_states(store, subscribers)
+    semaphore = asyncio.Semaphore(POLL_CONCURRENCY)
+    connector = aiohttp.TCPConnector(limit=POLL_CONCURRENCY + 1)
+    timeout = aiohttp.ClientTimeout(
+        sock_connect=CONNECT_TIMEOUT, sock_read=READ_TIMEOUT
+    )
+
+    leases = make_leases(subscribers, shard)
+    scheduler = start_scheduler(states, leases)
+    outbox = make_outbox(shard)
+    updater = start_commands(states, outbox, store, shard, leases)
+
+    async with aiohttp.ClientSession(
+        connector=connector, timeout=timeout
+    ) as session:
+        # ссылки на задачи держим, иначе их может собрать сборщик мусора
+        senders = [
+            asyncio.create_task(async_deliver(session, outbox))
+            for _ in range(OUTBOX_WORKERS)
+        ]
+        while not wakeup.stopping:
+            if wakeup.take_poll_request():
+                poll_now(scheduler, states, leases)
+            sync_leases(leases, store, scheduler, states)
+            due = pop_due(scheduler, states, leases)
+            cancelled = await async_poll_all(
+                session, semaphore, outbox, due, cycle_deadline(leases),
+                wakeup,
+            )
+            finished = {
+                subscriber: state for subscriber, state in due.items()
+                if subscriber not in cancelled
+            }
+            finish_cycle(store, scheduler, finished, cancelled)
+            flush_digest(outbox)
+            await wakeup.async_wait(seconds_until_next_poll(scheduler, leases))
+
+        # опросы прерваны в async_poll_all, осталось отправить очередь
+        await asyncio.to_thread(stop_commands, updater)
+        flush_digest(outbox, force=True)
+        logger.info('Остановка: дожидаюсь отправки сообщений')
+        await asyncio.to_thread(drain_outbox, outbox, SHUTDOWN_TIMEOUT)
+        for sender in senders:
+            sender.cancel()
+        await asyncio.gather(*senders, return_exceptions=True)
+    store.close()
+
+
+def run_polling(subscribers: list, shard: tuple = None) -> None:
+    """Polls subscribers with the POLLING_MODE runner until SIGTERM."""
+    if POLLING_MODE not in ('threads', 'async'):
+        raise ValueError(f'Неизвестный режим опроса {POLLING_MODE}')
+    wakeup = Wakeup()
+    wakeup.handle_signals()
+    if POLLING_MODE == 'async':
+        asyncio.run(async_main(subscribers, wakeup, shard))
+    else:
+        run_threaded(subscribers, wakeup, shard)
+    wakeup.close()
+    if RECORDER is not None:
+        RECORDER.close()
+    if EVENT_LOG is not None:
+        EVENT_LOG.close()
+    logger.info('Бот остановлен')
+
+
+def run_shard(index: int, count: int, metrics_queue) -> None:
+    """Polls one shard of subscribers, entry point of a worker process."""
+    global RECORDER, EVENT_LOG
+    if RECORDER is not None:
+        # шарды пишут каждый в свой файл, иначе потоки gzip перемешаются
+        RECORDER = Recorder(f'{RECORD_FILE}.{index}')
+    if EVENT_LOG is not None:
+        # у журнала и его индекса один писатель
+        EVENT_LOG = EventLog(f'{EVENTS_FILE}.{index}')
+    report_metrics(metrics_queue, index, METRICS_REPORT_TIME)
+    subscribers = [
+        subscriber for subscriber in get_subscribers()
+        if shard_of(subscriber.token, count) == index
+    ]
+    logger.info(f'Шард {index} из {count}: подписчиков {len(subscribers)}')
+    run_polling(subscribers, shard=(index, count))
+
+
+def serve_metrics(source) -> None:
+    """Opens /metrics on METRICS_PORT unless it is 0."""
+    if not METRICS_PORT:
+        return
+    metrics.serve(METRICS_HOST, METRICS_PORT, source)
+    logger.info(f'Метрики: http://{METRICS_HOST}:{METRICS_PORT}/metrics')
+
+
+def main():
+    """Основная логика работы бота."""
+    logger.info('Запуск приложения')
+    if not check_tokens():
+        quit()
+
+    if SHARDS > 1:
+        wakeup = Wakeup()
+        wakeup.handle_signals()
+        supervisor = ShardSupervisor(SHARDS, run_shard, logger)
+        serve_metrics(supervisor.merged_metrics)
+        supervisor.run(
+            wakeup, poll_signal=POLL_SIGNAL,
+            stop_timeout=SHUTDOWN_TIMEOUT + STOP_CHECK_TIME,
+        )
+    else:
+        serve_metrics(metrics.snapshot)
+        run_polling(get_subscribers())
 
 
 if __name__ == '__main__':
@@ -0,0 +1,134 @@
+import hashlib
+import re
+from dataclasses import dataclass
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+import metrics
+
+CONNECTIONS_OPENED = metrics.counter(
+    'practicum_connections_opened_total',
+    'Connections to Practicum opened with a new TCP/TLS handshake.',
+)
+CONNECTIONS_REUSED = metrics.counter(
+    'practicum_connections_reused_total',
+    'Requests to Practicum sent over a kept-alive connection.',
+)
+
+# курсор меняется в каждом ответе, поэтому в хэш тела не входит
+CURSOR_FIELD = re.compile(rb'"current_date"\s*:\s*(-?\d+)')
+
+
+class CountingPoolMixin:
+    """Counts whether a pooled connection is reused or opened anew."""
+
+    def _get_conn(self, timeout=None):
+        conn = super()._get_conn(timeout=timeout)
+        # sock пуст у нового соединения и у сброшенного сервером
+        if conn.sock is None:
+            CONNECTIONS_OPENED.inc()
+        else:
+            CONNECTIONS_REUSED.inc()
+        return conn
+
+
+class CountingHTTPConnectionPool(CountingPoolMixin, HTTPConnectionPool):
+    """HTTP pool reporting connection reuse."""
+
+    pass
+
+
+class CountingHTTPSConnectionPool(CountingPoolMixin, HTTPSConnectionPool):
+    """HTTPS pool reporting connection reuse."""
+
+    pass
+
+
+class CountingHTTPAdapter(HTTPAdapter):
+    """HTTPAdapter whose pools report connection reuse."""
+
+    def init_poolmanager(self, *args, **kwargs):
+        """Installs the counting pool classes."""
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': CountingHTTPConnectionPool,
+            'https': CountingHTTPSConnectionPool,
+        }
+
+
+class PooledSession(requests.Session):
+    """Keep-alive session with a sized pool and explicit timeouts."""
+
+    def __init__(self, pool_size: int = 10, connect_timeout: float = 3.05,
+                 read_timeout: float = 10):
+        """Mounts one counting adapter for http and https."""
+        super().__init__()
+        self.timeout = (connect_timeout, read_timeout)
+        # pool_block не дает открыть больше pool_size соединений на хост
+        adapter = CountingHTTPAdapter(
+            pool_connections=4, pool_maxsize=pool_size, pool_block=True
+        )
+        self.mount('https://', adapter)
+        self.mount('http://', adapter)
+
+    def request(self, method, url, **kwargs):
+        """Sends a request with the session timeouts unless given."""
+        kwargs.setdefault('timeout', self.timeout)
+        return super().request(method, url, **kwargs)
+
+
+def connection_stats() -> dict:
+    """Returns how many connections were opened and reused so far."""
+    return {
+        'opened': CONNECTIONS_OPENED.value,
+        'reused': CONNECTIONS_REUSED.value,
+    }
+
+
+@dataclass
+class AnswerValidators:
+    """What the last answer to one subscriber looked like.
+
+    ETag and Last-Modified go back to the server as conditional headers.
+    The body hash, taken without the ever-moving current_date, catches
+    repeated answers from servers that send neither.
+    """
+
+    etag: str = None
+    last_modified: str = None
+    body_hash: bytes = None
+
+    def headers(self) -> dict:
+        """Returns conditional request headers."""
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+    def remember(self, headers) -> None:
+        """Keeps the validators of a full answer."""
+        self.etag = headers.get('ETag')
+        self.last_modified = headers.get('Last-Modified')
+
+    def is_repeat(self, body: bytes) -> bool:
+        """Returns True if the body matches the last one, remembers it."""
+        digest = hashlib.blake2b(
+            CURSOR_FIELD.sub(b'', body), digest_size=16
+        ).digest()
+        repeat = digest == self.body_hash
+        self.body_hash = digest
+        return repeat
+
+    def clear(self) -> None:
+        """Forgets the last answer, so the next one is handled in full."""
+        self.etag = self.last_modified = self.body_hash = None
+
+
+def cursor_of(body: bytes):
+    """Returns current_date of a raw answer without decoding it, or None."""
+    match = CURSOR_FIELD.search(body)
+    return int(match.group(1)) if match else None
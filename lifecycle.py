@@ -0,0 +1,96 @@
+import asyncio
+import os
+import select
+import signal
+
+# сигналы остановки: docker/systemd шлют SIGTERM, терминал — SIGINT
+STOP_SIGNALS = (signal.SIGTERM, signal.SIGINT)
+# kill -USR1 <pid> — опросить всех подписчиков, не дожидаясь расписания
+POLL_SIGNAL = getattr(signal, 'SIGUSR1', None)
+
+
+class Wakeup:
+    """Interruptible sleep of the polling loop.
+
+    The loop waits on a pipe instead of time.sleep(): a shutdown signal
+    or a "poll now" request writes a byte and the loop wakes at once.
+    A write is async-signal-safe and is not lost if it comes before the
+    loop starts waiting.
+    """
+
+    def __init__(self):
+        """Opens the wakeup pipe."""
+        self._reader, self._writer = os.pipe()
+        os.set_blocking(self._reader, False)
+        os.set_blocking(self._writer, False)
+        self.stopping = False
+        self._poll_requested = False
+
+    def close(self) -> None:
+        """Closes the pipe."""
+        os.close(self._reader)
+        os.close(self._writer)
+
+    def _set(self) -> None:
+        try:
+            os.write(self._writer, b'\0')
+        except BlockingIOError:
+            # канал полон: побудка уже ждет читателя
+            pass
+
+    def _drain(self) -> None:
+        try:
+            while os.read(self._reader, 512):
+                pass
+        except BlockingIOError:
+            pass
+
+    def stop(self) -> None:
+        """Asks the loop to shut down."""
+        self.stopping = True
+        self._set()
+
+    def poll_now(self) -> None:
+        """Asks the loop to poll everyone before the schedule says so."""
+        self._poll_requested = True
+        self._set()
+
+    def take_poll_request(self) -> bool:
+        """Returns whether poll_now() was called since the last check."""
+        requested, self._poll_requested = self._poll_requested, False
+        return requested
+
+    def wait(self, timeout: float) -> None:
+        """Sleeps up to timeout seconds or until woken."""
+        if not self.stopping:
+            select.select([self._reader], [], [], timeout)
+        self._drain()
+
+    async def async_wait(self, timeout: float) -> None:
+        """Sleeps up to timeout seconds or until woken, inside the loop."""
+        loop = asyncio.get_running_loop()
+        woken = loop.create_future()
+
+        def wake():
+            if not woken.done():
+                woken.set_result(None)
+
+        loop.add_reader(self._reader, wake)
+        try:
+            if not self.stopping:
+                await asyncio.wait_for(woken, timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            loop.remove_reader(self._reader)
+        self._drain()
+
+    def handle_signals(self) -> None:
+        """Routes stop signals and SIGUSR1 to this wakeup.
+
+        Works only from the main thread, as signal handlers do.
+        """
+        for number in STOP_SIGNALS:
+            signal.signal(number, lambda *args: self.stop())
+        if POLL_SIGNAL is not None:
+            signal.signal(POLL_SIGNAL, lambda *args: self.poll_now())
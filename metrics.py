@@ -0,0 +1,178 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+REGISTRY = {}
+_registry_lock = threading.Lock()
+
+# границы корзин в секундах: от быстрого разбора JSON до таймаута запроса
+DEFAULT_BUCKETS = (
+    0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60,
+)
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+class Counter:
+    """Thread-safe monotonically increasing counter."""
+
+    kind = 'counter'
+
+    def __init__(self, name: str, documentation: str):
+        """Starts the counter at zero."""
+        self.name = name
+        self.documentation = documentation
+        self._value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: int = 1) -> None:
+        """Increases the counter."""
+        with self._lock:
+            self._value += amount
+
+    @property
+    def value(self) -> int:
+        """Current value of the counter."""
+        return self._value
+
+    def samples(self) -> list:
+        """Returns (sample name, value) pairs in exposition order."""
+        return [(self.name, self._value)]
+
+
+class Histogram:
+    """Thread-safe distribution of observed values over fixed buckets.
+
+    Samples follow Prometheus: cumulative name_bucket{le="..."} counts,
+    name_sum and name_count, so snapshots of several processes add up.
+    """
+
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str,
+                 buckets: tuple = DEFAULT_BUCKETS):
+        """Starts with empty buckets."""
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        """Records one value."""
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+
+    @contextmanager
+    def time(self):
+        """Observes the seconds spent in the with block."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started)
+
+    @property
+    def count(self) -> int:
+        """How many values were observed."""
+        return sum(self._counts)
+
+    def samples(self) -> list:
+        """Returns (sample name, value) pairs in exposition order."""
+        with self._lock:
+            counts, total = list(self._counts), self._sum
+        samples, cumulative = [], 0
+        for bound, count in zip(self.buckets + ('+Inf',), counts):
+            cumulative += count
+            samples.append((f'{self.name}_bucket{{le="{bound}"}}', cumulative))
+        samples.append((f'{self.name}_sum', total))
+        samples.append((f'{self.name}_count', cumulative))
+        return samples
+
+
+def _register(cls, name: str, documentation: str, **kwargs):
+    with _registry_lock:
+        if name not in REGISTRY:
+            REGISTRY[name] = cls(name, documentation, **kwargs)
+        return REGISTRY[name]
+
+
+def counter(name: str, documentation: str = '') -> Counter:
+    """Returns the registered counter, creating it on first use."""
+    return _register(Counter, name, documentation)
+
+
+def histogram(name: str, documentation: str = '',
+              buckets: tuple = DEFAULT_BUCKETS) -> Histogram:
+    """Returns the registered histogram, creating it on first use."""
+    return _register(Histogram, name, documentation, buckets=buckets)
+
+
+def snapshot() -> dict:
+    """Returns current values of all samples of this process."""
+    with _registry_lock:
+        items = list(REGISTRY.values())
+    return {
+        name: value for item in items for name, value in item.samples()
+    }
+
+
+def merge(snapshots: list) -> dict:
+    """Sums counter snapshots taken in several processes."""
+    merged = {}
+    for values in snapshots:
+        for name, value in values.items():
+            merged[name] = merged.get(name, 0) + value
+    return merged
+
+
+def render(values: dict = None) -> str:
+    """Returns samples in the Prometheus text format.
+
+    values is a snapshot, possibly merged from several processes; by
+    default the samples of this process are rendered.
+    """
+    values = snapshot() if values is None else values
+    with _registry_lock:
+        items = sorted(REGISTRY.values(), key=lambda item: item.name)
+    lines = []
+    for item in items:
+        lines.append(f'# HELP {item.name} {item.documentation}')
+        lines.append(f'# TYPE {item.name} {item.kind}')
+        for name, _ in item.samples():
+            lines.append(f'{name} {values.get(name, 0)}')
+    return '\n'.join(lines) + '\n'
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    """Answers GET /metrics with the server's source rendered."""
+
+    def do_GET(self):
+        """Serves /metrics, anything else is 404."""
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+            return
+        body = render(self.server.source()).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        """Keeps scrapes out of the bot's log."""
+
+
+def serve(host: str, port: int, source=snapshot) -> ThreadingHTTPServer:
+    """Starts /metrics in a daemon thread; source() returns a snapshot."""
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    server.source = source
+    threading.Thread(
+        target=server.serve_forever, name='metrics', daemon=True
+    ).start()
+    return server
@@ -0,0 +1,304 @@
+import heapq
+import itertools
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+
+import telegram
+
+import metrics
+
+MESSAGES_SENT = metrics.counter(
+    'telegram_messages_sent_total', 'Messages delivered to Telegram.'
+)
+MESSAGES_RETRIED = metrics.counter(
+    'telegram_messages_retried_total', 'Deliveries postponed after an error.'
+)
+MESSAGES_DROPPED = metrics.counter(
+    'telegram_messages_dropped_total',
+    'Messages Telegram refused for good: bad request, blocked bot.',
+)
+SEND_SECONDS = metrics.histogram(
+    'telegram_send_seconds', 'Time of one Telegram sendMessage call.'
+)
+
+# Telegram отвечает так навсегда: повтор не поможет
+PERMANENT_ERRORS = (
+    telegram.error.BadRequest,
+    telegram.error.Unauthorized,
+    telegram.error.ChatMigrated,
+    telegram.error.InvalidToken,
+)
+
+
+@dataclass
+class OutgoingMessage:
+    """Telegram message waiting in the outbox."""
+
+    chat_id: str
+    text: str
+    attempts: int = 0
+    # номер строки в OutboxStore, если очередь сохраняется на диск
+    row_id: int = None
+    # False — ответ на команду, а не уведомление о статусе
+    notification: bool = True
+    # token_key подписчика для RECORD_FILE, если сообщение пишется
+    key: str = None
+
+
+class TokenBucket:
+    """Allows events at rate per second with bursts up to capacity."""
+
+    def __init__(self, rate: float, capacity: float):
+        """Starts with a full bucket."""
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        elapsed = max(0, now - self.updated)
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+        self.updated = now
+
+    def delay(self, now: float) -> float:
+        """Returns seconds until a token is available."""
+        self._refill(now)
+        if self.tokens >= 1:
+            return 0
+        return (1 - self.tokens) / self.rate
+
+    def consume(self, now: float) -> None:
+        """Takes one token."""
+        self._refill(now)
+        self.tokens -= 1
+
+
+class Outbox:
+    """Queue of Telegram messages delivered under Telegram's limits.
+
+    Messages of one chat leave strictly in order and no faster than
+    chat_rate (group_rate for group chats); all chats together share a
+    global token bucket. Failed deliveries are put back with backoff.
+    """
+
+    def __init__(self, global_rate: float = 30, chat_rate: float = 1,
+                 group_rate: float = 20 / 60, retry_base: float = 1,
+                 retry_max: float = 60, store=None):
+        """Restores messages left in the store by the previous run."""
+        self.chat_rate = chat_rate
+        self.group_rate = group_rate
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        self.store = store
+        self._global = TokenBucket(global_rate, global_rate)
+        self._chats = {}
+        # чаты с сообщениями, готовые к отправке, по времени готовности
+        self._ready = []
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        if store is not None:
+            for row_id, chat_id, text in store.load():
+                self._append(OutgoingMessage(chat_id, text, row_id=row_id))
+
+    def __len__(self):
+        """Returns how many messages wait for delivery."""
+        with self._condition:
+            return sum(len(queue) for queue in self._chats.values())
+
+    def put(self, chat_id, text: str, notification: bool = True,
+            key: str = None) -> None:
+        """Queues a message; never blocks on Telegram."""
+        self.put_many((chat_id,), text, notification, key)
+
+    def put_many(self, chat_ids, text: str, notification: bool = True,
+                 key: str = None) -> None:
+        """Queues one text to several chats, each chat once.
+
+        The chats share the text object, its rows are saved in one
+        transaction and the queue is locked once for all of them.
+        Replies to commands are not saved: after a restart they are stale.
+        """
+        chat_ids = list(dict.fromkeys(str(chat_id) for chat_id in chat_ids))
+        if not chat_ids:
+            return
+        messages = [
+            OutgoingMessage(
+                chat_id, text, notification=notification, key=key
+            )
+            for chat_id in chat_ids
+        ]
+        if self.store is not None and notification:
+            row_ids = self.store.add_many(chat_ids, text)
+            for message, row_id in zip(messages, row_ids):
+                message.row_id = row_id
+        with self._condition:
+            for message in messages:
+                self._append(message)
+            self._condition.notify(len(messages))
+
+    def _append(self, message: OutgoingMessage) -> None:
+        queue = self._chats.get(message.chat_id)
+        if queue is None:
+            queue = self._chats[message.chat_id] = deque()
+            self._push(message.chat_id, time.monotonic())
+        queue.append(message)
+
+    def _push(self, chat_id: str, ready_at: float) -> None:
+        heapq.heappush(self._ready, (ready_at, next(self._sequence), chat_id))
+
+    def take(self, now: float):
+        """Returns (message, 0) to send now or (None, seconds to wait).
+
+        The taken chat is in flight until done(), retry() or drop(),
+        so one chat never has two messages on the way.
+        """
+        with self._condition:
+            if not self._ready:
+                return None, None
+            ready_at = self._ready[0][0]
+            wait = max(ready_at - now, self._global.delay(now))
+            if wait > 0:
+                return None, wait
+            chat_id = heapq.heappop(self._ready)[2]
+            self._global.consume(now)
+            return self._chats[chat_id][0], 0
+
+    def get(self, timeout: float):
+        """Blocks up to timeout for a message that may be sent now."""
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            while True:
+                now = time.monotonic()
+                message, wait = self.take(now)
+                if message is not None or now >= deadline:
+                    return message
+                wait = deadline - now if wait is None else wait
+                self._condition.wait(min(wait, deadline - now))
+
+    def join(self, timeout: float) -> bool:
+        """Waits until the outbox is empty; False if time ran out."""
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            while self._chats:
+                left = deadline - time.monotonic()
+                if left <= 0:
+                    return False
+                self._condition.wait(left)
+            return True
+
+    def done(self, message: OutgoingMessage) -> None:
+        """Removes a delivered message and releases its chat."""
+        MESSAGES_SENT.inc()
+        self._finish(message)
+
+    def drop(self, message: OutgoingMessage) -> None:
+        """Removes a message Telegram will never accept."""
+        MESSAGES_DROPPED.inc()
+        self._finish(message)
+
+    def retry(self, message: OutgoingMessage, delay: float = None) -> None:
+        """Puts the message back to be sent after a backoff delay."""
+        MESSAGES_RETRIED.inc()
+        message.attempts += 1
+        if delay is None:
+            delay = min(
+                self.retry_max, self.retry_base * 2 ** (message.attempts - 1)
+            )
+        with self._condition:
+            self._push(message.chat_id, time.monotonic() + delay)
+            self._condition.notify()
+
+    def fail(self, message: OutgoingMessage, error: Exception) -> bool:
+        """Retries or drops the message by the error; True if retried."""
+        if isinstance(error, PERMANENT_ERRORS):
+            self.drop(message)
+            return False
+        if isinstance(error, telegram.error.RetryAfter):
+            self.retry(message, error.retry_after)
+        else:
+            self.retry(message)
+        return True
+
+    def _finish(self, message: OutgoingMessage) -> None:
+        if self.store is not None:
+            self.store.remove(message.row_id)
+        with self._condition:
+            queue = self._chats[message.chat_id]
+            queue.popleft()
+            if not queue:
+                del self._chats[message.chat_id]
+                if not self._chats:
+                    # будим join(): очередь опустела
+                    self._condition.notify_all()
+                return
+            # групповые чаты Telegram пропускает реже личных
+            rate = (
+                self.group_rate if message.chat_id.startswith('-')
+                else self.chat_rate
+            )
+            self._push(message.chat_id, time.monotonic() + 1 / rate)
+            self._condition.notify()
+
+
+class OutboxSender:
+    """Delivers outbox messages through a bot with a pool of threads."""
+
+    def __init__(self, outbox: Outbox, bot, logger, workers: int = 4,
+                 recorder=None):
+        """Takes a telegram.Bot or anything with its send_message.
+
+        A capture.Recorder, if given, gets every message Telegram accepted.
+        """
+        self.outbox = outbox
+        self.bot = bot
+        self.logger = logger
+        self.workers = workers
+        self.recorder = recorder
+        self._stopped = threading.Event()
+        self._threads = []
+
+    def start(self) -> None:
+        """Starts the sending threads."""
+        for number in range(self.workers):
+            thread = threading.Thread(
+                target=self._work, name=f'outbox-{number}', daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout: float = None) -> None:
+        """Stops the threads after their current message."""
+        self._stopped.set()
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def _work(self) -> None:
+        while not self._stopped.is_set():
+            message = self.outbox.get(timeout=0.5)
+            if message is not None:
+                self.deliver(message)
+
+    def deliver(self, message: OutgoingMessage) -> None:
+        """Sends one message and reports the result to the outbox."""
+        try:
+            with SEND_SECONDS.time():
+                self.bot.send_message(message.chat_id, message.text)
+        except Exception as e:
+            if self.outbox.fail(message, e):
+                self.logger.warning(
+                    f'Cбой при отправке сообщения в Telegram, повторим: {e}'
+                )
+            else:
+                self.logger.error(
+                    f'Telegram не принял сообщение, оно удалено: {e}'
+                )
+        else:
+            self.outbox.done(message)
+            if self.recorder is not None:
+                self.recorder.telegram(
+                    message.chat_id, message.text, message.notification,
+                    message.key,
+                )
+            self.logger.info('Удачная отправка сообщения в Telegram.')
@@ -0,0 +1,43 @@
+import sys
+from typing import NamedTuple
+
+
+def intern_status(status):
+    """Returns the shared copy of a status string.
+
+    Every decoded answer brings its own copies of a handful of status
+    names; interned, all tracked homeworks point to the same strings.
+    """
+    if type(status) is str:
+        return sys.intern(status)
+    return status
+
+
+class Homework(NamedTuple):
+    """Fields of a Practicum homework the bot uses, nothing else.
+
+    A tuple without per-instance dict: the API's comments, dates and
+    lesson names are dropped when the record is built.
+    """
+
+    id: int
+    homework_name: str
+    status: str
+
+    @classmethod
+    def from_dict(cls, homework: dict) -> 'Homework':
+        """Builds the record from an API homework, missing keys are None."""
+        return cls(
+            homework.get('id'),
+            homework.get('homework_name'),
+            intern_status(homework.get('status')),
+        )
+
+
+class Transition(NamedTuple):
+    """A status change of a homework as it was announced to the chat."""
+
+    changed_at: int
+    homework_id: int
+    homework_name: str
+    status: str
@@ -0,0 +1,130 @@
+import argparse
+import logging
+import time
+from collections import Counter
+
+import requests
+
+import homework
+from capture import PRACTICUM, TELEGRAM, read_records
+from subscribers import SubscriberState
+
+
+class CollectingBot:
+    """Bot stand-in that keeps messages instead of sending them."""
+
+    def __init__(self):
+        """Starts with no messages."""
+        self.sent = []
+
+    def send_message(self, chat_id, text):
+        """Keeps the message."""
+        self.sent.append((chat_id, text))
+
+
+def decode_answer(record: dict):
+    """Returns the recorded answer as get_api_answer would return it."""
+    if record['status'] == requests.codes.not_modified:
+        # сервер подтвердил, что с прошлого ответа ничего не изменилось
+        return {'homeworks': [], 'current_date': None}
+    if record['status'] != requests.codes.ok:
+        response = requests.Response()
+        response.status_code = record['status']
+        message = f'Недоступен {homework.ENDPOINT}, код: {record["status"]}'
+        raise requests.HTTPError(message, response=response)
+    return homework.check_api_errors(homework.decode_json(record['body']))
+
+
+def replay_answer(state: SubscriberState, record: dict) -> list:
+    """Runs a recorded Practicum answer through the bot's handling."""
+    try:
+        response = decode_answer(record)
+        return [
+            message for _, message in
+            homework.handle_answer(state, response, int(record['t']))
+        ]
+    except Exception as e:
+        return homework.handle_error(state, e)
+
+
+def notifications(sends: Counter) -> Counter:
+    """Returns recorded (key, text), fanned out to several chats once.
+
+    sends counts (key, chat_id, text); a text of a subscriber counts as
+    many times as the subscriber's chat that got it most often. Texts
+    of different subscribers are counted apart even when equal.
+    """
+    texts = Counter()
+    for (key, _, text), count in sends.items():
+        texts[key, text] = max(texts[key, text], count)
+    return texts
+
+
+def pace(started: float, first: float, moment: float, speed: float) -> None:
+    """Sleeps until the moment of the capture at speed times real time."""
+    if speed <= 0:
+        return
+    delay = started + (moment - first) / speed - time.monotonic()
+    if delay > 0:
+        time.sleep(delay)
+
+
+def replay(path: str, bot=None, speed: float = 0) -> dict:
+    """Feeds a capture through the bot's handling and returns a report.
+
+    Messages go to bot (kept in memory by default) under the token key
+    as chat id. speed 0 replays as fast as possible, 1 in real time.
+    The produced messages are compared with the recorded notifications:
+    a message sent to several chats of a subscriber counts once, replies
+    to commands do not count.
+    """
+    bot = CollectingBot() if bot is None else bot
+    states = {}
+    produced, sends = Counter(), Counter()
+    answers = 0
+    started = time.monotonic()
+    first = None
+    for record in read_records(path):
+        first = record['t'] if first is None else first
+        pace(started, first, record['t'], speed)
+        if record['kind'] == TELEGRAM:
+            sends[record.get('key'), record['chat_id'], record['text']] += 1
+            continue
+        if record['kind'] != PRACTICUM:
+            continue
+        answers += 1
+        state = states.setdefault(record['key'], SubscriberState(0))
+        for message in replay_answer(state, record):
+            produced[record['key'], message] += 1
+            homework.send_message_to_chat(bot, record['key'], message)
+    elapsed = time.monotonic() - started
+    recorded = notifications(sends)
+    return {
+        'answers': answers,
+        'subscribers': len(states),
+        'messages': sum(produced.values()),
+        'recorded_messages': sum(recorded.values()),
+        'recorded_sends': sum(sends.values()),
+        'matches': produced == recorded,
+        'elapsed': elapsed,
+        'answers_per_second': answers / elapsed if elapsed else 0.0,
+    }
+
+
+def main(argv: list = None) -> None:
+    """Replays a capture file and prints the report."""
+    parser = argparse.ArgumentParser(
+        description='Прогоняет записанный RECORD_FILE через обработку бота.'
+    )
+    parser.add_argument('path')
+    parser.add_argument('--speed', type=float, default=0,
+                        help='1 — в реальном времени, 0 — как можно быстрее')
+    options = parser.parse_args(argv)
+    homework.logger.setLevel(logging.CRITICAL)
+    report = replay(options.path, speed=options.speed)
+    for key, value in report.items():
+        print(f'{key:<25} {value}')
+
+
+if __name__ == '__main__':
+    main()
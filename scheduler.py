@@ -0,0 +1,87 @@
+import heapq
+import itertools
+import random
+
+from subscribers import SubscriberState
+
+
+class PollScheduler:
+    """Time-ordered queue of subscribers' next poll times.
+
+    A subscriber is queued at most once: scheduling it again replaces
+    its entry, the stale entry is skipped when it reaches the top.
+    """
+
+    def __init__(self):
+        """Starts with an empty queue."""
+        self._heap = []
+        self._entries = {}
+        # порядковый номер разводит подписчиков с одинаковым временем
+        self._sequence = itertools.count()
+
+    def __len__(self):
+        """Returns how many subscribers are queued."""
+        return len(self._entries)
+
+    def schedule(self, subscriber, due: float) -> None:
+        """Puts the subscriber into the queue to be polled at due."""
+        entry = [due, next(self._sequence), subscriber]
+        self._entries[subscriber] = entry
+        heapq.heappush(self._heap, entry)
+
+    def discard(self, subscriber) -> None:
+        """Removes the subscriber from the queue if it is there."""
+        self._entries.pop(subscriber, None)
+
+    def pop_due(self, now: float) -> list:
+        """Removes and returns every subscriber due at now."""
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            entry = heapq.heappop(self._heap)
+            subscriber = entry[2]
+            if self._entries.get(subscriber) is entry:
+                del self._entries[subscriber]
+                due.append(subscriber)
+        return due
+
+    def next_due(self):
+        """Returns the nearest poll time or None for an empty queue."""
+        while self._heap and (
+            self._entries.get(self._heap[0][2]) is not self._heap[0]
+        ):
+            heapq.heappop(self._heap)
+        return self._heap[0][0] if self._heap else None
+
+
+class AdaptivePolicy:
+    """Chooses a delay before the next poll from a subscriber's state."""
+
+    def __init__(self, base: float = 600, reviewing: float = 120,
+                 idle: float = 1800, error_base: float = 60,
+                 error_max: float = 3600, jitter: float = 0.1):
+        """Takes intervals in seconds and the share of random spread."""
+        self.base = base
+        self.reviewing = reviewing
+        self.idle = idle
+        self.error_base = error_base
+        self.error_max = error_max
+        self.jitter = jitter
+
+    def delay(self, state: SubscriberState) -> float:
+        """Returns seconds to wait before polling the subscriber again."""
+        if state.failures:
+            # экспоненциальная задержка с разбросом в верхней половине
+            backoff = min(
+                self.error_max, self.error_base * 2 ** (state.failures - 1)
+            )
+            return random.uniform(backoff / 2, backoff)
+
+        statuses = set(state.homework_statuses.values())
+        if 'reviewing' in statuses:
+            interval = self.reviewing
+        elif not statuses or statuses == {'approved'}:
+            interval = self.idle
+        else:
+            interval = self.base
+        # разброс не дает подписчикам собираться в пачки
+        return interval * random.uniform(1 - self.jitter, 1 + self.jitter)
@@ -0,0 +1,150 @@
+import multiprocessing
+import os
+import queue
+import threading
+import time
+import zlib
+
+import metrics
+
+
+def shard_of(key: str, count: int) -> int:
+    """Returns the shard number of a key, stable across processes."""
+    # hash() строк солится при каждом запуске, crc32 — нет
+    return zlib.crc32(key.encode()) % count
+
+
+def report_metrics(metrics_queue, index: int,
+                   interval: float) -> threading.Thread:
+    """Sends this worker's counters to the supervisor every interval."""
+    def report():
+        while True:
+            time.sleep(interval)
+            metrics_queue.put((index, metrics.snapshot()))
+
+    thread = threading.Thread(target=report, name='metrics', daemon=True)
+    thread.start()
+    return thread
+
+
+class ShardSupervisor:
+    """Runs shards in worker processes and restarts the crashed ones.
+
+    target(index, count, metrics_queue) is the worker's entry point; it
+    polls its slice of subscribers and reports counters to the queue.
+    """
+
+    def __init__(self, count: int, target, logger,
+                 restart_delay: float = 1, restart_max: float = 60):
+        """Takes the number of shards and the worker entry point."""
+        self.count = count
+        self.target = target
+        self.logger = logger
+        self.restart_delay = restart_delay
+        self.restart_max = restart_max
+        self.metrics_queue = multiprocessing.Queue()
+        self.processes = {}
+        self._started_at = {}
+        self._crashes = dict.fromkeys(range(count), 0)
+        self._restart_at = {}
+        self._latest = {}
+        # счетчики упавших воркеров, чтобы сумма не откатывалась назад
+        self._retired = {}
+
+    def start(self) -> None:
+        """Starts a worker for every shard."""
+        for index in range(self.count):
+            self._spawn(index)
+
+    def stop(self, timeout: float = 30) -> None:
+        """Asks the workers to stop, kills those not done in timeout."""
+        for process in self.processes.values():
+            process.terminate()
+        deadline = time.monotonic() + timeout
+        for process in self.processes.values():
+            process.join(max(0, deadline - time.monotonic()))
+            if process.is_alive():
+                self.logger.error(f'Шард не остановился, pid {process.pid}')
+                process.kill()
+                process.join()
+
+    def signal_workers(self, number: int) -> None:
+        """Sends a signal to every live worker."""
+        for process in self.processes.values():
+            if process.is_alive():
+                os.kill(process.pid, number)
+
+    def _spawn(self, index: int) -> None:
+        process = multiprocessing.Process(
+            target=self.target,
+            args=(index, self.count, self.metrics_queue),
+            name=f'shard-{index}',
+        )
+        process.start()
+        self.processes[index] = process
+        self._started_at[index] = time.monotonic()
+        self.logger.info(f'Запущен шард {index}, pid {process.pid}')
+
+    def check(self) -> None:
+        """Schedules restarts of dead workers and runs the due ones."""
+        now = time.monotonic()
+        for index, process in self.processes.items():
+            if process.is_alive() or index in self._restart_at:
+                continue
+            self.logger.error(
+                f'Шард {index} завершился с кодом {process.exitcode}'
+            )
+            self._retired = metrics.merge(
+                [self._retired, self._latest.pop(index, {})]
+            )
+            # долго проработавший воркер начинает отсчет падений заново
+            if now - self._started_at[index] > self.restart_max:
+                self._crashes[index] = 0
+            self._crashes[index] += 1
+            delay = min(
+                self.restart_max,
+                self.restart_delay * 2 ** (self._crashes[index] - 1),
+            )
+            self._restart_at[index] = now + delay
+
+        for index, restart_at in list(self._restart_at.items()):
+            if restart_at <= now:
+                del self._restart_at[index]
+                self._spawn(index)
+
+    def collect(self) -> None:
+        """Takes counters reported by workers since the last call."""
+        while True:
+            try:
+                index, values = self.metrics_queue.get_nowait()
+            except queue.Empty:
+                return
+            self._latest[index] = values
+
+    def merged_metrics(self) -> dict:
+        """Returns counters summed over all workers, dead ones included."""
+        return metrics.merge([self._retired, *self._latest.values()])
+
+    def run(self, wakeup, check_interval: float = 1,
+            report_interval: float = 60, poll_signal: int = None,
+            stop_timeout: float = 30) -> None:
+        """Supervises the workers until the wakeup is stopped.
+
+        A poll request on the wakeup is passed to the workers as
+        poll_signal; on stop the workers get stop_timeout to shut down.
+        """
+        self.start()
+        reported_at = time.monotonic()
+        while not wakeup.stopping:
+            wakeup.wait(check_interval)
+            if wakeup.take_poll_request() and poll_signal is not None:
+                self.signal_workers(poll_signal)
+            if wakeup.stopping:
+                break
+            self.check()
+            self.collect()
+            if time.monotonic() - reported_at >= report_interval:
+                reported_at = time.monotonic()
+                self.logger.info(f'Метрики шардов: {self.merged_metrics()}')
+        self.logger.info('Остановка шардов')
+        self.stop(stop_timeout)
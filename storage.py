@@ -0,0 +1,225 @@
+import sqlite3
+import threading
+
+from exceptions import StateStoreError
+from records import intern_status
+from subscribers import SubscriberState
+
+BUSY_TIMEOUT = 30
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS cursors (
+    token TEXT NOT NULL,
+    chat_id TEXT NOT NULL,
+    cursor INTEGER NOT NULL,
+    failures INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (token, chat_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS statuses (
+    token TEXT NOT NULL,
+    chat_id TEXT NOT NULL,
+    homework_id NOT NULL,
+    status TEXT NOT NULL,
+    PRIMARY KEY (token, chat_id, homework_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS recent_errors (
+    token TEXT NOT NULL,
+    chat_id TEXT NOT NULL,
+    message TEXT NOT NULL,
+    expires_at REAL NOT NULL,
+    PRIMARY KEY (token, chat_id, message)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS paused_chats (
+    token TEXT NOT NULL,
+    chat_id TEXT NOT NULL,
+    paused_chat_id TEXT NOT NULL,
+    PRIMARY KEY (token, chat_id, paused_chat_id)
+) WITHOUT ROWID;
+'''
+
+
+class StateStore:
+    """Durable subscriber state in SQLite: statuses, cursors and errors.
+
+    State is read once at startup and written back in a single
+    transaction per polling cycle. Paused chats are written by chat
+    commands from their own thread as soon as they change, so the
+    connection is shared under a lock.
+    """
+
+    def __init__(self, path: str):
+        """Opens the database in WAL mode and creates missing tables."""
+        try:
+            # базу делят процессы шардов: ждем чужую запись, а не падаем
+            self.connection = sqlite3.connect(
+                path, isolation_level=None, check_same_thread=False,
+                timeout=BUSY_TIMEOUT,
+            )
+            # WAL: запись не блокирует чтение, fsync только на чекпойнтах
+            self.connection.execute('PRAGMA journal_mode=WAL')
+            self.connection.execute('PRAGMA synchronous=NORMAL')
+            self.connection.executescript(SCHEMA)
+        except sqlite3.Error as e:
+            raise StateStoreError(f'Не открывается хранилище {path}: {e}')
+        self._lock = threading.Lock()
+
+    def close(self) -> None:
+        """Closes the database."""
+        self.connection.close()
+
+    def load(self, subscribers: list, current_timestamp: int) -> dict:
+        """Returns states of subscribers, fresh ones start at the timestamp."""
+        states = {
+            subscriber: SubscriberState(current_timestamp)
+            for subscriber in subscribers
+        }
+        by_key = {
+            (subscriber.token, subscriber.chat_id): state
+            for subscriber, state in states.items()
+        }
+        # по проходу на таблицу вместо запросов на каждого подписчика
+        rows = self.connection.execute(
+            'SELECT token, chat_id, cursor, failures FROM cursors'
+        )
+        for token, chat_id, cursor, failures in rows:
+            state = by_key.get((token, chat_id))
+            if state is not None:
+                state.current_timestamp = cursor
+                state.failures = failures
+
+        rows = self.connection.execute(
+            'SELECT token, chat_id, homework_id, status FROM statuses'
+        )
+        for token, chat_id, homework_id, status in rows:
+            state = by_key.get((token, chat_id))
+            if state is not None:
+                state.homework_statuses[homework_id] = intern_status(status)
+
+        rows = self.connection.execute(
+            'SELECT token, chat_id, message, expires_at FROM recent_errors '
+            'ORDER BY expires_at'
+        )
+        for token, chat_id, message, expires_at in rows:
+            state = by_key.get((token, chat_id))
+            if state is not None:
+                state.error_messages.restore(message, expires_at)
+
+        rows = self.connection.execute(
+            'SELECT token, chat_id, paused_chat_id FROM paused_chats'
+        )
+        for token, chat_id, paused_chat_id in rows:
+            state = by_key.get((token, chat_id))
+            if state is not None:
+                state.paused.add(paused_chat_id)
+        return states
+
+    def save(self, states: dict) -> None:
+        """Writes states of the polled subscribers in one transaction."""
+        cursors, statuses, errors = [], [], []
+        for subscriber, state in states.items():
+            key = (subscriber.token, subscriber.chat_id)
+            cursors.append(key + (state.current_timestamp, state.failures))
+            statuses.extend(
+                key + item for item in state.homework_statuses.items()
+            )
+            errors.extend(key + item for item in state.error_messages.items())
+
+        with self._lock, self.connection:
+            self.connection.execute('BEGIN')
+            self.connection.executemany(
+                'INSERT OR REPLACE INTO cursors '
+                '(token, chat_id, cursor, failures) VALUES (?, ?, ?, ?)',
+                cursors,
+            )
+            self.connection.executemany(
+                'INSERT OR REPLACE INTO statuses VALUES (?, ?, ?, ?)', statuses
+            )
+            # кэш ошибок ограничен и вытесняет старые: пишем его целиком
+            self.connection.executemany(
+                'DELETE FROM recent_errors WHERE token = ? AND chat_id = ?',
+                [key[:2] for key in cursors],
+            )
+            self.connection.executemany(
+                'INSERT INTO recent_errors VALUES (?, ?, ?, ?)', errors
+            )
+
+    def save_paused(self, subscriber, paused: set) -> None:
+        """Replaces the paused chats of a subscriber."""
+        key = (subscriber.token, subscriber.chat_id)
+        with self._lock, self.connection:
+            self.connection.execute('BEGIN')
+            self.connection.execute(
+                'DELETE FROM paused_chats WHERE token = ? AND chat_id = ?', key
+            )
+            self.connection.executemany(
+                'INSERT INTO paused_chats VALUES (?, ?, ?)',
+                [key + (chat_id,) for chat_id in paused],
+            )
+
+
+class OutboxStore:
+    """Durable copy of the Telegram outbox in SQLite.
+
+    Rows are added by pollers and removed by senders from different
+    threads, so the connection is shared under a lock. Each shard keeps
+    its messages in its own named queue of the table.
+    """
+
+    def __init__(self, path: str, queue: str = ''):
+        """Opens the database in WAL mode and creates the outbox table."""
+        self.queue = queue
+        try:
+            self.connection = sqlite3.connect(
+                path, isolation_level=None, check_same_thread=False,
+                timeout=BUSY_TIMEOUT,
+            )
+            self.connection.execute('PRAGMA journal_mode=WAL')
+            self.connection.execute('PRAGMA synchronous=NORMAL')
+            self.connection.execute(
+                'CREATE TABLE IF NOT EXISTS outbox ('
+                'id INTEGER PRIMARY KEY, chat_id TEXT NOT NULL, '
+                "text TEXT NOT NULL, queue TEXT NOT NULL DEFAULT '')"
+            )
+        except sqlite3.Error as e:
+            raise StateStoreError(f'Не открывается хранилище {path}: {e}')
+        self._lock = threading.Lock()
+
+    def close(self) -> None:
+        """Closes the database."""
+        self.connection.close()
+
+    def load(self) -> list:
+        """Returns undelivered (id, chat_id, text) rows in queue order."""
+        with self._lock:
+            return self.connection.execute(
+                'SELECT id, chat_id, text FROM outbox WHERE queue = ? '
+                'ORDER BY id',
+                (self.queue,),
+            ).fetchall()
+
+    def add(self, chat_id: str, text: str) -> int:
+        """Saves a queued message and returns its row id."""
+        return self.add_many([chat_id], text)[0]
+
+    def add_many(self, chat_ids: list, text: str) -> list:
+        """Saves one text queued to the chats in one transaction.
+
+        Returns row ids in the order of chat_ids.
+        """
+        with self._lock, self.connection:
+            self.connection.execute('BEGIN')
+            return [
+                self.connection.execute(
+                    'INSERT INTO outbox (chat_id, text, queue) '
+                    'VALUES (?, ?, ?)',
+                    (chat_id, text, self.queue),
+                ).lastrowid
+                for chat_id in chat_ids
+            ]
+
+    def remove(self, row_id: int) -> None:
+        """Deletes a delivered or dropped message."""
+        with self._lock:
+            self.connection.execute(
+                'DELETE FROM outbox WHERE id = ?', (row_id,)
+            )
@@ -0,0 +1,136 @@
+import json
+import sqlite3
+import threading
+from collections import deque
+from dataclasses import dataclass, field
+from typing import List
+
+from caches import ExpiringSet
+from exceptions import SubscribersRegistryError
+from http_client import AnswerValidators
+
+SQLITE_SUFFIXES = ('.db', '.sqlite', '.sqlite3')
+# сколько последних смен статуса помним для /history
+HISTORY_SIZE = 20
+
+
+@dataclass(frozen=True)
+class Subscriber:
+    """Practicum token of a student and the Telegram chats it notifies.
+
+    chat_id is the student's own chat: errors of the token go only
+    there and the state is stored under it. cc lists other chats, such
+    as a mentor's or a group, that get status changes too. locales maps
+    a chat to the language of its messages, a change is rendered once
+    per distinct language.
+    """
+
+    token: str
+    chat_id: str
+    cc: tuple = ()
+    # пары (чат, язык), чатов без пары касается LOCALE бота
+    locales: tuple = ()
+
+    @property
+    def chats(self) -> tuple:
+        """Returns every chat notified of status changes."""
+        return (self.chat_id, *self.cc)
+
+    def locale_of(self, chat_id: str) -> str:
+        """Returns the language set for the chat, None for the default."""
+        return dict(self.locales).get(chat_id)
+
+    def chats_by_locale(self) -> dict:
+        """Groups the chats by language: {locale: [chat_id, ...]}."""
+        groups = {}
+        for chat_id in self.chats:
+            groups.setdefault(self.locale_of(chat_id), []).append(chat_id)
+        return groups
+
+
+@dataclass
+class SubscriberState:
+    """Polling state of a single subscriber kept between cycles."""
+
+    # курсор опроса: from_date для следующего запроса
+    current_timestamp: int
+    homework_statuses: dict = field(default_factory=dict)
+    # уже отправленные тексты ошибок, забываются после периода тишины
+    error_messages: ExpiringSet = field(default_factory=ExpiringSet)
+    # подряд идущие сбои сервера, от них растет пауза между опросами
+    failures: int = 0
+    # ETag и хэш прошлого ответа: повтор не разбираем
+    validators: AnswerValidators = field(default_factory=AnswerValidators)
+    # последние смены статусов, свежие в конце
+    history: deque = field(
+        default_factory=lambda: deque(maxlen=HISTORY_SIZE)
+    )
+    # чаты, приславшие /pause: опрашиваем, но туда не пишем
+    paused: set = field(default_factory=set)
+    # команды боту читают кэш и меняют паузы из потока telegram.ext
+    lock: threading.Lock = field(
+        default_factory=threading.Lock, repr=False, compare=False
+    )
+
+
+def load_subscribers(path: str) -> List[Subscriber]:
+    """Loads subscribers from a JSON file or a SQLite database."""
+    if path.endswith(SQLITE_SUFFIXES):
+        rows = _read_sqlite(path)
+    else:
+        rows = _read_json(path)
+
+    # строки с одним токеном — один опрос на все чаты, первый чат — владелец
+    # у каждого чата свой язык: {токен: {чат: язык или None}}
+    chats = {}
+    for row in rows:
+        token, chat_id = row.get('token'), row.get('chat_id')
+        if not token or not chat_id:
+            message = f'В записи реестра нет token или chat_id: {row}'
+            raise SubscribersRegistryError(message)
+        # одна и та же пара может попасть в реестр дважды, пишем в чат раз
+        token_chats = chats.setdefault(str(token), {})
+        locale = str(row['locale']) if row.get('locale') else None
+        token_chats[str(chat_id)] = token_chats.get(str(chat_id)) or locale
+    return [
+        make_subscriber(token, list(token_chats), token_chats)
+        for token, token_chats in chats.items()
+    ]
+
+
+def make_subscriber(token: str, chat_ids: list,
+                    locales: dict = None) -> Subscriber:
+    """Returns the subscriber of a token, the first chat is the owner."""
+    owner, *cc = chat_ids
+    pairs = tuple(
+        (chat_id, locale) for chat_id, locale in (locales or {}).items()
+        if locale
+    )
+    return Subscriber(token, owner, tuple(cc), pairs)
+
+
+def _read_json(path: str) -> list:
+    """Reads a list of {"token": ..., "chat_id": ...} objects."""
+    try:
+        with open(path, encoding='utf-8') as file:
+            rows = json.load(file)
+    except (OSError, ValueError) as e:
+        raise SubscribersRegistryError(f'Не читается реестр {path}: {e}')
+    if type(rows) != list:
+        message = f'Реестр {path} ждем в формате list, пришел другой формат'
+        raise SubscribersRegistryError(message)
+    return rows
+
+
+def _read_sqlite(path: str) -> list:
+    """Reads rows of the subscribers(token, chat_id[, locale]) table."""
+    try:
+        connection = sqlite3.connect(path)
+        connection.row_factory = sqlite3.Row
+        try:
+            cursor = connection.execute('SELECT * FROM subscribers')
+            return [dict(row) for row in cursor]
+        finally:
+            connection.close()
+    except sqlite3.Error as e:
+        raise SubscribersRegistryError(f'Не читается реестр {path}: {e}')
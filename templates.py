@@ -0,0 +1,158 @@
+import json
+
+from exceptions import TemplatesError
+
+# встроенные переводы, русский собирается из HOMEWORK_STATUSES в homework
+BUILTIN_LOCALES = {
+    'en': {
+        'message': 'Review status of "{name}" has changed. {verdict}',
+        'verdicts': {
+            'approved': 'The reviewer liked everything. Hooray!',
+            'reviewing': 'A reviewer has started checking the work.',
+            'rejected': 'The reviewer has left some remarks.',
+        },
+        'labels': {
+            'reviewing': 'in review',
+            'rejected': 'to revise',
+            'approved': 'accepted',
+        },
+        'replies': {
+            'help': (
+                '/status — statuses of your homeworks\n'
+                '/history — the latest changes\n'
+                '/pause — stop notifications\n'
+                '/resume — send notifications again'
+            ),
+            'unknown': 'Unknown command.\n{help}',
+            'not_subscribed': (
+                'This chat is not subscribed to homework review notifications.'
+            ),
+            'no_homeworks': 'No homeworks in review yet.',
+            'summary': 'Homeworks — {summary}.',
+            'latest': 'Latest change {moment}: "{name}". {verdict}',
+            'paused_note': 'Notifications are paused, /resume turns them on.',
+            'no_history': 'Homework statuses have not changed yet.',
+            'history_line': '{moment} "{name}". {verdict}',
+            'paused': ('Notifications are paused. /status still works, '
+                       '/resume turns notifications on.'),
+            'resumed': 'Notifications are on again.',
+        },
+    },
+}
+# части языка, которые не компилируются: вердикты, подписи, ответы команд
+TEXT_PARTS = ('verdicts', 'labels', 'replies')
+NAME = '{name}'
+NO_NAME = 'В ответе API отсутствует ожидаемый ключ homework_name'
+UNKNOWN_STATUS = ('Недокументированный статус домашней работы, '
+                  'обнаруженный в ответе API.')
+VERDICT = '{verdict}'
+
+
+def load_locales(path: str) -> dict:
+    """Reads {locale: {"message": ..., "verdicts": {...}}} from JSON."""
+    try:
+        with open(path, encoding='utf-8') as file:
+            locales = json.load(file)
+    except (OSError, ValueError) as e:
+        raise TemplatesError(f'Не читаются шаблоны {path}: {e}')
+    if type(locales) is not dict:
+        raise TemplatesError(f'Шаблоны {path} ждем в формате dict')
+    return locales
+
+
+class TemplateRegistry:
+    """Status messages of every (status, locale) compiled at startup.
+
+    The verdict is put into the template once and the result is split
+    around {name}, so rendering a change is a dict lookup and two
+    string additions. Statuses missing in a locale, and unknown
+    locales, fall back to the default locale. A locale may also carry
+    short status labels and replies to chat commands, looked up by
+    text() with the same fallback.
+    """
+
+    def __init__(self, locales: dict, default: str):
+        """Compiles {locale: {"message": ..., "verdicts": {...}}}."""
+        if default not in locales:
+            raise TemplatesError(f'Нет шаблонов для языка {default}')
+        self.default = default
+        compiled = {
+            locale: self._compile_locale(locale, spec)
+            for locale, spec in locales.items()
+        }
+        # locale -> {status: (до имени, после имени)}
+        self._tables = {
+            locale: {**compiled[default], **table}
+            for locale, table in compiled.items()
+        }
+        self._default_table = self._tables[default]
+        # locale -> {часть: {ключ: текст}}
+        try:
+            self._texts = {
+                locale: {
+                    part: {
+                        **locales[default].get(part, {}),
+                        **spec.get(part, {}),
+                    }
+                    for part in TEXT_PARTS
+                }
+                for locale, spec in locales.items()
+            }
+        except (TypeError, AttributeError) as e:
+            raise TemplatesError(f'Неверные тексты шаблонов: {e}')
+
+    @staticmethod
+    def _compile_locale(locale: str, spec: dict) -> dict:
+        table = {}
+        try:
+            message = spec['message']
+            for status, verdict in spec['verdicts'].items():
+                text = message.replace(VERDICT, verdict)
+                prefix, name, suffix = text.partition(NAME)
+                if not name or NAME in suffix:
+                    raise TemplatesError(
+                        f'В шаблоне {locale} нужен один {NAME}: {text}'
+                    )
+                table[status] = (prefix, suffix)
+        except (KeyError, TypeError, AttributeError) as e:
+            raise TemplatesError(f'Неверный шаблон {locale}: {e}')
+        return table
+
+    def table(self, locale: str = None) -> dict:
+        """Returns {status: (prefix, suffix)} of the locale."""
+        return self._tables.get(locale) or self._default_table
+
+    def text(self, part: str, key: str, locale: str = None) -> str:
+        """Returns a verdict, label or reply of the locale, else the key."""
+        texts = self._texts.get(locale) or self._texts[self.default]
+        return texts[part].get(key, key)
+
+    def render(self, status: str, name: str, locale: str = None) -> str:
+        """Returns the message about the status of the named homework."""
+        table = self._tables.get(locale) or self._default_table
+        parts = table.get(status)
+        if parts is None:
+            raise KeyError(UNKNOWN_STATUS)
+        if type(name) is not str:
+            name = str(name)
+        return parts[0] + name + parts[1]
+
+    def messages(self, homeworks: list, locale: str = None) -> list:
+        """Returns messages of Homework records, the locale looked up once.
+
+        The hot path of a poll: a lookup and two string additions per
+        homework, which beat a three-part f-string.
+        """
+        table = self.table(locale)
+        messages = []
+        for homework in homeworks:
+            parts = table.get(homework.status)
+            if parts is None:
+                raise KeyError(UNKNOWN_STATUS)
+            name = homework.homework_name
+            if type(name) is not str:
+                if name is None:
+                    raise KeyError(NO_NAME)
+                name = str(name)
+            messages.append(parts[0] + name + parts[1])
+        return messages
@@ -0,0 +1,87 @@
+import asyncio
+import time
+
+import aiohttp
+from aiohttp import web
+
+from outbox import Outbox
+from subscribers import Subscriber, SubscriberState
+
+DELAY = 0.2
+
+
+async def start_stub_server(sent):
+    async def homework_statuses(request):
+        await asyncio.sleep(DELAY)
+        token = request.headers['Authorization'].split()[-1]
+        return web.json_response({
+            'homeworks': [{
+                'id': 1, 'homework_name': token, 'status': 'reviewing'
+            }],
+            'current_date': int(request.query['from_date']),
+        })
+
+    async def send_message(request):
+        sent.append(await request.json())
+        return web.json_response({'ok': True})
+
+    app = web.Application()
+    app.router.add_get('/homework_statuses/', homework_statuses)
+    app.router.add_post('/bot{token}/sendMessage', send_message)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    port = runner.addresses[0][1]
+    return runner, f'http://127.0.0.1:{port}'
+
+
+class TestAsyncRunner:
+
+    def test_subscribers_polled_concurrently(self, monkeypatch):
+        import homework
+
+        sent = []
+        subscribers = [Subscriber(f'token-{i}', str(i)) for i in range(5)]
+        states = {s: SubscriberState(current_timestamp=0) for s in subscribers}
+
+        async def poll():
+            runner, url = await start_stub_server(sent)
+            monkeypatch.setattr(
+                homework, 'ENDPOINT', f'{url}/homework_statuses/'
+            )
+            monkeypatch.setattr(
+                homework, 'TELEGRAM_SEND_URL', url + '/bot{token}/sendMessage'
+            )
+            semaphore = asyncio.Semaphore(len(subscribers))
+            outbox = Outbox()
+            try:
+                async with aiohttp.ClientSession() as session:
+                    started = time.monotonic()
+                    await asyncio.gather(*(
+                        homework.async_poll_subscriber(
+                            session, semaphore, outbox, subscriber, state
+                        )
+                        for subscriber, state in states.items()
+                    ))
+                    elapsed = time.monotonic() - started
+                    sender = asyncio.create_task(
+                        homework.async_deliver(session, outbox)
+                    )
+                    while len(outbox):
+                        await asyncio.sleep(0.01)
+                    sender.cancel()
+                    return elapsed
+            finally:
+                await runner.cleanup()
+
+        elapsed = asyncio.run(poll())
+
+        assert elapsed < DELAY * len(subscribers), (
+            'Проверьте, что запросы к Практикуму выполняются параллельно'
+        )
+        assert sorted(message['chat_id'] for message in sent) == [
+            str(i) for i in range(5)
+        ], (
+            'Проверьте, что каждый подписчик получил уведомление'
+        )
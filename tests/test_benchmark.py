@@ -0,0 +1,46 @@
+import pytest
+
+import benchmark
+
+
+class TestBenchmark:
+
+    @pytest.mark.parametrize('mode', ['threads', 'async'])
+    def test_benchmark_runs_pipeline(self, mode, monkeypatch):
+        import homework
+
+        # бенчмарк направляет бота на заглушки, вернем адреса после теста
+        monkeypatch.setattr(homework, 'ENDPOINT', homework.ENDPOINT)
+        monkeypatch.setattr(
+            homework, 'TELEGRAM_SEND_URL', homework.TELEGRAM_SEND_URL
+        )
+        monkeypatch.setattr(homework, 'decode_json', homework.decode_json)
+        options = benchmark.parse_options([
+            '--mode', mode, '--subscribers', '5', '--homeworks', '3',
+            '--changed', '2', '--cycles', '2', '--latency', '0',
+        ])
+        report = benchmark.run_benchmark(options)
+
+        assert report['cycles'] == 2
+        assert report['messages_sent'] == 5 * 2 * 2, (
+            'Проверьте, что бенчмарк доставляет каждую смену статуса'
+        )
+        assert report['requests_per_second'] > 0
+        assert report['cycle_p50'] <= report['cycle_p99']
+        assert report['peak_rss_mb'] > 0
+        assert 0 < report['state_bytes_per_homework'] < 1000
+
+    def test_render_benchmark(self):
+        options = benchmark.parse_options([
+            '--mode', 'render', '--homeworks', '3', '--renders', '30',
+        ])
+        report = benchmark.run_render_benchmark(options)
+        assert report['renders'] == 30
+        assert report['legacy_ns_per_message'] > 0
+        assert report['registry_batch_ns_per_message'] > 0
+
+    def test_percentile(self):
+        values = list(range(1, 101))
+        assert benchmark.percentile(values, 0.5) == 50
+        assert benchmark.percentile(values, 0.99) == 99
+        assert benchmark.percentile([3], 0.99) == 3
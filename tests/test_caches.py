@@ -0,0 +1,38 @@
+from caches import ExpiringSet
+
+
+class TestExpiringSet:
+
+    def test_repeated_key_is_not_new(self):
+        cache = ExpiringSet()
+        assert cache.add('error', now=0, ttl=10)
+        assert not cache.add('error', now=5, ttl=10), (
+            'Проверьте, что повторная ошибка не отправляется снова'
+        )
+
+    def test_key_is_new_after_quiet_period(self):
+        cache = ExpiringSet()
+        cache.add('error', now=0, ttl=10)
+        cache.add('error', now=8, ttl=10)
+        assert not cache.add('error', now=15, ttl=10), (
+            'Проверьте, что каждое повторение продлевает период тишины'
+        )
+        assert cache.add('error', now=26, ttl=10), (
+            'Проверьте, что ошибка отправляется снова после периода тишины'
+        )
+
+    def test_size_is_bounded(self):
+        cache = ExpiringSet(maxsize=3)
+        for number in range(1000):
+            cache.add(f'error {number}', now=number, ttl=10 ** 6)
+        assert len(cache) == 3, (
+            'Проверьте, что кэш ошибок не растет больше maxsize'
+        )
+        assert 'error 999' in cache and 'error 0' not in cache
+
+    def test_expired_keys_are_evicted(self):
+        cache = ExpiringSet()
+        for number in range(10):
+            cache.add(f'error {number}', now=0, ttl=10)
+        cache.add('fresh', now=20, ttl=10)
+        assert len(cache) == 1
@@ -0,0 +1,182 @@
+import json
+
+from capture import Recorder, read_records, token_key
+from outbox import Outbox, OutboxSender
+from subscribers import Subscriber, SubscriberState
+
+ANSWER = {
+    'homeworks': [{'id': 1, 'homework_name': 'hw', 'status': 'approved'}],
+    'current_date': 100,
+}
+
+
+class MockBot:
+
+    def __init__(self):
+        self.sent = []
+
+    def send_message(self, chat_id, text):
+        self.sent.append((chat_id, text))
+
+
+class MockLogger:
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: None
+
+
+class TestCapture:
+
+    def test_records_are_appended(self, tmp_path):
+        path = str(tmp_path / 'capture.gz')
+        recorder = Recorder(path)
+        recorder.practicum('secret-token', 200, json.dumps(ANSWER))
+        recorder.telegram('1', 'text')
+        recorder.close()
+
+        recorder = Recorder(path)
+        recorder.practicum('secret-token', 500, '')
+        recorder.close()
+
+        records = list(read_records(path))
+        assert [record['kind'] for record in records] == [
+            'practicum', 'telegram', 'practicum'
+        ], (
+            'Проверьте, что новые записи дописываются к старым'
+        )
+        assert records[0]['key'] == token_key('secret-token')
+        assert json.loads(records[0]['body']) == ANSWER
+        with open(path, 'rb') as file:
+            assert b'secret-token' not in file.read()
+
+    def test_truncated_capture_is_read(self, tmp_path):
+        path = tmp_path / 'capture.gz'
+        recorder = Recorder(str(path), flush_records=1)
+        for status in range(5):
+            recorder.practicum('token', status, '')
+        # процесс упал, не закрыв файл
+        data = path.read_bytes()
+        recorder.close()
+        path.write_bytes(data)
+
+        assert [r['status'] for r in read_records(str(path))] == [
+            0, 1, 2, 3, 4
+        ], (
+            'Проверьте, что запись читается до последней целой строки'
+        )
+
+    def test_replies_are_recorded_apart(self, tmp_path):
+        path = str(tmp_path / 'capture.gz')
+        recorder = Recorder(path)
+        outbox = Outbox()
+        outbox.put('1', 'status changed')
+        outbox.put('2', '/status reply', notification=False)
+        sender = OutboxSender(outbox, MockBot(), MockLogger(),
+                              recorder=recorder)
+        for _ in range(2):
+            sender.deliver(outbox.get(timeout=1))
+        recorder.close()
+
+        assert [(r['kind'], r['chat_id']) for r in read_records(path)] == [
+            ('telegram', '1'), ('reply', '2')
+        ], 'Проверьте, что ответы на команды записываются отдельно'
+
+    def test_request_is_recorded(self, tmp_path, monkeypatch):
+        import homework
+
+        class MockResponse:
+            status_code = 200
+            text = json.dumps(ANSWER)
+
+            def json(self):
+                return json.loads(self.text)
+
+        class MockSession:
+
+            def get(self, **kwargs):
+                return MockResponse()
+
+        path = str(tmp_path / 'capture.gz')
+        monkeypatch.setattr(homework, 'RECORDER', Recorder(path))
+        homework.request_homework_statuses(0, 'token', MockSession())
+        homework.RECORDER.close()
+
+        record, = read_records(path)
+        assert record['status'] == 200 and record['body'] == MockResponse.text
+
+
+class TestReplay:
+
+    def test_replay_reproduces_messages(self, tmp_path):
+        import homework
+        import replay
+
+        path = str(tmp_path / 'capture.gz')
+        recorder = Recorder(path)
+        recorder.practicum('token', 200, json.dumps(ANSWER))
+        recorder.telegram(
+            '1', homework.parse_status(ANSWER['homeworks'][0]),
+            key=token_key('token'),
+        )
+        recorder.practicum('token', 200, json.dumps(ANSWER))
+        recorder.close()
+
+        bot = MockBot()
+        report = replay.replay(path, bot)
+        assert report['answers'] == 2
+        assert report['messages'] == 1, (
+            'Проверьте, что повтор ответа без изменений не шлет сообщений'
+        )
+        assert report['matches'], (
+            'Проверьте, что replay сверяет сообщения с записанными'
+        )
+        assert [chat_id for chat_id, _ in bot.sent] == [token_key('token')]
+
+    def test_fan_out_and_replies_match(self, tmp_path):
+        import homework
+        import replay
+
+        path = str(tmp_path / 'capture.gz')
+        message = homework.parse_status(ANSWER['homeworks'][0])
+        recorder = Recorder(path)
+        # у двух студентов одинаковые домашки: тексты совпадают
+        recorder.practicum('first', 200, json.dumps(ANSWER))
+        recorder.practicum('second', 200, json.dumps(ANSWER))
+        recorder.telegram('1', message, key=token_key('first'))
+        recorder.telegram('mentor', message, key=token_key('first'))
+        recorder.telegram('2', message, key=token_key('second'))
+        recorder.telegram('1', 'Работы — принято: 1.', False)
+        recorder.close()
+
+        report = replay.replay(path)
+        assert report['recorded_sends'] == 3
+        assert report['messages'] == report['recorded_messages'] == 2
+        assert report['matches'], (
+            'Проверьте, что сообщение, разосланное в несколько чатов, '
+            'одинаковые тексты разных студентов и ответы на команды '
+            'не ломают сверку'
+        )
+
+    def test_sends_are_recorded_with_key(self, tmp_path, monkeypatch):
+        import homework
+
+        path = str(tmp_path / 'capture.gz')
+        recorder = Recorder(path)
+        monkeypatch.setattr(homework, 'RECORDER', recorder)
+        monkeypatch.setattr(
+            homework, 'request_homework_statuses',
+            lambda *args, **kwargs: ANSWER,
+        )
+        outbox = Outbox()
+        homework.poll_subscriber(
+            outbox, None, Subscriber('token', '1', ('2',)), SubscriberState(0)
+        )
+        sender = OutboxSender(outbox, MockBot(), MockLogger(),
+                              recorder=recorder)
+        for _ in range(2):
+            sender.deliver(outbox.get(timeout=1))
+        recorder.close()
+
+        assert {r['key'] for r in read_records(path)} == {
+            token_key('token')
+        }, 'Проверьте, что уведомление записывается с ключом токена'
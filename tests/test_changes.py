@@ -0,0 +1,95 @@
+import pytest
+
+from changes import apply_changes, detect_changes
+from records import Homework
+from subscribers import Subscriber, SubscriberState
+from utils import MockOutbox
+
+HOMEWORKS_QTY = 10_000
+
+
+def make_homeworks(status='reviewing'):
+    return [
+        {'id': number, 'homework_name': f'hw{number}', 'status': status}
+        for number in range(HOMEWORKS_QTY)
+    ]
+
+
+class TestChangeDetection:
+
+    def test_only_transitions_are_returned(self):
+        known = {1: 'reviewing', 2: 'reviewing'}
+        homeworks = [
+            Homework(1, 'hw1', 'reviewing'),
+            Homework(2, 'hw2', 'approved'),
+            Homework(3, 'hw3', 'reviewing'),
+        ]
+
+        changes = detect_changes(known, homeworks)
+        assert [(c.homework.id, c.old_status, c.new_status)
+                for c in changes] == [
+            (2, 'reviewing', 'approved'),
+            (3, None, 'reviewing'),
+        ], (
+            'Проверьте, что возвращаются только изменившиеся домашки'
+        )
+        assert known == {1: 'reviewing', 2: 'reviewing'}
+
+        apply_changes(known, changes)
+        assert known == {1: 'reviewing', 2: 'approved', 3: 'reviewing'}
+
+    def test_repeated_homework_counts_once(self):
+        homeworks = [
+            Homework(1, 'hw1', 'reviewing'),
+            Homework(1, 'hw1', 'approved'),
+        ]
+        changes = detect_changes({}, homeworks)
+        assert [c.new_status for c in changes] == ['approved']
+
+    def test_homework_without_id(self):
+        with pytest.raises(KeyError):
+            detect_changes({}, [Homework(None, 'hw', 'approved')])
+
+    def test_homework_not_dict(self):
+        import homework
+        from exceptions import HomeworkIsNotDict
+
+        state = SubscriberState(0)
+        with pytest.raises(HomeworkIsNotDict):
+            homework.handle_answer(state, {'homeworks': ['x']}, 0)
+        assert state.homework_statuses == {}, (
+            'Проверьте, что ответ с домашкой не в формате dict не меняет кэш'
+        )
+
+    def test_no_duplicate_sends_across_cycles(self, monkeypatch):
+        import homework
+
+        answers = [
+            make_homeworks(),
+            make_homeworks(),
+            make_homeworks()[:5] + [
+                dict(hw, status='approved') for hw in make_homeworks()[5:8]
+            ],
+        ]
+
+        def mock_request(current_timestamp, token, session,
+                         validators=None):
+            return {'homeworks': answers.pop(0), 'current_date': 1}
+
+        monkeypatch.setattr(
+            homework, 'request_homework_statuses', mock_request
+        )
+        subscriber = Subscriber('token', '1')
+        state = SubscriberState(current_timestamp=0)
+
+        sent_per_cycle = []
+        for _ in range(3):
+            outbox = MockOutbox()
+            homework.poll_subscriber(outbox, None, subscriber, state)
+            sent_per_cycle.append(len(outbox.sent))
+
+        assert sent_per_cycle == [HOMEWORKS_QTY, 0, 3], (
+            'Проверьте, что об одном и том же статусе домашки '
+            'сообщение отправляется только один раз'
+        )
+        assert len(state.homework_statuses) == HOMEWORKS_QTY
@@ -0,0 +1,85 @@
+import pytest
+import requests
+
+import circuit_breaker
+from circuit_breaker import CircuitBreaker, classify_error
+from exceptions import (CircuitOpenError, ForeignServerAnswerError,
+                        ForeignServerError, HomeworksIsNotList)
+
+
+class MockResponse:
+
+    def __init__(self, status_code):
+        self.status_code = status_code
+
+
+def fail(breaker, error):
+    with pytest.raises(type(error)):
+        with breaker.guard():
+            raise error
+
+
+class TestClassifyError:
+
+    @pytest.mark.parametrize('error, kind', [
+        (ForeignServerError('connection reset'), 'transient'),
+        (requests.HTTPError('502', response=MockResponse(502)), 'transient'),
+        (requests.HTTPError('429', response=MockResponse(429)), 'transient'),
+        (requests.HTTPError('401', response=MockResponse(401)), 'fatal'),
+        (ForeignServerAnswerError('not_authenticated'), 'fatal'),
+        (KeyError('homeworks'), 'data'),
+        (HomeworksIsNotList('dict'), 'data'),
+    ])
+    def test_taxonomy(self, error, kind):
+        assert classify_error(error) == kind, (
+            f'Проверьте, что {error!r} относится к ошибкам {kind}'
+        )
+
+
+class TestCircuitBreaker:
+
+    def test_opens_after_transient_failures(self):
+        breaker = CircuitBreaker(failure_threshold=3, recovery_time=60)
+        for _ in range(3):
+            fail(breaker, ForeignServerError('timeout'))
+
+        assert breaker.state == circuit_breaker.OPEN
+        with pytest.raises(CircuitOpenError):
+            with breaker.guard():
+                assert False, (
+                    'Проверьте, что при разомкнутой цепи запрос не уходит'
+                )
+
+    def test_data_errors_do_not_open(self):
+        breaker = CircuitBreaker(failure_threshold=2)
+        for _ in range(5):
+            fail(breaker, KeyError('homeworks'))
+            fail(breaker, requests.HTTPError('401', response=MockResponse(401)))
+        assert breaker.state == circuit_breaker.CLOSED, (
+            'Проверьте, что ошибки данных и токена не размыкают цепь'
+        )
+
+    def test_half_open_probe_recovers(self, monkeypatch):
+        breaker = CircuitBreaker(failure_threshold=1, recovery_time=10)
+        now = [100.0]
+        monkeypatch.setattr(circuit_breaker.time, 'monotonic', lambda: now[0])
+        fail(breaker, ForeignServerError('timeout'))
+        assert not breaker.allow()
+
+        now[0] += 10
+        assert breaker.allow(), 'Проверьте, что после паузы уходит проба'
+        assert not breaker.allow(), (
+            'Проверьте, что в полуоткрытом состоянии уходит одна проба'
+        )
+        breaker.record()
+        assert breaker.state == circuit_breaker.CLOSED
+
+    def test_failed_probe_opens_again(self, monkeypatch):
+        breaker = CircuitBreaker(failure_threshold=1, recovery_time=10)
+        now = [100.0]
+        monkeypatch.setattr(circuit_breaker.time, 'monotonic', lambda: now[0])
+        fail(breaker, ForeignServerError('timeout'))
+        now[0] += 10
+        fail(breaker, ForeignServerError('timeout'))
+        assert breaker.state == circuit_breaker.OPEN
+        assert not breaker.allow()
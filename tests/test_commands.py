@@ -0,0 +1,169 @@
+from types import SimpleNamespace
+
+from commands import (HELP, NOT_SUBSCRIBED, REPLIES, STATUS_LABELS,
+                      CommandHandlers, command_of)
+from records import Transition
+from storage import StateStore
+from subscribers import Subscriber, SubscriberState
+from templates import BUILTIN_LOCALES, TemplateRegistry
+from utils import MockOutbox
+
+VERDICTS = {
+    'approved': 'Работа проверена: ревьюеру всё понравилось. Ура!',
+    'reviewing': 'Работа взята на проверку ревьюером.',
+}
+TEMPLATES = TemplateRegistry(
+    {
+        **BUILTIN_LOCALES,
+        'ru': {
+            'message': 'Изменился статус проверки работы "{name}". {verdict}',
+            'verdicts': VERDICTS,
+            'labels': STATUS_LABELS,
+            'replies': REPLIES,
+        },
+    },
+    'ru',
+)
+
+
+def make_handlers():
+    subscriber = Subscriber('token', '1')
+    state = SubscriberState(0, {1: 'approved', 2: 'reviewing'})
+    state.history.extend([
+        Transition(100, 1, 'hw1', 'reviewing'),
+        Transition(200, 1, 'hw1', 'approved'),
+    ])
+    outbox = MockOutbox()
+    return CommandHandlers({subscriber: state}, TEMPLATES, outbox), state
+
+
+class TestCommands:
+
+    def test_command_names(self):
+        assert command_of('/status') == 'status'
+        assert command_of('/History@homework_bot extra') == 'history'
+        assert command_of('hello') == ''
+        assert command_of(None) == ''
+
+    def test_commands_do_not_request_practicum(self, monkeypatch):
+        import homework
+
+        def fail(*args, **kwargs):
+            raise AssertionError('Команда обратилась к API Практикума')
+
+        monkeypatch.setattr(homework, 'request_homework_statuses', fail)
+        handlers, _ = make_handlers()
+        update = SimpleNamespace(
+            effective_chat=SimpleNamespace(id=1),
+            effective_message=SimpleNamespace(text='/status'),
+        )
+        handlers.on_update(update)
+
+        (chat_id, reply), = handlers.outbox.sent
+        assert chat_id == '1'
+        assert 'принято: 1' in reply and 'на проверке: 1' in reply, (
+            'Проверьте, что /status считает работы по статусам из кэша'
+        )
+        assert '"hw1". ' + VERDICTS['approved'] in reply, (
+            'Проверьте, что /status показывает последнее изменение'
+        )
+
+    def test_history_newest_first(self):
+        handlers, _ = make_handlers()
+        lines = handlers.answer('1', 'history').splitlines()
+        assert len(lines) == 2
+        assert lines[0].endswith(VERDICTS['approved']), (
+            'Проверьте, что /history начинается с последнего изменения'
+        )
+
+    def test_unknown_chat_and_command(self):
+        handlers, _ = make_handlers()
+        assert handlers.answer('2', 'status') == NOT_SUBSCRIBED
+        assert handlers.answer('2', 'help') == HELP
+        assert HELP in handlers.answer('1', 'delete')
+
+    def test_replies_in_chat_locale(self):
+        subscriber = Subscriber(
+            'token', 'student', ('mentor',), (('mentor', 'en'),)
+        )
+        state = SubscriberState(0, {1: 'approved'})
+        state.history.append(Transition(200, 1, 'hw1', 'approved'))
+        handlers = CommandHandlers({subscriber: state}, TEMPLATES)
+
+        assert 'accepted: 1' in handlers.answer('mentor', 'status'), (
+            'Проверьте, что /status отвечает на языке чата'
+        )
+        english = BUILTIN_LOCALES['en']['verdicts']['approved']
+        assert handlers.answer('mentor', 'history').endswith(english), (
+            'Проверьте, что /history отвечает на языке чата'
+        )
+        assert 'принято: 1' in handlers.answer('student', 'status'), (
+            'Проверьте, что язык наставника не меняет ответы студенту'
+        )
+
+    def test_pause_stops_notifications(self, monkeypatch):
+        import homework
+
+        answers = [
+            {'homeworks': [{'id': 3, 'homework_name': 'hw3',
+                            'status': 'reviewing'}], 'current_date': 1},
+            {'homeworks': [{'id': 3, 'homework_name': 'hw3',
+                            'status': 'approved'}], 'current_date': 2},
+        ]
+
+        def mock_request(current_timestamp, token, session,
+                         validators=None):
+            return answers.pop(0)
+
+        monkeypatch.setattr(
+            homework, 'request_homework_statuses', mock_request
+        )
+        handlers, state = make_handlers()
+        subscriber, = handlers.states
+        outbox = MockOutbox()
+
+        handlers.answer('1', 'pause')
+        homework.poll_subscriber(outbox, None, subscriber, state)
+        assert outbox.sent == [], (
+            'Проверьте, что на паузе уведомления не отправляются'
+        )
+        assert state.homework_statuses[3] == 'reviewing', (
+            'Проверьте, что на паузе статусы продолжают обновляться'
+        )
+
+        handlers.answer('1', 'resume')
+        homework.poll_subscriber(outbox, None, subscriber, state)
+        assert len(outbox.sent) == 1
+        assert state.history[-1][1:] == (3, 'hw3', 'approved'), (
+            'Проверьте, что смены статусов попадают в историю'
+        )
+
+    def test_pause_is_per_chat(self):
+        subscriber = Subscriber('token', 'student', ('mentor',))
+        state = SubscriberState(0)
+        handlers = CommandHandlers({subscriber: state}, TEMPLATES)
+
+        handlers.answer('mentor', 'pause')
+        assert state.paused == {'mentor'}, (
+            'Проверьте, что /pause наставника не выключает уведомления '
+            'студенту'
+        )
+        assert handlers.answer('student', 'status') != NOT_SUBSCRIBED
+
+    def test_pause_is_saved_at_once(self, tmp_path):
+        path = str(tmp_path / 'state.sqlite3')
+        subscriber = Subscriber('token', '1')
+        store = StateStore(path)
+        states = store.load([subscriber], 0)
+        handlers = CommandHandlers(states, TEMPLATES, store=store)
+
+        handlers.answer('1', 'pause')
+        restarted = StateStore(path)
+        assert restarted.load([subscriber], 0)[subscriber].paused == {'1'}, (
+            'Проверьте, что пауза сохраняется сразу, а не со следующим опросом'
+        )
+        store.save(states)
+        handlers.answer('1', 'resume')
+        assert restarted.load([subscriber], 0)[subscriber].paused == set()
+        restarted.close()
+        store.close()
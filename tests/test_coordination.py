@@ -0,0 +1,116 @@
+import time
+
+import pytest
+
+from coordination import (LeaseBackend, LeaseManager, SQLiteLeaseBackend,
+                          SubscriberLeases)
+from subscribers import Subscriber
+
+RESOURCES = [f'all:{i}' for i in range(8)]
+
+
+class TestLeaseManager:
+
+    def managers(self, tmp_path, *owners, ttl=60):
+        path = str(tmp_path / 'leases.sqlite3')
+        return [
+            LeaseManager(SQLiteLeaseBackend(path), owner, 'all', RESOURCES, ttl)
+            for owner in owners
+        ]
+
+    def test_replicas_split_resources(self, tmp_path):
+        first, second = self.managers(tmp_path, 'first', 'second')
+        first.refresh(now=0)
+        second.refresh(now=1)
+        first.refresh(now=2)
+        second.refresh(now=3)
+
+        assert len(first.held) == len(second.held) == 4, (
+            'Проверьте, что копии делят ресурсы поровну'
+        )
+        assert not first.held & second.held, (
+            'Проверьте, что ресурс арендует только одна копия'
+        )
+
+    def test_dead_replica_leases_move(self, tmp_path):
+        first, second = self.managers(tmp_path, 'first', 'second', ttl=60)
+        first.refresh(now=0)
+        second.refresh(now=0)
+        first.refresh(now=0)
+        second.refresh(now=0)
+        # second больше не продлевает аренду
+        first.refresh(now=30)
+        assert len(first.held) == 4
+
+        first.refresh(now=61)
+        assert first.held == set(RESOURCES), (
+            'Проверьте, что аренда упавшей копии переходит к живой'
+        )
+
+    def test_newcomer_gets_share(self, tmp_path):
+        first, second = self.managers(tmp_path, 'first', 'second')
+        first.refresh(now=0)
+        assert first.held == set(RESOURCES)
+
+        second.refresh(now=1)
+        assert second.held == set(), 'Занятые ресурсы не должны отниматься'
+        first.refresh(now=2)
+        second.refresh(now=3)
+        assert len(first.held) == len(second.held) == 4, (
+            'Проверьте, что копия отдает лишнее новой копии'
+        )
+
+
+class TestSubscriberLeases:
+
+    def test_gained_and_lost_subscribers(self, tmp_path):
+        path = str(tmp_path / 'leases.sqlite3')
+        subscribers = [Subscriber(f'token-{i}', str(i)) for i in range(20)]
+        leases = SubscriberLeases(
+            SQLiteLeaseBackend(path), 'first', 'all', subscribers,
+            buckets=4, renew_time=20,
+        )
+
+        gained, lost = leases.refresh(now=0)
+        assert sorted(gained, key=str) == sorted(subscribers, key=str)
+        assert lost == []
+        assert all(leases.owns(subscriber) for subscriber in subscribers)
+        assert leases.refresh(now=5) == ([], []), (
+            'Проверьте, что аренда продлевается не чаще renew_time'
+        )
+
+    def test_cycle_longer_than_lease(self, tmp_path):
+        import homework
+
+        path = str(tmp_path / 'leases.sqlite3')
+        subscribers = [Subscriber(f'token-{i}', str(i)) for i in range(20)]
+        first, second = [
+            SubscriberLeases(
+                SQLiteLeaseBackend(path), owner, 'all', subscribers,
+                buckets=4, ttl=0.3, renew_time=0.1, margin=0.05,
+            )
+            for owner in ('first', 'second')
+        ]
+        first.refresh()
+        assert all(first.owns(subscriber) for subscriber in subscribers)
+
+        # цикл первой копии идет дольше аренды, продлить ее некому
+        time.sleep(0.4)
+        second.refresh()
+        assert all(second.owns(subscriber) for subscriber in subscribers)
+        assert not any(first.owns(subscriber) for subscriber in subscribers), (
+            'Проверьте, что истекшая аренда не дает опрашивать подписчиков'
+        )
+        gained, lost = first.refresh()
+        assert gained == [] and len(lost) == len(subscribers)
+        assert homework.cycle_deadline(first) <= (
+            homework.LEASE_TIME - homework.LEASE_RENEW_TIME
+        ), 'Проверьте, что цикл заканчивается раньше, чем истекает аренда'
+
+    def test_incomplete_backend_fails_early(self):
+        class HeartbeatOnly(LeaseBackend):
+            def heartbeat(self, owner, scope, expires_at):
+                pass
+
+        with pytest.raises(TypeError):
+            HeartbeatOnly()
@@ -0,0 +1,85 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from subscribers import Subscriber, SubscriberState
+from utils import MockOutbox
+
+
+def slow_answer(current_timestamp, token, session, validators=None):
+    time.sleep(0.3)
+    return {'homeworks': [], 'current_date': 1}
+
+
+class TestCycleDeadline:
+
+    def test_threaded_cycle_stops_at_deadline(self, monkeypatch):
+        import homework
+
+        monkeypatch.setattr(homework, 'request_homework_statuses', slow_answer)
+        states = {
+            Subscriber(f'token-{i}', str(i)): SubscriberState(0)
+            for i in range(3)
+        }
+        misses = homework.DEADLINE_MISSES.value
+
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            started = time.monotonic()
+            running, cancelled = homework.poll_all(
+                executor, MockOutbox(), None, states, deadline=0.1
+            )
+            elapsed = time.monotonic() - started
+            assert elapsed < 0.3, (
+                'Проверьте, что цикл не ждет опросов дольше дедлайна'
+            )
+            assert len(running) == 1 and len(cancelled) == 2, (
+                'Проверьте, что не начатые к дедлайну опросы отменяются'
+            )
+            assert homework.DEADLINE_MISSES.value == misses + 1
+
+            time.sleep(0.3)
+            finished = homework.settle_in_flight(running, states)
+        assert len(finished) == 1 and not running, (
+            'Проверьте, что опоздавший опрос забирается после завершения'
+        )
+
+    def test_async_cycle_cancels_at_deadline(self, monkeypatch):
+        import homework
+
+        async def slow_async_answer(session, current_timestamp, token,
+                                    validators=None):
+            await asyncio.sleep(1)
+            return {'homeworks': [], 'current_date': 1}
+
+        monkeypatch.setattr(
+            homework, 'async_get_api_answer', slow_async_answer
+        )
+        states = {Subscriber('token', '1'): SubscriberState(0)}
+
+        async def poll():
+            return await homework.async_poll_all(
+                None, asyncio.Semaphore(1), MockOutbox(), states, deadline=0.1
+            )
+
+        cancelled = asyncio.run(poll())
+        assert cancelled == list(states), (
+            'Проверьте, что опрос отменяется по дедлайну цикла'
+        )
+        assert next(iter(states.values())).current_timestamp == 0, (
+            'Проверьте, что отмененный опрос не меняет курсор'
+        )
+
+    def test_empty_cycle_is_not_counted(self):
+        import homework
+
+        cycles = homework.POLL_CYCLES.value
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            assert homework.poll_all(
+                executor, MockOutbox(), None, {}, deadline=0.1
+            ) == ({}, [])
+        assert asyncio.run(homework.async_poll_all(
+            None, asyncio.Semaphore(1), MockOutbox(), {}, deadline=0.1
+        )) == []
+        assert homework.POLL_CYCLES.value == cycles, (
+            'Проверьте, что пробуждение без опросов не считается циклом'
+        )
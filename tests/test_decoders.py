@@ -0,0 +1,36 @@
+import pytest
+
+from decoders import DECODERS, get_decoder
+
+BODY = (
+    '{"homeworks": [{"id": 1, "homework_name": "Проект", '
+    '"status": "approved"}], "current_date": 100}'
+).encode()
+
+
+class TestDecoders:
+
+    @pytest.mark.parametrize('name', sorted(DECODERS))
+    def test_backends_agree(self, name):
+        assert get_decoder(name)(BODY) == get_decoder('json')(BODY), (
+            f'Проверьте, что декодер {name} дает тот же результат, что json'
+        )
+
+    def test_auto_prefers_fast_backend(self):
+        pytest.importorskip('orjson')
+        assert get_decoder('auto') is DECODERS['orjson']
+
+    def test_unknown_backend(self):
+        with pytest.raises(ValueError):
+            get_decoder('simdjson')
+
+    def test_raw_body_is_decoded(self):
+        import homework
+
+        class MockResponse:
+            content = BODY
+
+            def json(self):
+                raise AssertionError('тело уже получено, json() не нужен')
+
+        assert homework.decode_response(MockResponse())['current_date'] == 100
@@ -0,0 +1,89 @@
+from changes import StatusChange
+from digest import MESSAGE_LIMIT, Digest, pack
+from records import Homework
+from subscribers import Subscriber, SubscriberState
+from utils import MockOutbox
+
+
+def change(homework_id, old, new):
+    homework = Homework(homework_id, f'hw{homework_id}', new)
+    return StatusChange(homework, old, new)
+
+
+class TestDigest:
+
+    def test_intermediate_statuses_collapse(self):
+        digest = Digest(window=60)
+        digest.add(['1'], 'token', [change(1, None, 'reviewing')],
+                   ['hw1 reviewing'], now=0)
+        digest.add(['1'], 'token', [change(1, 'reviewing', 'approved'),
+                                    change(2, 'reviewing', 'rejected')],
+                   ['hw1 approved', 'hw2 rejected'], now=30)
+        digest.add(['1'], 'token', [change(2, 'rejected', 'reviewing')],
+                   ['hw2 reviewing'], now=40)
+
+        assert digest.pop_due(now=59) == [], (
+            'Проверьте, что дайджест ждет окончания окна'
+        )
+        assert digest.pop_due(now=60) == [(('1',), 'hw1 approved')], (
+            'Проверьте, что из окна уходит только итоговый статус, а '
+            'вернувшаяся к прежнему статусу работа не упоминается'
+        )
+        assert len(digest) == 0
+
+    def test_chat_of_several_tokens_gets_one_digest(self):
+        digest = Digest(window=60)
+        digest.add(['student-1', 'mentor'], 'first',
+                   [change(1, None, 'approved')], ['first hw1'], now=0)
+        digest.add(['student-2', 'mentor'], 'second',
+                   [change(1, None, 'rejected')], ['second hw1'], now=10)
+
+        assert sorted(digest.pop_due(now=60)) == [
+            (('mentor',), 'first hw1\n\nsecond hw1'),
+            (('student-1',), 'first hw1'),
+        ], (
+            'Проверьте, что чат в копии у нескольких студентов получает '
+            'один дайджест, а одинаковые id домашек разных токенов не '
+            'смешиваются'
+        )
+        assert digest.pop_due(now=70) == [(('student-2',), 'second hw1')]
+
+    def test_long_digest_is_split(self):
+        texts = ['x' * 1000] * 9
+        messages = pack(texts)
+        assert len(messages) == 3
+        assert all(len(message) <= MESSAGE_LIMIT for message in messages)
+        assert '\n\n'.join(messages) == '\n\n'.join(texts)
+
+    def test_one_message_per_chat_and_cycle(self, monkeypatch):
+        import homework
+
+        def mock_request(current_timestamp, token, session,
+                         validators=None):
+            return {
+                'homeworks': [
+                    {'id': number, 'homework_name': f'hw{number}',
+                     'status': 'approved'}
+                    for number in range(3)
+                ],
+                'current_date': 1,
+            }
+
+        monkeypatch.setattr(homework, 'DIGEST', Digest(window=0))
+        monkeypatch.setattr(
+            homework, 'request_homework_statuses', mock_request
+        )
+        outbox = MockOutbox()
+        states = {
+            Subscriber('token', '1'): SubscriberState(0),
+            Subscriber('paused', '2'): SubscriberState(0, paused={'2'}),
+        }
+        for subscriber, state in states.items():
+            homework.poll_subscriber(outbox, None, subscriber, state)
+        assert outbox.sent == []
+
+        homework.flush_digest(outbox)
+        (chat_id, text), = outbox.sent
+        assert chat_id == '1' and text.count('Изменился статус') == 3, (
+            'Проверьте, что смены статусов за цикл идут одним сообщением'
+        )
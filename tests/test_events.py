@@ -0,0 +1,115 @@
+import os
+
+from changes import StatusChange
+from events import INDEX_SUFFIX, RECORD, EventLog
+from records import Homework
+from subscribers import Subscriber, SubscriberState
+
+
+def change(homework_id, old, new):
+    homework = Homework(homework_id, f'hw{homework_id}', new)
+    return StatusChange(homework, old, new)
+
+
+class TestEventLog:
+
+    def test_chat_range_query(self, tmp_path):
+        log = EventLog(str(tmp_path / 'events.bin'))
+        log.append(['1'], 100, [change(1, None, 'reviewing')])
+        log.append(['2'], 150, [change(7, None, 'reviewing')])
+        log.append(['1'], 200, [change(1, 'reviewing', 'approved'),
+                                change(2, None, 'reviewing')])
+        events = log.since('1', 150)
+        log.close()
+
+        assert [(e.changed_at, e.homework_id, e.old_status, e.new_status)
+                for e in events] == [
+            (200, 1, 'reviewing', 'approved'),
+            (200, 2, None, 'reviewing'),
+        ], 'Проверьте, что журнал отдает смены статусов чата с момента T'
+        assert os.path.getsize(tmp_path / 'events.bin') == 4 * RECORD.size
+
+    def test_index_survives_restart_and_crash(self, tmp_path):
+        path = str(tmp_path / 'events.bin')
+        log = EventLog(path)
+        log.append(['1'], 100, [change(1, None, 'reviewing')])
+        log.close()
+        assert os.path.exists(path + INDEX_SUFFIX)
+
+        # запись после сохранения индекса и оборванный хвост
+        log = EventLog(path)
+        log.append(['1'], 200, [change(1, 'reviewing', 'rejected')])
+        log._file.close()
+        with open(path, 'ab') as file:
+            file.write(b'\0' * (RECORD.size // 2))
+
+        log = EventLog(path)
+        assert len(log) == 2, (
+            'Проверьте, что оборванная запись журнала отбрасывается'
+        )
+        assert [e.new_status for e in log.since('1')] == [
+            'reviewing', 'rejected'
+        ], 'Проверьте, что индекс дочитывает записи после сохраненного'
+        log.close()
+
+    def test_time_does_not_go_back_within_chat(self, tmp_path):
+        log = EventLog(str(tmp_path / 'events.bin'))
+        log.append(['1'], 200, [change(1, None, 'reviewing')])
+        log.append(['1'], 100, [change(1, 'reviewing', 'approved')])
+        assert [e.changed_at for e in log.since('1', 150)] == [200, 200]
+        log.close()
+
+    def test_review_turnaround(self, tmp_path):
+        log = EventLog(str(tmp_path / 'events.bin'))
+        for chat in range(10):
+            log.append([chat], 0, [change(1, None, 'reviewing')])
+            log.append([chat], (chat + 1) * 60, [
+                change(1, 'reviewing', 'approved')
+            ])
+        percentiles = log.turnaround()
+        log.close()
+        assert percentiles[0.5] == 300 and percentiles[0.99] == 600, (
+            'Проверьте расчет перцентилей времени проверки'
+        )
+
+    def test_fan_out_is_indexed_per_chat(self, tmp_path):
+        log = EventLog(str(tmp_path / 'events.bin'))
+        log.append(['student', 'mentor'], 0, [change(1, None, 'reviewing')])
+        log.append(['student', 'mentor'], 60, [
+            change(1, 'reviewing', 'approved')
+        ])
+        assert [e.new_status for e in log.since('mentor')] == [
+            'reviewing', 'approved'
+        ], 'Проверьте, что смены статусов находятся и по чату из cc'
+        assert log.turnaround() == {0.5: 60, 0.9: 60, 0.99: 60}, (
+            'Проверьте, что проверка, разосланная в несколько чатов, '
+            'считается один раз'
+        )
+        log.close()
+
+    def test_poll_writes_transitions(self, tmp_path, monkeypatch):
+        import homework
+
+        def mock_request(current_timestamp, token, session,
+                         validators=None):
+            return {
+                'homeworks': [
+                    {'id': 5, 'homework_name': 'hw5', 'status': 'approved'}
+                ],
+                'current_date': 500,
+            }
+
+        log = EventLog(str(tmp_path / 'events.bin'))
+        monkeypatch.setattr(homework, 'EVENT_LOG', log)
+        monkeypatch.setattr(
+            homework, 'request_homework_statuses', mock_request
+        )
+        state = SubscriberState(0, {5: 'reviewing'})
+        homework.poll_subscriber(
+            homework.Outbox(), None, Subscriber('token', '9'), state
+        )
+        events = log.since('9')
+        log.close()
+        assert [tuple(e[:1] + e[2:]) for e in events] == [
+            (500, 5, 'reviewing', 'approved')
+        ], 'Проверьте, что смена статуса пишется в журнал со временем сервера'
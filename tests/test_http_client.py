@@ -0,0 +1,167 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import http_client
+
+
+class KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        body = json.dumps({'homeworks': [], 'current_date': 0}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class ConditionalHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # ETag отдается, только если тест его включил
+    etag = None
+    polls = 0
+
+    def do_GET(self):
+        type(self).polls += 1
+        if self.etag and self.headers.get('If-None-Match') == self.etag:
+            self.send_response(304)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        body = json.dumps({
+            'homeworks': [
+                {'id': 1, 'homework_name': 'hw', 'status': 'approved'}
+            ],
+            'current_date': self.polls,
+        }).encode()
+        self.send_response(200)
+        if self.etag:
+            self.send_header('ETag', self.etag)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def conditional_server(monkeypatch):
+    import homework
+
+    ConditionalHandler.etag = None
+    ConditionalHandler.polls = 0
+    server = ThreadingHTTPServer(('127.0.0.1', 0), ConditionalHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setattr(
+        homework, 'ENDPOINT', f'http://127.0.0.1:{server.server_address[1]}/'
+    )
+    yield ConditionalHandler
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def local_url():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), KeepAliveHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{server.server_address[1]}/'
+    server.shutdown()
+    server.server_close()
+
+
+class TestPooledSession:
+
+    def test_connection_is_reused(self, local_url):
+        before = http_client.connection_stats()
+
+        with http_client.PooledSession(pool_size=2) as session:
+            for _ in range(3):
+                response = session.get(local_url)
+                assert response.json()['homeworks'] == []
+
+        after = http_client.connection_stats()
+        assert after['opened'] - before['opened'] == 1, (
+            'Проверьте, что сессия открывает одно соединение на все запросы'
+        )
+        assert after['reused'] - before['reused'] == 2, (
+            'Проверьте, что повторные запросы идут по открытому соединению'
+        )
+
+    def test_default_timeout(self, monkeypatch):
+        captured = {}
+
+        def mock_request(self, method, url, **kwargs):
+            captured.update(kwargs)
+
+        monkeypatch.setattr(
+            http_client.requests.Session, 'request', mock_request
+        )
+        session = http_client.PooledSession(connect_timeout=1, read_timeout=2)
+        session.get('http://example.invalid/')
+
+        assert captured['timeout'] == (1, 2), (
+            'Проверьте, что сессия передает таймауты подключения и чтения'
+        )
+
+
+class TestConditionalRequests:
+
+    def poll_twice(self):
+        import homework
+
+        validators = http_client.AnswerValidators()
+        with http_client.PooledSession() as session:
+            return [
+                homework.request_homework_statuses(
+                    0, 'token', session, validators=validators
+                )
+                for _ in range(2)
+            ]
+
+    def test_etag_is_sent_back(self, conditional_server):
+        import homework
+
+        conditional_server.etag = '"v1"'
+        skipped = homework.ANSWERS_NOT_MODIFIED.value
+        first, second = self.poll_twice()
+
+        assert len(first['homeworks']) == 1
+        assert second == {'homeworks': [], 'current_date': 0}, (
+            'Проверьте, что ответ 304 не меняет статусы и курсор'
+        )
+        assert homework.ANSWERS_NOT_MODIFIED.value == skipped + 1
+
+    def test_repeated_body_is_not_decoded(self, conditional_server):
+        import homework
+
+        unchanged = homework.ANSWERS_UNCHANGED.value
+        decoded = homework.ANSWERS_DECODED.value
+        first, second = self.poll_twice()
+
+        assert first['current_date'] == 1
+        assert second == {'homeworks': [], 'current_date': 2}, (
+            'Проверьте, что повтор ответа пропускается, а курсор движется'
+        )
+        assert homework.ANSWERS_UNCHANGED.value == unchanged + 1
+        assert homework.ANSWERS_DECODED.value == decoded + 1
+
+    def test_failed_answer_is_handled_again(self):
+        import homework
+        from subscribers import SubscriberState
+
+        state = SubscriberState(0)
+        state.validators.is_repeat(b'{"homeworks": []}')
+        homework.handle_error(state, KeyError('status'))
+        assert not state.validators.is_repeat(b'{"homeworks": []}'), (
+            'Проверьте, что после ошибки следующий ответ разбирается целиком'
+        )
@@ -0,0 +1,137 @@
+import asyncio
+import os
+import signal
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from lifecycle import Wakeup
+from subscribers import Subscriber, SubscriberState
+from utils import MockOutbox
+
+
+def slow_answer(current_timestamp, token, session, validators=None):
+    time.sleep(0.3)
+    return {'homeworks': [], 'current_date': 1}
+
+
+class TestWakeup:
+
+    def test_stop_interrupts_wait(self):
+        wakeup = Wakeup()
+        threading.Timer(0.1, wakeup.stop).start()
+        started = time.monotonic()
+        wakeup.wait(10)
+        elapsed = time.monotonic() - started
+        wakeup.close()
+        assert elapsed < 5 and wakeup.stopping, (
+            'Проверьте, что остановка прерывает сон цикла'
+        )
+
+    def test_poll_request_is_not_lost(self):
+        wakeup = Wakeup()
+        wakeup.poll_now()
+        started = time.monotonic()
+        wakeup.wait(10)
+        assert time.monotonic() - started < 5, (
+            'Проверьте, что запрос опроса до начала сна его прерывает'
+        )
+        assert wakeup.take_poll_request()
+        assert not wakeup.take_poll_request()
+        assert not wakeup.stopping
+        wakeup.close()
+
+    def test_async_wait(self):
+        wakeup = Wakeup()
+
+        async def sleep():
+            asyncio.get_running_loop().call_later(0.1, wakeup.stop)
+            started = time.monotonic()
+            await wakeup.async_wait(10)
+            return time.monotonic() - started
+
+        elapsed = asyncio.run(sleep())
+        wakeup.close()
+        assert elapsed < 5, (
+            'Проверьте, что остановка прерывает сон цикла asyncio'
+        )
+
+    def test_signals(self):
+        handlers = {
+            number: signal.getsignal(number)
+            for number in (signal.SIGTERM, signal.SIGINT, signal.SIGUSR1)
+        }
+        wakeup = Wakeup()
+        try:
+            wakeup.handle_signals()
+            os.kill(os.getpid(), signal.SIGUSR1)
+            wakeup.wait(1)
+            assert wakeup.take_poll_request(), (
+                'Проверьте, что SIGUSR1 запрашивает внеочередной опрос'
+            )
+            os.kill(os.getpid(), signal.SIGTERM)
+            wakeup.wait(1)
+            assert wakeup.stopping, 'Проверьте, что SIGTERM останавливает бота'
+        finally:
+            for number, handler in handlers.items():
+                signal.signal(number, handler)
+            wakeup.close()
+
+
+class TestShutdown:
+
+    def test_shutdown_cuts_cycle_short(self, monkeypatch):
+        import homework
+
+        monkeypatch.setattr(homework, 'request_homework_statuses', slow_answer)
+        monkeypatch.setattr(homework, 'STOP_CHECK_TIME', 0.05)
+        states = {
+            Subscriber(f'token-{i}', str(i)): SubscriberState(0)
+            for i in range(3)
+        }
+        wakeup = Wakeup()
+        threading.Timer(0.1, wakeup.stop).start()
+
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            started = time.monotonic()
+            running, cancelled = homework.poll_all(
+                executor, MockOutbox(), None, states, 60, wakeup
+            )
+            elapsed = time.monotonic() - started
+        wakeup.close()
+        assert elapsed < 0.3, (
+            'Проверьте, что остановка не ждет дедлайна цикла'
+        )
+        assert len(running) == 1 and len(cancelled) == 2
+
+    def test_poll_now_skips_busy(self):
+        import homework
+
+        subscribers = [Subscriber(f'token-{i}', str(i)) for i in range(3)]
+        states = {s: SubscriberState(0) for s in subscribers}
+        scheduler = homework.PollScheduler()
+        homework.poll_now(scheduler, states, busy={subscribers[0]: None})
+
+        assert sorted(scheduler.pop_due(time.monotonic()), key=str) == (
+            sorted(subscribers[1:], key=str)
+        ), (
+            'Проверьте, что опрос по запросу не дублирует идущие опросы'
+        )
+
+
+class TestModes:
+
+    def test_unknown_modes_are_rejected(self, monkeypatch):
+        import homework
+
+        monkeypatch.setattr(homework, 'POLLING_MODE', 'thread')
+        with pytest.raises(ValueError):
+            homework.run_polling([])
+        monkeypatch.setattr(homework, 'COMMANDS', 'poll')
+        with pytest.raises(ValueError):
+            homework.start_commands({}, homework.Outbox(), None)
+        monkeypatch.setattr(homework, 'COORDINATION', 'redis')
+        with pytest.raises(ValueError):
+            homework.make_leases([])
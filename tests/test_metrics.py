@@ -0,0 +1,75 @@
+import urllib.request
+
+import metrics
+
+
+class TestMetrics:
+
+    def test_histogram_samples_are_cumulative(self):
+        histogram = metrics.Histogram('test_seconds', 'Test.', (0.1, 1))
+        for value in (0.05, 0.5, 0.7, 5):
+            histogram.observe(value)
+
+        samples = dict(histogram.samples())
+        assert samples['test_seconds_bucket{le="0.1"}'] == 1
+        assert samples['test_seconds_bucket{le="1"}'] == 3, (
+            'Проверьте, что корзины гистограммы накопительные'
+        )
+        assert samples['test_seconds_bucket{le="+Inf"}'] == 4
+        assert samples['test_seconds_count'] == 4
+        assert abs(samples['test_seconds_sum'] - 6.25) < 1e-9
+
+    def test_snapshots_of_processes_add_up(self):
+        histogram = metrics.histogram('test_merge_seconds', 'Test.', (1,))
+        with histogram.time():
+            pass
+        values = metrics.snapshot()
+        merged = metrics.merge([values, values])
+
+        assert merged['test_merge_seconds_count'] == (
+            2 * values['test_merge_seconds_count']
+        ), (
+            'Проверьте, что гистограммы шардов складываются'
+        )
+
+    def test_metrics_endpoint(self):
+        metrics.counter('test_served_total', 'Served.').inc(3)
+        server = metrics.serve('127.0.0.1', 0)
+        port = server.server_address[1]
+        try:
+            url = f'http://127.0.0.1:{port}/metrics'
+            with urllib.request.urlopen(url, timeout=5) as response:
+                content_type = response.headers['Content-Type']
+                body = response.read().decode()
+        finally:
+            server.shutdown()
+            server.server_close()
+
+        assert content_type.startswith('text/plain')
+        assert '# TYPE test_served_total counter' in body
+        assert '\ntest_served_total 3\n' in body, (
+            'Проверьте, что /metrics отдает счетчики в формате Prometheus'
+        )
+
+    def test_request_is_timed(self):
+        import homework
+
+        class MockResponse:
+            status_code = 200
+
+            def json(self):
+                return {'homeworks': [], 'current_date': 1}
+
+        class MockSession:
+
+            def get(self, **kwargs):
+                return MockResponse()
+
+        requests_before = homework.REQUEST_SECONDS.count
+        decodes_before = homework.DECODE_SECONDS.count
+        homework.request_homework_statuses(0, 'token', MockSession())
+
+        assert homework.REQUEST_SECONDS.count == requests_before + 1, (
+            'Проверьте, что время запроса к Практикуму попадает в гистограмму'
+        )
+        assert homework.DECODE_SECONDS.count == decodes_before + 1
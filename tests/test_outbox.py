@@ -0,0 +1,127 @@
+import time
+
+import telegram
+
+from outbox import Outbox, OutboxSender, TokenBucket
+from storage import OutboxStore
+
+
+class MockLogger:
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: None
+
+
+class FlakyBot:
+
+    def __init__(self, errors=()):
+        self.errors = list(errors)
+        self.sent = []
+
+    def send_message(self, chat_id=None, text=None, **kwargs):
+        if self.errors:
+            raise self.errors.pop(0)
+        self.sent.append((chat_id, text))
+
+
+class TestTokenBucket:
+
+    def test_bucket_limits_rate(self):
+        bucket = TokenBucket(rate=2, capacity=2)
+        now = bucket.updated
+        bucket.consume(now)
+        bucket.consume(now)
+        assert bucket.delay(now) == 0.5, (
+            'Проверьте, что пустое ведро ждет пополнения по скорости'
+        )
+        assert bucket.delay(now + 0.5) == 0
+
+
+class TestOutbox:
+
+    def test_chat_messages_are_ordered_and_spaced(self):
+        outbox = Outbox(global_rate=100, chat_rate=1)
+        outbox.put(1, 'first')
+        outbox.put(1, 'second')
+        outbox.put(2, 'other chat')
+
+        message, _ = outbox.take(time.monotonic())
+        assert message.text == 'first'
+        outbox.done(message)
+
+        message, _ = outbox.take(time.monotonic())
+        assert message.text == 'other chat', (
+            'Проверьте, что второе сообщение в чат ждет лимита чата, '
+            'а другие чаты отправляются без очереди'
+        )
+        outbox.done(message)
+        message, wait = outbox.take(time.monotonic())
+        assert message is None and 0 < wait <= 1
+
+    def test_transient_error_is_retried(self):
+        outbox = Outbox(retry_base=0)
+        outbox.put(1, 'text')
+        bot = FlakyBot([telegram.error.TimedOut()])
+        sender = OutboxSender(outbox, bot, MockLogger())
+
+        sender.deliver(outbox.get(timeout=1))
+        assert len(outbox) == 1, (
+            'Проверьте, что сообщение остается в очереди после таймаута'
+        )
+        sender.deliver(outbox.get(timeout=1))
+        assert bot.sent == [('1', 'text')]
+        assert len(outbox) == 0
+
+    def test_permanent_error_is_dropped(self):
+        outbox = Outbox()
+        outbox.put(1, 'text')
+        bot = FlakyBot([telegram.error.Unauthorized('bot was blocked')])
+
+        OutboxSender(outbox, bot, MockLogger()).deliver(outbox.get(timeout=1))
+        assert len(outbox) == 0, (
+            'Проверьте, что сообщение удаляется, если Telegram его не примет'
+        )
+
+    def test_persisted_outbox_survives_restart(self, tmp_path):
+        path = str(tmp_path / 'state.sqlite3')
+        outbox = Outbox(store=OutboxStore(path))
+        outbox.put(1, 'first')
+        outbox.put(1, 'second')
+        outbox.done(outbox.get(timeout=1))
+        outbox.store.close()
+
+        outbox = Outbox(store=OutboxStore(path))
+        message = outbox.get(timeout=1)
+        outbox.store.close()
+        assert message.text == 'second', (
+            'Проверьте, что недоставленные сообщения переживают перезапуск'
+        )
+
+    def test_put_many_deduplicates_chats(self, tmp_path):
+        outbox = Outbox(store=OutboxStore(str(tmp_path / 'state.sqlite3')))
+        outbox.put_many([1, '2', '1'], 'text')
+        assert len(outbox) == 2, (
+            'Проверьте, что в один чат сообщение ставится один раз'
+        )
+        rows = outbox.store.load()
+        outbox.store.close()
+        assert [(chat_id, text) for _, chat_id, text in rows] == [
+            ('1', 'text'), ('2', 'text')
+        ]
+
+    def test_join_waits_for_delivery(self):
+        outbox = Outbox(global_rate=100, chat_rate=100)
+        outbox.put(1, 'first')
+        outbox.put(2, 'second')
+        assert not outbox.join(timeout=0.05), (
+            'Проверьте, что join() не ждет дольше таймаута'
+        )
+
+        bot = FlakyBot()
+        sender = OutboxSender(outbox, bot, MockLogger(), workers=1)
+        sender.start()
+        assert outbox.join(timeout=5), (
+            'Проверьте, что join() дожидается отправки всей очереди'
+        )
+        sender.stop(timeout=1)
+        assert len(bot.sent) == 2
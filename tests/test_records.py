@@ -0,0 +1,52 @@
+import json
+import sys
+
+from records import Homework
+from storage import StateStore
+from subscribers import Subscriber
+
+API_HOMEWORK = {
+    'id': 123,
+    'status': 'approved',
+    'homework_name': 'username__hw_python_oop.zip',
+    'reviewer_comment': 'Всё нравится',
+    'date_updated': '2020-02-13T14:40:57Z',
+    'lesson_name': 'Итоговый проект',
+}
+
+
+class TestHomeworkRecord:
+
+    def test_record_keeps_used_fields(self):
+        record = Homework.from_dict(API_HOMEWORK)
+        assert record == (123, 'username__hw_python_oop.zip', 'approved')
+        assert not hasattr(record, '__dict__')
+        assert sys.getsizeof(record) < sys.getsizeof(API_HOMEWORK), (
+            'Проверьте, что запись домашки меньше словаря из API'
+        )
+
+    def test_statuses_are_interned(self):
+        import homework
+
+        # статусы из разных ответов — разные объекты до интернирования
+        answers = [
+            json.loads(json.dumps({'homeworks': [API_HOMEWORK]}))
+            for _ in range(2)
+        ]
+        first, second = (
+            homework.check_response(answer)[0] for answer in answers
+        )
+        assert first.status is second.status, (
+            'Проверьте, что одинаковые статусы хранятся одной строкой'
+        )
+
+    def test_stored_statuses_are_interned(self, tmp_path):
+        subscribers = [Subscriber('token', str(i)) for i in range(2)]
+        store = StateStore(str(tmp_path / 'state.sqlite3'))
+        states = store.load(subscribers, 0)
+        for state in states.values():
+            state.homework_statuses[1] = 'reviewing'
+        store.save(states)
+        first, second = store.load(subscribers, 0).values()
+        store.close()
+        assert first.homework_statuses[1] is second.homework_statuses[1]
@@ -0,0 +1,92 @@
+import requests
+
+from scheduler import AdaptivePolicy, PollScheduler
+from subscribers import SubscriberState
+
+
+class TestPollScheduler:
+
+    def test_pop_due_in_time_order(self):
+        scheduler = PollScheduler()
+        scheduler.schedule('late', 30)
+        scheduler.schedule('early', 10)
+        scheduler.schedule('middle', 20)
+
+        assert scheduler.pop_due(25) == ['early', 'middle'], (
+            'Проверьте, что планировщик отдает подписчиков по времени опроса'
+        )
+        assert scheduler.next_due() == 30
+        assert len(scheduler) == 1
+
+
+class TestAdaptivePolicy:
+    policy = AdaptivePolicy(
+        base=600, reviewing=120, idle=1800,
+        error_base=60, error_max=3600, jitter=0.1,
+    )
+
+    def state(self, statuses=None, failures=0):
+        return SubscriberState(
+            current_timestamp=0,
+            homework_statuses=statuses or {},
+            failures=failures,
+        )
+
+    def test_reviewing_is_polled_more_often(self):
+        delay = self.policy.delay(self.state({1: 'reviewing'}))
+        assert 108 <= delay <= 132, (
+            'Проверьте, что работа на ревью опрашивается чаще'
+        )
+
+    def test_idle_is_polled_rarely(self):
+        assert self.policy.delay(self.state()) >= 1620
+        assert self.policy.delay(self.state({1: 'approved'})) >= 1620
+        assert 540 <= self.policy.delay(self.state({1: 'rejected'})) <= 660
+
+    def test_backoff_grows_and_is_capped(self):
+        delays = [
+            self.policy.delay(self.state(failures=failures))
+            for failures in (1, 3, 20)
+        ]
+        assert 30 <= delays[0] <= 60
+        assert 120 <= delays[1] <= 240
+        assert 1800 <= delays[2] <= 3600, (
+            'Проверьте, что пауза после сбоев ограничена сверху'
+        )
+
+    def test_only_server_errors_back_off(self):
+        import homework
+
+        state = self.state()
+        homework.handle_error(state, requests.HTTPError('500'))
+        homework.handle_error(state, requests.HTTPError('502'))
+        assert state.failures == 2
+
+        homework.handle_error(state, KeyError('homeworks'))
+        assert state.failures == 0, (
+            'Проверьте, что ошибки данных не увеличивают паузу'
+        )
+
+
+class TestPollSchedulerEntries:
+
+    def test_schedule_replaces_entry(self):
+        scheduler = PollScheduler()
+        scheduler.schedule('subscriber', 10)
+        scheduler.schedule('subscriber', 30)
+
+        assert scheduler.pop_due(20) == [], (
+            'Проверьте, что повторное планирование заменяет прежнее'
+        )
+        assert scheduler.next_due() == 30
+        assert scheduler.pop_due(30) == ['subscriber']
+
+    def test_discard(self):
+        scheduler = PollScheduler()
+        scheduler.schedule('first', 10)
+        scheduler.schedule('second', 20)
+        scheduler.discard('first')
+
+        assert len(scheduler) == 1
+        assert scheduler.next_due() == 20
+        assert scheduler.pop_due(100) == ['second']
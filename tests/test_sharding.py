@@ -0,0 +1,63 @@
+import logging
+import os
+import sys
+import time
+
+import metrics
+from sharding import ShardSupervisor, shard_of
+
+
+def crashing_worker(index, count, metrics_queue):
+    metrics_queue.put((index, {'polls': 1}))
+    # очередь должна успеть передать данные до выхода процесса
+    metrics_queue.close()
+    metrics_queue.join_thread()
+    with open(os.environ['SHARD_LOG'], 'a') as file:
+        file.write(f'{index}\n')
+    sys.exit(1)
+
+
+class TestSharding:
+
+    def test_shard_of_is_stable_and_balanced(self):
+        keys = [f'token-{number}' for number in range(4000)]
+        shards = [shard_of(key, 4) for key in keys]
+        assert shards == [shard_of(key, 4) for key in keys]
+        for index in range(4):
+            assert 800 < shards.count(index) < 1200, (
+                'Проверьте, что подписчики делятся между шардами поровну'
+            )
+
+    def test_crashed_worker_is_restarted(self, tmp_path, monkeypatch):
+        log = tmp_path / 'starts.log'
+        log.write_text('')
+        monkeypatch.setenv('SHARD_LOG', str(log))
+        supervisor = ShardSupervisor(
+            2, crashing_worker, logging.getLogger('test'),
+            restart_delay=0.05, restart_max=0.2,
+        )
+        supervisor.start()
+        deadline = time.monotonic() + 3
+        try:
+            while time.monotonic() < deadline:
+                supervisor.check()
+                supervisor.collect()
+                starts = log.read_text().split()
+                if starts.count('0') >= 3 and starts.count('1') >= 3:
+                    break
+                time.sleep(0.02)
+        finally:
+            supervisor.stop(timeout=1)
+
+        starts = log.read_text().split()
+        assert starts.count('0') >= 3 and starts.count('1') >= 3, (
+            'Проверьте, что супервизор перезапускает упавшие шарды'
+        )
+        supervisor.check()
+        supervisor.collect()
+        assert supervisor.merged_metrics()['polls'] >= 4, (
+            'Проверьте, что счетчики упавших шардов не теряются'
+        )
+
+    def test_merge(self):
+        assert metrics.merge([{'a': 1}, {'a': 2, 'b': 3}]) == {'a': 3, 'b': 3}
@@ -0,0 +1,47 @@
+from storage import StateStore
+from subscribers import Subscriber
+
+
+class TestStateStore:
+
+    def test_state_survives_restart(self, tmp_path):
+        path = str(tmp_path / 'state.sqlite3')
+        known = Subscriber('token', '1')
+        fresh = Subscriber('token', '2')
+
+        store = StateStore(path)
+        states = store.load([known], current_timestamp=100)
+        state = states[known]
+        state.current_timestamp = 200
+        state.failures = 2
+        state.homework_statuses.update({1: 'reviewing', 2: 'approved'})
+        state.error_messages.add('Сбой в работе программы: 500', 0, 60)
+        store.save(states)
+        store.close()
+
+        store = StateStore(path)
+        states = store.load([known, fresh], current_timestamp=300)
+        store.close()
+
+        restored = states[known]
+        assert restored.current_timestamp == 200, (
+            'Проверьте, что курсор опроса сохраняется между запусками'
+        )
+        assert restored.failures == 2
+        assert restored.homework_statuses == {1: 'reviewing', 2: 'approved'}, (
+            'Проверьте, что статусы домашек сохраняются между запусками'
+        )
+        assert restored.error_messages.items() == [
+            ('Сбой в работе программы: 500', 60)
+        ], (
+            'Проверьте, что отправленные ошибки сохраняются между запусками'
+        )
+        assert states[fresh].current_timestamp == 300, (
+            'Проверьте, что новый подписчик начинает с текущего времени'
+        )
+
+    def test_wal_mode(self, tmp_path):
+        store = StateStore(str(tmp_path / 'state.sqlite3'))
+        mode, = store.connection.execute('PRAGMA journal_mode').fetchone()
+        store.close()
+        assert mode == 'wal'
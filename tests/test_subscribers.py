@@ -0,0 +1,158 @@
+import json
+import sqlite3
+
+import pytest
+
+import subscribers
+from exceptions import SubscribersRegistryError
+from utils import MockOutbox
+
+
+class TestSubscribers:
+
+    def test_load_from_json(self, tmp_path):
+        path = tmp_path / 'subscribers.json'
+        path.write_text(json.dumps([
+            {'token': 'token-1', 'chat_id': 1},
+            {'token': 'token-2', 'chat_id': '2'},
+            {'token': 'token-1', 'chat_id': 1},
+        ]))
+
+        result = subscribers.load_subscribers(str(path))
+        assert result == [
+            subscribers.Subscriber('token-1', '1'),
+            subscribers.Subscriber('token-2', '2'),
+        ], (
+            'Проверьте, что реестр читается из JSON без дубликатов'
+        )
+
+    def test_load_from_sqlite(self, tmp_path):
+        path = str(tmp_path / 'subscribers.sqlite3')
+        connection = sqlite3.connect(path)
+        connection.execute('CREATE TABLE subscribers (token, chat_id)')
+        connection.execute("INSERT INTO subscribers VALUES ('token', 42)")
+        connection.commit()
+        connection.close()
+
+        result = subscribers.load_subscribers(path)
+        assert result == [subscribers.Subscriber('token', '42')], (
+            'Проверьте, что реестр читается из SQLite'
+        )
+
+    def test_load_malformed(self, tmp_path):
+        path = tmp_path / 'subscribers.json'
+        path.write_text(json.dumps([{'token': 'token'}]))
+
+        with pytest.raises(SubscribersRegistryError):
+            subscribers.load_subscribers(str(path))
+
+    def test_poll_subscriber_uses_own_token_and_chat(self, monkeypatch):
+        import homework
+
+        requested = []
+
+        def mock_request(current_timestamp, token, session,
+                         validators=None):
+            requested.append(token)
+            return {
+                'homeworks': [{
+                    'id': 1, 'homework_name': 'hw1', 'status': 'approved'
+                }],
+                'current_date': current_timestamp,
+            }
+
+        monkeypatch.setattr(
+            homework, 'request_homework_statuses', mock_request
+        )
+        outbox = MockOutbox()
+        subscriber = subscribers.Subscriber('student-token', '777')
+        state = subscribers.SubscriberState(current_timestamp=0)
+
+        homework.poll_subscriber(outbox, None, subscriber, state)
+
+        assert requested == ['student-token'], (
+            'Проверьте, что опрос идет с токеном подписчика'
+        )
+        assert [chat_id for chat_id, _ in outbox.sent] == ['777'], (
+            'Проверьте, что сообщение уходит в чат подписчика'
+        )
+
+    def test_token_fans_out_to_chats(self, tmp_path, monkeypatch):
+        import homework
+
+        path = tmp_path / 'subscribers.json'
+        path.write_text(json.dumps([
+            {'token': 'token', 'chat_id': 'student'},
+            {'token': 'token', 'chat_id': 'mentor'},
+            {'token': 'token', 'chat_id': 'group'},
+            {'token': 'token', 'chat_id': 'mentor'},
+        ]))
+        subscriber, = subscribers.load_subscribers(str(path))
+        assert subscriber.chats == ('student', 'mentor', 'group'), (
+            'Проверьте, что чаты одного токена опрашиваются одним подписчиком'
+        )
+
+        answers = [
+            {'homeworks': [{'id': 1, 'homework_name': 'hw1',
+                            'status': 'approved'}], 'current_date': 1},
+            homework.ForeignServerError('сервер недоступен'),
+        ]
+
+        def mock_request(current_timestamp, token, session,
+                         validators=None):
+            answer = answers.pop(0)
+            if isinstance(answer, Exception):
+                raise answer
+            return answer
+
+        monkeypatch.setattr(
+            homework, 'request_homework_statuses', mock_request
+        )
+        outbox = MockOutbox()
+        state = subscribers.SubscriberState(current_timestamp=0)
+        homework.poll_subscriber(outbox, None, subscriber, state)
+        assert [chat_id for chat_id, _ in outbox.sent] == [
+            'student', 'mentor', 'group'
+        ]
+        assert len({id(text) for _, text in outbox.sent}) == 1, (
+            'Проверьте, что сообщение рендерится один раз на все чаты'
+        )
+
+        outbox.sent.clear()
+        homework.poll_subscriber(outbox, None, subscriber, state)
+        assert [chat_id for chat_id, _ in outbox.sent] == ['student'], (
+            'Проверьте, что об ошибках токена узнает только его владелец'
+        )
+
+    def test_cursor_follows_current_date(self, monkeypatch):
+        import homework
+
+        requested = []
+        answers = [
+            {'homeworks': [], 'current_date': 1000},
+            homework.ForeignServerError('сервер недоступен'),
+            {'homeworks': [], 'current_date': 2000},
+        ]
+
+        def mock_request(current_timestamp, token, session,
+                         validators=None):
+            requested.append(current_timestamp)
+            answer = answers.pop(0)
+            if isinstance(answer, Exception):
+                raise answer
+            return answer
+
+        monkeypatch.setattr(
+            homework, 'request_homework_statuses', mock_request
+        )
+        subscriber = subscribers.Subscriber('token', '1')
+        state = subscribers.SubscriberState(current_timestamp=500)
+
+        for _ in range(3):
+            homework.poll_subscriber(MockOutbox(), None, subscriber, state)
+
+        assert requested == [500, 1000, 1000], (
+            'Проверьте, что from_date берется из current_date прошлого ответа '
+            'и не сдвигается после сбоя'
+        )
+        assert state.current_timestamp == 2000
@@ -0,0 +1,130 @@
+import json
+
+import pytest
+
+import subscribers
+from exceptions import TemplatesError
+from records import Homework
+from templates import TemplateRegistry
+from utils import MockOutbox
+
+LOCALES = {
+    'ru': {
+        'message': 'Работа "{name}": {verdict}',
+        'verdicts': {'approved': 'принята', 'rejected': 'на доработке'},
+    },
+    'en': {
+        'message': '"{name}": {verdict}',
+        'verdicts': {'approved': 'approved'},
+    },
+}
+
+
+class TestTemplates:
+
+    def test_render_and_fallback(self):
+        registry = TemplateRegistry(LOCALES, 'ru')
+        assert registry.render('approved', 'hw', 'en') == '"hw": approved'
+        assert registry.render('rejected', 'hw', 'en') == (
+            'Работа "hw": на доработке'
+        ), 'Проверьте, что статус без перевода берется из языка по умолчанию'
+        assert registry.render('approved', 'hw', 'de') == (
+            'Работа "hw": принята'
+        )
+        with pytest.raises(KeyError):
+            registry.render('unknown', 'hw')
+
+    def test_malformed_templates(self):
+        with pytest.raises(TemplatesError):
+            TemplateRegistry({'ru': {'message': 'без имени',
+                                     'verdicts': {'approved': 'ok'}}}, 'ru')
+        with pytest.raises(TemplatesError):
+            TemplateRegistry(LOCALES, 'de')
+
+    def test_same_text_as_before(self):
+        import homework
+
+        homeworks = [
+            Homework(1, 'hw1', 'approved'),
+            Homework(2, 'hw2', 'reviewing'),
+            Homework(3, 'hw3', 'rejected'),
+        ]
+        assert homework.TEMPLATES.messages(homeworks) == [
+            'Изменился статус проверки работы "hw1". '
+            'Работа проверена: ревьюеру всё понравилось. Ура!',
+            'Изменился статус проверки работы "hw2". '
+            'Работа взята на проверку ревьюером.',
+            'Изменился статус проверки работы "hw3". '
+            'Работа проверена: у ревьюера есть замечания.',
+        ], 'Проверьте, что шаблоны по умолчанию дают прежний текст'
+
+    def test_subscriber_locale(self, tmp_path, monkeypatch):
+        import homework
+
+        path = tmp_path / 'subscribers.json'
+        path.write_text(json.dumps([
+            {'token': 'token', 'chat_id': '1', 'locale': 'en'},
+        ]))
+        subscriber, = subscribers.load_subscribers(str(path))
+
+        def mock_request(current_timestamp, token, session,
+                         validators=None):
+            return {
+                'homeworks': [
+                    {'id': 1, 'homework_name': 'hw1', 'status': 'approved'}
+                ],
+                'current_date': 1,
+            }
+
+        monkeypatch.setattr(
+            homework, 'request_homework_statuses', mock_request
+        )
+        outbox = MockOutbox()
+        homework.poll_subscriber(
+            outbox, None, subscriber, subscribers.SubscriberState(0)
+        )
+        (_, text), = outbox.sent
+        assert text == homework.TEMPLATES.render('approved', 'hw1', 'en'), (
+            'Проверьте, что сообщение рендерится на языке подписчика'
+        )
+
+    def test_locale_per_chat(self, tmp_path, monkeypatch):
+        import homework
+
+        path = tmp_path / 'subscribers.json'
+        path.write_text(json.dumps([
+            {'token': 'token', 'chat_id': 'student'},
+            {'token': 'token', 'chat_id': 'mentor', 'locale': 'en'},
+            {'token': 'token', 'chat_id': 'group', 'locale': 'en'},
+        ]))
+        subscriber, = subscribers.load_subscribers(str(path))
+        assert subscriber.locale_of('student') is None, (
+            'Проверьте, что язык наставника не переходит к студенту'
+        )
+
+        def mock_request(current_timestamp, token, session,
+                         validators=None):
+            return {
+                'homeworks': [
+                    {'id': 1, 'homework_name': 'hw1', 'status': 'approved'}
+                ],
+                'current_date': 1,
+            }
+
+        monkeypatch.setattr(
+            homework, 'request_homework_statuses', mock_request
+        )
+        outbox = MockOutbox()
+        homework.poll_subscriber(
+            outbox, None, subscriber, subscribers.SubscriberState(0)
+        )
+        sent = dict(outbox.sent)
+        assert sent['student'] == homework.TEMPLATES.render(
+            'approved', 'hw1'
+        ), 'Проверьте, что студент получает сообщение на языке бота'
+        assert sent['mentor'] == homework.TEMPLATES.render(
+            'approved', 'hw1', 'en'
+        ), 'Проверьте, что каждый чат получает сообщение на своем языке'
+        assert sent['mentor'] is sent['group'], (
+            'Проверьте, что сообщение рендерится раз на каждый язык'
+        )
@@ -37,3 +37,17 @@ def check_default_var_exists(scope: ModuleType, var_name: str) -> None:
         f'{var_name} должна быть переменной, а не функцией.'
     )
 
+
+
+class MockOutbox:
+    """Outbox that keeps (chat_id, text) of queued messages."""
+
+    def __init__(self):
+        self.sent = []
+
+    def put(self, chat_id, text, notification=True, key=None):
+        self.sent.append((chat_id, text))
+
+    def put_many(self, chat_ids, text, notification=True, key=None):
+        for chat_id in chat_ids:
+            self.put(chat_id, text)